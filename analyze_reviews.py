@@ -1,63 +1,60 @@
 #!/usr/bin/env python3
 
-import json
+import sys
+import argparse
+from pathlib import Path
+from contextlib import nullcontext
 from collections import defaultdict, Counter
-import difflib
+from page_discovery import DEFAULT_ROOT
+from review_similarity import find_similar_pairs, SIMILARITY_THRESHOLD
+from review_store import load_reviews, MISSING, STORE_SUFFIX, JSONL_SUFFIX
+from review_index import ReviewIndex, INDEX_FILENAME
+from name_matching import find_name_clusters, name_pages_from_store
+from service_taxonomy import load_service_taxonomy, TAXONOMY_FILENAME
 
 def load_review_data():
-    """Load the extracted review data"""
-    with open('/Users/yaronhayo/Desktop/I Locksmith 2025/i-locksmith/review_audit_data.json', 'r') as f:
-        return json.load(f)
+    """Load the extracted review data, preferring the binary store over the dumps"""
+    for suffix in [STORE_SUFFIX, JSONL_SUFFIX]:
+        data_path = DEFAULT_ROOT / ('review_audit_data' + suffix)
+        if data_path.exists():
+            return load_reviews(data_path)
+    return load_reviews(DEFAULT_ROOT / 'review_audit_data.json')
 
 def check_duplicate_names(data):
     """Check for duplicate customer names across pages"""
     name_to_pages = defaultdict(list)
 
-    for page_path, page_data in data.items():
-        for review in page_data['reviews']:
-            if 'customer_name' in review:
-                name_to_pages[review['customer_name']].append(page_path)
+    for name_id, page_id in zip(data.review_name, data.review_page):
+        if name_id != MISSING:
+            name_to_pages[name_id].append(page_id)
 
-    duplicates = {name: pages for name, pages in name_to_pages.items() if len(pages) > 1}
+    duplicates = {data.names.values[name_id]: [data.page_path(page_id) for page_id in page_ids]
+                  for name_id, page_ids in name_to_pages.items() if len(page_ids) > 1}
     return duplicates
 
 def check_similar_reviews(data):
     """Check for very similar review text across pages"""
     all_reviews = []
 
-    for page_path, page_data in data.items():
-        for review in page_data['reviews']:
-            if 'review_text' in review:
-                all_reviews.append({
-                    'text': review['review_text'],
-                    'page': page_path,
-                    'customer': review.get('customer_name', 'Unknown')
-                })
+    for row, text_id in enumerate(data.review_text):
+        if text_id != MISSING:
+            all_reviews.append({
+                'text': data.texts.values[text_id],
+                'page': data.page_path(data.review_page[row]),
+                'customer': data.names.get(data.review_name[row]) or 'Unknown'
+            })
 
-    similar_pairs = []
-    for i, review1 in enumerate(all_reviews):
-        for j, review2 in enumerate(all_reviews[i+1:], i+1):
-            similarity = difflib.SequenceMatcher(None, review1['text'], review2['text']).ratio()
-            if similarity > 0.8:  # 80% similarity threshold
-                similar_pairs.append({
-                    'similarity': similarity,
-                    'review1': review1,
-                    'review2': review2
-                })
-
-    return similar_pairs
+    # MinHash/LSH candidates keep this from comparing every pair
+    return find_similar_pairs(all_reviews, SIMILARITY_THRESHOLD)
 
 def analyze_service_tags_by_category(data):
     """Analyze service tags by page category"""
     tag_analysis = {}
 
-    for page_path, page_data in data.items():
-        category = page_data['category']
-        tags = []
-
-        for review in page_data['reviews']:
-            if 'service_tag' in review:
-                tags.append(review['service_tag'])
+    for page_id, page_path in enumerate(data.pages.values):
+        category = data.page_category_name(page_id)
+        tags = [data.tags.values[data.review_tag[row]] for row in data.page_rows(page_id)
+                if data.review_tag[row] != MISSING]
 
         tag_analysis[page_path] = {
             'category': category,
@@ -68,116 +65,85 @@ def analyze_service_tags_by_category(data):
 
     return tag_analysis
 
-def categorize_service_tags():
-    """Define expected service tags by category"""
-    return {
-        'residential_services': [
-            'Lock Rekey', 'Lock Replacement', 'House Lockout', 'Key Cutting',
-            'Emergency Locksmith', 'Lock Repair', 'Home Security'
-        ],
-        'commercial_services': [
-            'Commercial Lock Rekey', 'Business Lockout', 'Access Control',
-            'Master Key Systems', 'Commercial Lock Replacement', 'Emergency Exit Devices'
-        ],
-        'automotive_services': [
-            'Car Lockout', 'Car Key Replacement', 'Key Fob Programming',
-            'Car Key Cutting', 'Ignition Lock Cylinder', 'Car Key Duplicate'
-        ],
-        'general_services': [
-            'Emergency Locksmith', 'Lock Repair', 'Key Cutting', 'Storage Unit Lockout'
-        ]
-    }
-
-def validate_service_tags(tag_analysis, expected_tags):
-    """Validate service tags against expected categories"""
+def validate_service_tags(tag_analysis, taxonomy):
+    """Validate service tags against the shared service taxonomy"""
     issues = []
 
     for page_path, analysis in tag_analysis.items():
         category = analysis['category']
-        page_tags = set(analysis['unique_tags'])
-
-        # Define expectations for each category
-        if category == 'service_area_pages':
-            # Service area pages should show diverse services from same city
-            expected_diversity = True
-            min_different_services = 3
-
-        elif category == 'service_category_pages':
-            # Service category pages should show services matching the category
-            if 'residential-locksmith' in page_path:
-                expected_services = set(expected_tags['residential_services'] + expected_tags['general_services'])
-            elif 'auto-locksmith' in page_path:
-                expected_services = set(expected_tags['automotive_services'] + expected_tags['general_services'])
-            elif 'commercial-locksmith' in page_path:
-                expected_services = set(expected_tags['commercial_services'] + expected_tags['general_services'])
-            else:
-                expected_services = set()
-
-        elif category == 'individual_service_pages':
-            # Individual service pages should show only that specific service
-            service_name_map = {
-                'car-lockout.html': 'Car Lockout',
-                'house-lockout.html': 'House Lockout',
-                'business-lockout.html': 'Business Lockout',
-                'storage-unit-lockout.html': 'Storage Unit Lockout',
-                'lock-rekey.html': 'Lock Rekey',
-                'lock-replacement.html': 'Lock Replacement',
-                'car-key-replacement.html': 'Car Key Replacement'
-            }
-            expected_single_service = None
-            for filename, service in service_name_map.items():
-                if filename in page_path:
-                    expected_single_service = service
-                    break
-
-        elif category == 'main_pages':
-            # Main pages should show diverse services
-            expected_diversity = True
-            min_different_services = 4
+        page_tags = analysis['unique_tags']
 
         # Check for issues based on category
         if category == 'service_area_pages' or category == 'main_pages':
-            if len(analysis['unique_tags']) < 3:
+            # Service area and main pages should show diverse services
+            if len(page_tags) < taxonomy.min_unique_tags.get(category, 0):
                 issues.append({
                     'page': page_path,
-                    'issue': f'Insufficient service diversity: only {len(analysis["unique_tags"])} unique services',
-                    'tags': analysis['unique_tags']
+                    'issue': f'Insufficient service diversity: only {len(page_tags)} unique services',
+                    'tags': page_tags
                 })
 
         elif category == 'service_category_pages':
-            unexpected_tags = page_tags - expected_services
+            # Service category pages should show services matching the category
+            unexpected_tags = taxonomy.unexpected_tags(page_path, page_tags)
             if unexpected_tags:
                 issues.append({
                     'page': page_path,
                     'issue': f'Unexpected service tags for category',
-                    'unexpected_tags': list(unexpected_tags),
-                    'expected_category': 'residential' if 'residential' in page_path else 'auto' if 'auto' in page_path else 'commercial'
+                    'unexpected_tags': unexpected_tags,
+                    'expected_category': '/'.join(taxonomy.expected_groups(page_path))
                 })
 
         elif category == 'individual_service_pages':
-            if expected_single_service:
-                non_matching_tags = [tag for tag in page_tags if tag != expected_single_service]
-                if non_matching_tags:
-                    issues.append({
-                        'page': page_path,
-                        'issue': f'Mixed service tags on individual service page',
-                        'expected_service': expected_single_service,
-                        'found_tags': list(page_tags)
-                    })
+            # Individual service pages should show only that specific service
+            if taxonomy.off_service_tags(page_path, page_tags):
+                issues.append({
+                    'page': page_path,
+                    'issue': f'Mixed service tags on individual service page',
+                    'expected_service': taxonomy.page_service(page_path),
+                    'found_tags': page_tags
+                })
 
     return issues
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Analyze extracted review data')
+    parser.add_argument('--index', type=Path, nargs='?', const=DEFAULT_ROOT / INDEX_FILENAME, default=None,
+                        metavar='PATH',
+                        help='Query a SQLite review index written by audit_reviews.py --index instead of '
+                             'the review_audit_data files (default name: ' + INDEX_FILENAME + ')')
+    parser.add_argument('--taxonomy', type=Path, default=None,
+                        help='Service tag taxonomy (default: ' + TAXONOMY_FILENAME + ')')
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("🔍 Analyzing extracted review data...")
     print("=" * 60)
 
-    # Load data
-    data = load_review_data()
+    # An index answers the cross-page queries directly, but it is only used
+    # when asked for: audit_reviews.py refreshes it only when run with --index,
+    # so an index lying around may be older than the review data
+    index = None
+    if args.index:
+        try:
+            index = ReviewIndex(args.index, read_only=True)
+        except FileNotFoundError:
+            sys.exit(f"❌ Review index not found: {args.index} (run audit_reviews.py --index first)")
+        except ValueError as e:
+            sys.exit(f"❌ Can't read review index: {e}")
+
+    with index or nullcontext():
+        data = index.to_store() if index else load_review_data()
+        print_analysis(data, index, args.taxonomy)
+
+def print_analysis(data, index=None, taxonomy_path=None):
+    """Print every check over the loaded review data, using `index` for the cross-page queries if given"""
 
     # 1. Check for duplicate customer names
     print("\n📊 DUPLICATE CUSTOMER NAMES ANALYSIS")
     print("-" * 40)
-    duplicate_names = check_duplicate_names(data)
+    duplicate_names = index.duplicate_names() if index else check_duplicate_names(data)
 
     if duplicate_names:
         print(f"⚠️  Found {len(duplicate_names)} customers appearing on multiple pages:")
@@ -188,6 +154,13 @@ def main():
     else:
         print("✅ No duplicate customer names found")
 
+    # Spelling variants the exact check can't see ("Betty Lou W." / "Betty W.")
+    name_clusters = find_name_clusters(name_pages_from_store(data))
+    if name_clusters:
+        print(f"\n⚠️  Found {len(name_clusters)} customers listed under several spellings:")
+        for cluster in name_clusters:
+            print(f"   • {' / '.join(cluster['names'])}: {cluster['occurrences']} reviews on {len(cluster['pages'])} pages")
+
     # 2. Check for similar review text
     print("\n📊 SIMILAR REVIEW TEXT ANALYSIS")
     print("-" * 40)
@@ -209,24 +182,31 @@ def main():
     print("\n📊 SERVICE TAG ANALYSIS BY CATEGORY")
     print("-" * 40)
     tag_analysis = analyze_service_tags_by_category(data)
-    expected_tags = categorize_service_tags()
+    taxonomy = load_service_taxonomy(taxonomy_path)
 
     # Show tag distribution by category
     for category in ['service_area_pages', 'service_category_pages', 'individual_service_pages', 'main_pages']:
-        category_pages = [path for path, analysis in tag_analysis.items() if analysis['category'] == category]
-        if category_pages:
-            print(f"\n{category.replace('_', ' ').title()}:")
+        if index:
+            if not index.page_count(category):
+                continue
+            tag_counts = index.tag_counts(category)
+        else:
+            category_pages = [path for path, analysis in tag_analysis.items() if analysis['category'] == category]
+            if not category_pages:
+                continue
             all_tags = []
             for page in category_pages:
                 all_tags.extend(tag_analysis[page]['tags'])
-            tag_counts = Counter(all_tags)
-            for tag, count in tag_counts.most_common():
-                print(f"   • {tag}: {count} occurrences")
+            tag_counts = Counter(all_tags).most_common()
+
+        print(f"\n{category.replace('_', ' ').title()}:")
+        for tag, count in tag_counts:
+            print(f"   • {tag}: {count} occurrences")
 
     # 4. Validate service tags
     print("\n📊 SERVICE TAG VALIDATION")
     print("-" * 40)
-    tag_issues = validate_service_tags(tag_analysis, expected_tags)
+    tag_issues = validate_service_tags(tag_analysis, taxonomy)
 
     if tag_issues:
         print(f"⚠️  Found {len(tag_issues)} service tag issues:")
@@ -246,16 +226,16 @@ def main():
     # 5. Summary statistics
     print("\n📊 SUMMARY STATISTICS")
     print("-" * 40)
-    total_pages = len(data)
-    total_reviews = sum(len(page_data['reviews']) for page_data in data.values())
+    total_pages = data.page_count
+    total_reviews = data.review_count
 
     print(f"Total pages audited: {total_pages}")
     print(f"Total reviews found: {total_reviews}")
     print(f"Average reviews per page: {total_reviews/total_pages:.1f}")
 
     pages_by_category = defaultdict(int)
-    for page_data in data.values():
-        pages_by_category[page_data['category']] += 1
+    for page_id in range(data.page_count):
+        pages_by_category[data.page_category_name(page_id)] += 1
 
     print(f"\nPages by category:")
     for category, count in pages_by_category.items():
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+
+from contextlib import nullcontext
+from collections import defaultdict, Counter
+from review_store import MISSING
+from review_similarity import find_similar_pairs, minhash_signature, SIMILARITY_THRESHOLD
+from tfidf_similarity import find_similar_pairs_tfidf
+from external_similarity import ExternalSimilarity, DEFAULT_MEMORY_LIMIT
+from name_matching import find_name_clusters
+from service_taxonomy import load_service_taxonomy
+
+# Categories reported by the tag distribution, in report order
+DISTRIBUTION_CATEGORIES = ['service_area_pages', 'service_category_pages', 'individual_service_pages', 'main_pages']
+
+
+class Analyzer:
+    """One audit check, driven by run_analyzers
+
+    Subclasses override only the hooks they need; the engine calls start()
+    once, then page() / review() / end_page() while it walks the store a
+    page at a time, then finish(), whose return value is the analyzer's
+    result under `name`. finish() also receives the results of the
+    analyzers listed in `after`, which are guaranteed to finish first.
+    Work done in finish() is timed as the metrics stage `stage`, and a
+    `stats` dict left on the analyzer is added to the metrics counters
+    with the stage name as prefix.
+
+    For sharded runs (see audit_shards.py) an analyzer also implements
+    partial(), its state after traversing one shard as JSON-serialisable
+    data keyed by strings rather than store ids, and merge(), which
+    restores the state a single traversal of every page would have left
+    from the partials of all shards.
+    """
+
+    name = None
+    stage = None
+    after = ()
+    stats = None
+
+    def start(self, store):
+        pass
+
+    def page(self, store, page_id):
+        pass
+
+    def review(self, store, row):
+        pass
+
+    def end_page(self, store, page_id):
+        pass
+
+    def finish(self, store, results):
+        return None
+
+    def partial(self, store):
+        raise NotImplementedError(f"{type(self).__name__} can't be sharded")
+
+    def merge(self, store, partials):
+        raise NotImplementedError(f"{type(self).__name__} can't be sharded")
+
+
+def _overrides(analyzer, hook):
+    return getattr(type(analyzer), hook) is not getattr(Analyzer, hook)
+
+
+def finish_order(analyzers):
+    """Analyzers in registration order, moved back only as far as their `after` requires"""
+    by_name = {}
+    for analyzer in analyzers:
+        if analyzer.name in by_name:
+            raise ValueError(f"two analyzers report as {analyzer.name!r}")
+        by_name[analyzer.name] = analyzer
+
+    ordered = []
+    state = {}
+
+    def visit(analyzer, chain):
+        if state.get(analyzer.name) == 'done':
+            return
+        if state.get(analyzer.name) == 'visiting':
+            raise ValueError(f"analyzer dependency cycle: {' -> '.join(chain + [analyzer.name])}")
+        state[analyzer.name] = 'visiting'
+        for dependency in analyzer.after:
+            if dependency not in by_name:
+                raise ValueError(f"analyzer {analyzer.name!r} needs {dependency!r}, which isn't registered")
+            visit(by_name[dependency], chain + [analyzer.name])
+        state[analyzer.name] = 'done'
+        ordered.append(analyzer)
+
+    for analyzer in analyzers:
+        visit(analyzer, [])
+    return ordered
+
+
+def default_analyzers(taxonomy=None, similarity_backend='minhash', **similarity_options):
+    """The checks comprehensive_audit.py reports, in report order"""
+    return [
+        DuplicateNames(),
+        FuzzyNames(),
+        SimilarReviews(similarity_backend, **similarity_options),
+        TagAppropriateness(taxonomy),
+        TagDistribution(),
+        SummaryStatistics()
+    ]
+
+
+def _stage(metrics):
+    return metrics.stage if metrics is not None else (lambda name: nullcontext())
+
+
+def traverse(store, analyzers, metrics=None):
+    """Start every analyzer and walk the store once, calling the hooks each one overrides"""
+    page_hooks = [analyzer.page for analyzer in analyzers if _overrides(analyzer, 'page')]
+    review_hooks = [analyzer.review for analyzer in analyzers if _overrides(analyzer, 'review')]
+    end_page_hooks = [analyzer.end_page for analyzer in analyzers if _overrides(analyzer, 'end_page')]
+
+    with _stage(metrics)('analysis_traversal'):
+        for analyzer in analyzers:
+            analyzer.start(store)
+        offsets = store.page_review_offsets
+        for page_id in range(store.page_count):
+            for hook in page_hooks:
+                hook(store, page_id)
+            if review_hooks:
+                for row in range(offsets[page_id], offsets[page_id + 1]):
+                    for hook in review_hooks:
+                        hook(store, row)
+            for hook in end_page_hooks:
+                hook(store, page_id)
+
+
+def finish_analyzers(store, analyzers, metrics=None):
+    """{analyzer.name: result} for analyzers whose state is complete, in finish order"""
+    stage = _stage(metrics)
+    results = {}
+    for analyzer in finish_order(analyzers):
+        with stage(analyzer.stage or analyzer.name):
+            results[analyzer.name] = analyzer.finish(store, results)
+        if metrics is not None and analyzer.stats:
+            metrics.add_counts(analyzer.stats, prefix=(analyzer.stage or analyzer.name) + '_')
+    return results
+
+
+def run_analyzers(store, analyzers, metrics=None):
+    """Run every analyzer over a ReviewStore in a single traversal
+
+    Each page is visited once and each review row once, whatever the number
+    of analyzers; only the hooks an analyzer overrides are called. Returns
+    {analyzer.name: result}, in finish order.
+    """
+    finish_order(analyzers)
+    traverse(store, analyzers, metrics)
+    return finish_analyzers(store, analyzers, metrics)
+
+
+def map_analyzers(store, analyzers, metrics=None):
+    """Traverse one shard's store and return {analyzer.name: partial state}"""
+    finish_order(analyzers)
+    traverse(store, analyzers, metrics)
+    return {analyzer.name: analyzer.partial(store) for analyzer in analyzers}
+
+
+def reduce_analyzers(store, analyzers, partials, metrics=None):
+    """Merge the map_analyzers output of every shard and finish, like run_analyzers over all pages
+
+    `store` holds every shard's pages in the order a single run would
+    have added them; it is used to put merged state back in that order.
+    """
+    finish_order(analyzers)
+    with _stage(metrics)('analysis_merge'):
+        for analyzer in analyzers:
+            analyzer.merge(store, [shard[analyzer.name] for shard in partials])
+    return finish_analyzers(store, analyzers, metrics)
+
+
+def _merge_name_pages(store, partials):
+    """{name: [page, ...]} partials -> {name_id: [page_id, ...]} in single-run order"""
+    page_ids = store.pages.ids
+    name_pages = {}
+    for partial in partials:
+        for name, pages in partial.items():
+            name_pages.setdefault(store.names.ids[name], []).extend(page_ids[page] for page in pages)
+    # Interned ids follow first appearance, and shards hold whole pages in review order
+    return {name_id: sorted(name_pages[name_id]) for name_id in sorted(name_pages)}
+
+
+class DuplicateNames(Analyzer):
+    """Customer names appearing on more than one page -> those pages"""
+
+    name = 'duplicate_names'
+
+    def start(self, store):
+        # Grouped by interned ids and only turned back into strings at the end
+        self.name_pages = defaultdict(list)
+
+    def review(self, store, row):
+        name_id = store.review_name[row]
+        if name_id != MISSING:
+            self.name_pages[name_id].append(store.review_page[row])
+
+    def finish(self, store, results):
+        return {store.names.values[name_id]: [store.page_path(page_id) for page_id in page_ids]
+                for name_id, page_ids in self.name_pages.items() if len(page_ids) > 1}
+
+    def partial(self, store):
+        return {store.names.values[name_id]: [store.page_path(page_id) for page_id in page_ids]
+                for name_id, page_ids in self.name_pages.items()}
+
+    def merge(self, store, partials):
+        self.name_pages = _merge_name_pages(store, partials)
+
+
+class FuzzyNames(Analyzer):
+    """Customers listed under several spellings (see name_matching.find_name_clusters)"""
+
+    name = 'fuzzy_duplicate_names'
+    stage = 'fuzzy_names'
+
+    def start(self, store):
+        self.name_pages = defaultdict(list)
+        self.stats = {}
+
+    def review(self, store, row):
+        name_id = store.review_name[row]
+        if name_id != MISSING:
+            self.name_pages[store.names.values[name_id]].append(store.page_path(store.review_page[row]))
+
+    def finish(self, store, results):
+        return find_name_clusters(self.name_pages, self.stats)
+
+    def partial(self, store):
+        return self.name_pages
+
+    def merge(self, store, partials):
+        self.stats = {}
+        self.name_pages = {store.names.values[name_id]: [store.page_path(page_id) for page_id in page_ids]
+                           for name_id, page_ids in _merge_name_pages(store, partials).items()}
+
+
+class SimilarReviews(Analyzer):
+    """Pairs of very similar review texts across the site"""
+
+    name = 'similar_reviews'
+    stage = 'similarity'
+
+    def __init__(self, backend='minhash', threshold=SIMILARITY_THRESHOLD,
+                 memory_limit=DEFAULT_MEMORY_LIMIT, pairs_path=None, score_cache=None):
+        self.backend = backend
+        self.threshold = threshold
+        # difflib scores from earlier runs (a ScoreCache); TF-IDF scores aren't cached
+        self.score_cache = score_cache
+        # The external backend streams its pairs to pairs_path (a temporary file if None)
+        self.memory_limit = memory_limit
+        self.pairs_path = pairs_path
+
+    def start(self, store):
+        # With the external backend, texts go straight to disk instead of this list
+        self.texts = (ExternalSimilarity(self.threshold, self.memory_limit, score_cache=self.score_cache)
+                      if self.backend == 'external' else [])
+        self.signatures = None
+        self.stats = {}
+
+    def review(self, store, row):
+        text_id = store.review_text[row]
+        if text_id != MISSING:
+            review = {
+                'text': store.texts.values[text_id],
+                'page': store.page_path(store.review_page[row]),
+                'customer': store.names.get(store.review_name[row]) or 'Unknown'
+            }
+            if self.backend == 'external':
+                self.texts.add(review)
+            else:
+                self.texts.append(review)
+
+    def finish(self, store, results):
+        if self.backend == 'external':
+            # Bounded memory: band keys and candidate pairs are sorted on disk
+            with self.texts as finder:
+                return finder.run(self.pairs_path, self.stats)
+        if self.backend == 'tfidf':
+            # Vectorised TF-IDF cosine scores instead of difflib ratios
+            return find_similar_pairs_tfidf(self.texts, self.threshold, self.stats)
+        # MinHash/LSH candidates keep this from comparing every pair
+        return find_similar_pairs(self.texts, self.threshold, self.stats, self.signatures, self.score_cache)
+
+    def partial(self, store):
+        if self.backend == 'external':
+            raise NotImplementedError("the external similarity backend can't be sharded")
+        partial = {'reviews': [[review['text'], review['page'], review['customer']] for review in self.texts]}
+        if self.backend != 'tfidf':
+            # Signing is the bulk of the MinHash work, so each shard signs its own texts
+            partial['signatures'] = {text: minhash_signature(text)
+                                     for text in dict.fromkeys(review['text'] for review in self.texts)}
+        return partial
+
+    def merge(self, store, partials):
+        page_ids = store.pages.ids
+        reviews = [review for partial in partials for review in partial['reviews']]
+        reviews.sort(key=lambda review: page_ids[review[1]])
+        self.texts = [{'text': text, 'page': page, 'customer': customer} for text, page, customer in reviews]
+        self.signatures = {}
+        for partial in partials:
+            self.signatures.update(partial.get('signatures', {}))
+        self.stats = {}
+
+
+class TagAppropriateness(Analyzer):
+    """Pages whose service tags don't fit the page type"""
+
+    name = 'tag_issues'
+    stage = 'tag_validation'
+
+    def __init__(self, taxonomy=None):
+        # Expected services come from service_taxonomy.json, compiled once
+        self.taxonomy = taxonomy or load_service_taxonomy()
+
+    def start(self, store):
+        self.issues = []
+        self.tag_ids = set()
+
+    def review(self, store, row):
+        self.tag_ids.add(store.review_tag[row])
+
+    def end_page(self, store, page_id):
+        self.tag_ids.discard(MISSING)
+        unique_tags = sorted(store.tags.values[tag_id] for tag_id in self.tag_ids)
+        self.tag_ids = set()
+        page_path = store.page_path(page_id)
+        category = store.page_category_name(page_id)
+        taxonomy = self.taxonomy
+
+        if category in ('service_area_pages', 'main_pages'):
+            # Service area and main pages should show diverse services
+            if len(unique_tags) < taxonomy.min_unique_tags.get(category, 0):
+                self.issues.append({
+                    'page': page_path,
+                    'category': category,
+                    'issue': f'Insufficient service diversity: only {len(unique_tags)} unique service tags',
+                    'tags': unique_tags
+                })
+
+        elif category == 'service_category_pages':
+            # Service category pages should show services matching the category
+            unexpected = taxonomy.unexpected_tags(page_path, unique_tags)
+            if unexpected:
+                self.issues.append({
+                    'page': page_path,
+                    'category': category,
+                    'issue': f'Unexpected service tags for category',
+                    'unexpected_tags': unexpected,
+                    'all_tags': unique_tags
+                })
+
+        elif category == 'individual_service_pages':
+            # Individual service pages should be more consistent
+            mismatched_tags = taxonomy.off_service_tags(page_path, unique_tags)
+            if mismatched_tags and len(mismatched_tags) > len(unique_tags) * 0.5:  # More than half don't match
+                self.issues.append({
+                    'page': page_path,
+                    'category': category,
+                    'issue': f'Service tags may not match page focus',
+                    'expected_keywords': taxonomy.page_keywords(page_path),
+                    'found_tags': unique_tags,
+                    'mismatched_tags': mismatched_tags
+                })
+
+    def finish(self, store, results):
+        return self.issues
+
+    def partial(self, store):
+        return self.issues
+
+    def merge(self, store, partials):
+        page_ids = store.pages.ids
+        self.issues = sorted((issue for partial in partials for issue in partial),
+                             key=lambda issue: page_ids[issue['page']])
+
+
+class TagDistribution(Analyzer):
+    """Card service tag counts per page category, most common first, with the category's page count"""
+
+    name = 'tag_distribution'
+    after = ('summary',)
+
+    def start(self, store):
+        self.tag_counts = defaultdict(Counter)
+        self.first_rows = {}
+
+    def review(self, store, row):
+        tag_id = store.review_tag[row]
+        if tag_id != MISSING:
+            category_id = store.page_category[store.review_page[row]]
+            counts = self.tag_counts[category_id]
+            if tag_id not in counts:
+                # most_common() breaks ties by first appearance, which merge() has to reproduce
+                self.first_rows[category_id, tag_id] = row
+            counts[tag_id] += 1
+
+    def finish(self, store, results):
+        categories = results['summary']['categories']
+        distribution = {}
+        for category in DISTRIBUTION_CATEGORIES:
+            category_id = store.categories.ids.get(category)
+            distribution[category] = {
+                'pages': categories.get(category, {}).get('pages', 0),
+                'tags': [(store.tags.values[tag_id], count)
+                         for tag_id, count in self.tag_counts[category_id].most_common()]
+            }
+        return distribution
+
+    def partial(self, store):
+        partial = defaultdict(list)
+        for category_id, counts in self.tag_counts.items():
+            for tag_id, count in counts.items():
+                row = self.first_rows[category_id, tag_id]
+                page_id = store.review_page[row]
+                partial[store.categories.values[category_id]].append(
+                    [store.tags.values[tag_id], count, store.page_path(page_id), row - store.page_review_offsets[page_id]])
+        return partial
+
+    def merge(self, store, partials):
+        page_ids = store.pages.ids
+        counts = Counter()
+        first_seen = {}
+        for partial in partials:
+            for category, tags in partial.items():
+                for tag, count, page, position in tags:
+                    key = (store.categories.ids[category], store.tags.ids[tag])
+                    counts[key] += count
+                    seen = (page_ids[page], position)
+                    first_seen[key] = min(first_seen.get(key, seen), seen)
+        self.tag_counts = defaultdict(Counter)
+        for key in sorted(counts, key=first_seen.get):
+            self.tag_counts[key[0]][key[1]] = counts[key]
+
+
+class SummaryStatistics(Analyzer):
+    """Page, review and service tag totals, overall and per category"""
+
+    name = 'summary'
+
+    def start(self, store):
+        self.pages_by_category = Counter()
+        self.reviews_by_category = Counter()
+
+    def page(self, store, page_id):
+        category_id = store.page_category[page_id]
+        self.pages_by_category[category_id] += 1
+        self.reviews_by_category[category_id] += len(store.page_rows(page_id))
+
+    def finish(self, store, results):
+        return {
+            'total_pages': store.page_count,
+            'total_reviews': store.review_count,
+            'total_service_tags': len(store.page_tag_ids),
+            'categories': {store.categories.values[category_id]: {
+                'pages': count, 'reviews': self.reviews_by_category[category_id]}
+                for category_id, count in self.pages_by_category.items()}
+        }
+
+    def partial(self, store):
+        return {store.categories.values[category_id]: [count, self.reviews_by_category[category_id]]
+                for category_id, count in self.pages_by_category.items()}
+
+    def merge(self, store, partials):
+        totals = defaultdict(lambda: [0, 0])
+        for partial in partials:
+            for category, (pages, reviews) in partial.items():
+                totals[store.categories.ids[category]][0] += pages
+                totals[store.categories.ids[category]][1] += reviews
+        # Categories are interned in the order their first page appears
+        self.pages_by_category = Counter({category_id: totals[category_id][0] for category_id in sorted(totals)})
+        self.reviews_by_category = Counter({category_id: totals[category_id][1] for category_id in sorted(totals)})
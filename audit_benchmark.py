@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+import re
+import sys
+import json
+import random
+import argparse
+import platform
+import tempfile
+import time
+from pathlib import Path
+from page_discovery import DEFAULT_ROOT, discover_pages, relative_page_path
+from audit_parallel import extract_pages
+from tfidf_similarity import tfidf_available
+from review_extractor import iter_review_events
+from review_store import ReviewStore, PageRecordWriter, load_reviews, STORE_SUFFIX, JSONL_SUFFIX
+from comprehensive_audit import (
+    analyze_duplicate_names, analyze_similar_reviews, analyze_service_tag_appropriateness
+)
+
+STAGES = ['extraction', 'duplicate_names', 'similarity', 'tag_validation', 'serialization']
+
+# Pages whose real review-card markup is reused for the synthetic site
+TEMPLATE_PAGES = ['index.html', 'service-areas/locksmith-bremen-indiana.html']
+
+CITIES = ['South Bend', 'Mishawaka', 'Elkhart', 'Granger', 'Goshen', 'Bremen',
+          'New Carlisle', 'North Liberty', 'Wakarusa', 'Osceola']
+SERVICE_TAGS = ['Car Lockout', 'House Lockout', 'Business Lockout', 'Lock Rekey',
+                'Lock Replacement', 'Car Key Replacement', 'Key Fob Programming',
+                'Access Control', 'Master Key Systems', 'Emergency Lockout']
+FIRST_NAMES = ['Robert', 'Maria', 'Amanda', 'Michael', 'Jennifer', 'Thomas', 'Linda',
+               'David', 'Susan', 'James', 'Karen', 'Paul', 'Betty', 'Andrew', 'Carl',
+               'Emma', 'Derek', 'Rachel', 'Larry', 'Nancy', 'Kevin', 'Laura', 'Brian']
+
+
+def _page_parts(page_path):
+    """Split a real page into head, card markup templates, card separator and tail"""
+    raw = page_path.read_bytes()
+    starts = []
+    ends = []
+    for event in iter_review_events(page_path):
+        if event.kind == 'card_start':
+            starts.append(event.offset)
+        elif event.kind == 'card_end':
+            ends.append(event.offset + len(b'</div>'))
+
+    cards = [raw[start:end].decode('utf-8') for start, end in zip(starts, ends)]
+    separator = raw[ends[0]:starts[1]].decode('utf-8')
+    return raw[:starts[0]].decode('utf-8'), cards, separator, raw[ends[-1]:].decode('utf-8')
+
+
+def _card_template(card_html):
+    """Replace the review values in real card markup with format placeholders"""
+    card_html = card_html.replace('{', '{{').replace('}', '}}')
+    card_html = re.sub(r'(<p\b[^>]*\bfont-bold\b[^>]*>)[^<]*(</p>)', r'\1{name}\2', card_html, count=1)
+    card_html = re.sub(r'(location_on</span>)[^<]*', r'\1 {location}\n', card_html, count=1)
+    card_html = re.sub(r'(rounded-2xl[^>]*>\s*<p\b[^>]*>)[^<]*(</p>)', r'\1{text}\2', card_html, count=1)
+    card_html = re.sub(r'(service-tag[^>]*>\s*<span\b[^>]*>)[^<]*(</span>)', r'\1{tag}\2', card_html, count=1)
+    return card_html
+
+
+def load_templates(root=DEFAULT_ROOT):
+    """Collect page shells and review-card templates from the real site"""
+    templates = []
+    vocabulary = []
+    for relative_path in TEMPLATE_PAGES:
+        head, cards, separator, tail = _page_parts(Path(root) / relative_path)
+        templates.append({
+            'head': head,
+            'cards': [_card_template(card) for card in cards],
+            'separator': separator,
+            'tail': tail
+        })
+    for event in iter_review_events(Path(root) / TEMPLATE_PAGES[0]):
+        if event.kind == 'text':
+            vocabulary.extend(event.value.split())
+    return templates, vocabulary
+
+
+def _mutate(text, rng, vocabulary, rate=0.1):
+    """Swap a few words so the copy is near-duplicate rather than identical"""
+    words = text.split()
+    return ' '.join(rng.choice(vocabulary) if rng.random() < rate else word for word in words)
+
+
+def generate_site(site_root, pages, reviews_per_page, duplication_rate, seed=0, root=DEFAULT_ROOT):
+    """Write a synthetic site with the real page and card markup
+
+    `duplication_rate` is the share of reviews copied from an earlier page;
+    half of those copies are exact and half are lightly reworded.
+    """
+    rng = random.Random(seed)
+    templates, vocabulary = load_templates(root)
+    site_root = Path(site_root)
+    (site_root / 'service-areas').mkdir(parents=True, exist_ok=True)
+    (site_root / 'services').mkdir(parents=True, exist_ok=True)
+    published = []
+
+    for page_number in range(pages):
+        template = templates[page_number % len(templates)]
+        city = CITIES[page_number % len(CITIES)]
+        cards = []
+
+        for card_number in range(reviews_per_page):
+            if published and rng.random() < duplication_rate:
+                name, text, tag = rng.choice(published)
+                if rng.random() < 0.5:
+                    text = _mutate(text, rng, vocabulary)
+            else:
+                name = f"{rng.choice(FIRST_NAMES)} {chr(65 + rng.randrange(26))}."
+                text = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(18, 40)))
+                tag = rng.choice(SERVICE_TAGS)
+                published.append((name, text, tag))
+
+            card = template['cards'][card_number % len(template['cards'])]
+            cards.append(card.format(name=name, location=f"{city}, IN", text=text, tag=tag))
+
+        if page_number % 2:
+            page_path = site_root / 'services' / f'synthetic-service-{page_number}.html'
+        else:
+            page_path = site_root / 'service-areas' / f'locksmith-synthetic-{page_number}-indiana.html'
+        page_path.write_text(template['head'] + template['separator'].join(cards) + template['tail'],
+                             encoding='utf-8')
+
+
+def _timed(timings, stage, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    timings[stage] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def run_benchmark(site_root, stages, jobs=1, similarity_backend='minhash'):
+    """Time each audit stage against a (synthetic) site"""
+    timings = {}
+    counts = {}
+    store = ReviewStore()
+
+    def extract():
+        for page_path, category, reviews, service_tags, error in extract_pages(discover_pages(site_root), jobs=jobs):
+            store.add_page(relative_page_path(page_path, site_root), category, reviews, service_tags)
+
+    _timed(timings, 'extraction', extract)
+    counts['pages'] = store.page_count
+    counts['reviews'] = store.review_count
+
+    if 'duplicate_names' in stages:
+        counts['duplicate_names'] = len(_timed(timings, 'duplicate_names', analyze_duplicate_names, store))
+    if 'similarity' in stages:
+        counts['similar_pairs'] = len(_timed(timings, 'similarity', analyze_similar_reviews, store,
+                                                     None, similarity_backend))
+    if 'tag_validation' in stages:
+        counts['tag_issues'] = len(_timed(timings, 'tag_validation', analyze_service_tag_appropriateness, store))
+    if 'serialization' in stages:
+        counts.update(_benchmark_serialization(timings, store, Path(site_root)))
+
+    return timings, counts
+
+
+def _benchmark_serialization(timings, store, site_root):
+    """Compare the binary store against the legacy indented JSON dump and JSON Lines"""
+    store_path = site_root / ('benchmark' + STORE_SUFFIX)
+    json_path = site_root / 'benchmark.json'
+    jsonl_path = site_root / ('benchmark' + JSONL_SUFFIX)
+
+    def dump_json():
+        with open(json_path, 'w') as f:
+            json.dump(store.to_dict(include_service_tags=True), f, indent=2, ensure_ascii=False)
+
+    def dump_jsonl():
+        with PageRecordWriter(jsonl_path, include_service_tags=True) as writer:
+            for page_id, page in enumerate(store.pages.values):
+                writer.add_page(page, store.page_category_name(page_id), store.page_reviews(page_id),
+                                store.page_service_tags(page_id))
+
+    _timed(timings, 'store_dump', store.save, store_path)
+    _timed(timings, 'store_load', load_reviews, store_path)
+    _timed(timings, 'json_dump', dump_json)
+    _timed(timings, 'json_load', load_reviews, json_path)
+    _timed(timings, 'jsonl_dump', dump_jsonl)
+    _timed(timings, 'jsonl_load', load_reviews, jsonl_path)
+    return {'store_bytes': store_path.stat().st_size, 'json_bytes': json_path.stat().st_size,
+            'jsonl_bytes': jsonl_path.stat().st_size}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Scaling benchmark for the review audit tooling')
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 1000],
+                        help='Synthetic site sizes to run (10 to 10,000 pages)')
+    parser.add_argument('--reviews-per-page', type=int, default=12)
+    parser.add_argument('--duplication-rate', type=float, nargs='+', default=[0.3],
+                        help='Share of reviews copied from earlier pages')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N')
+    parser.add_argument('--similarity-backend', choices=['minhash', 'tfidf', 'external'], default='minhash')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, default=Path('audit_benchmark_results.json'))
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.similarity_backend == 'tfidf' and not tfidf_available():
+        sys.exit("❌ NumPy is not installed; the tfidf similarity backend needs it")
+    print("⏱️  I LOCKSMITH AUDIT SCALING BENCHMARK")
+    print("=" * 70)
+
+    results = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'reviews_per_page': args.reviews_per_page,
+        'jobs': args.jobs,
+        'similarity_backend': args.similarity_backend,
+        'runs': []
+    }
+
+    for duplication_rate in args.duplication_rate:
+        for pages in args.pages:
+            with tempfile.TemporaryDirectory(prefix='audit-bench-') as site_root:
+                generate_site(site_root, pages, args.reviews_per_page, duplication_rate, args.seed)
+                timings, counts = run_benchmark(Path(site_root), args.stages, args.jobs,
+                                               args.similarity_backend)
+
+            results['runs'].append({
+                'pages': pages,
+                'duplication_rate': duplication_rate,
+                'timings': timings,
+                'counts': counts
+            })
+            stage_summary = ', '.join(f"{stage} {seconds:.3f}s" for stage, seconds in timings.items())
+            print(f"  📄 {pages} pages @ {duplication_rate:.0%} duplication: {stage_summary}")
+            sys.stdout.flush()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n✅ Benchmark results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import hashlib
+from pathlib import Path
+import page_weight
+import review_extractor
+from review_extractor import extract_review_data, EXTRACTOR_VERSION
+
+CACHE_FILENAME = '.audit_cache.json'
+
+
+def _file_sha256(filepath):
+    """Content hash used when size/mtime alone can't prove a page is unchanged"""
+    with open(filepath, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def extractor_fingerprint():
+    """Identify the extractor build so cached pages are dropped when it changes"""
+    source = b''.join(Path(module.__file__).read_bytes() for module in (review_extractor, page_weight))
+    return f"{EXTRACTOR_VERSION}:{hashlib.sha256(source).hexdigest()[:16]}"
+
+
+class AuditCache:
+    """Persistent per-page extraction cache keyed by path + size + mtime
+
+    Pages whose size and mtime match are served straight from the cache.
+    If only the mtime moved (checkout, touch, copy) the content hash decides.
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = Path(cache_path)
+        self.fingerprint = extractor_fingerprint()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """Read the cache file, discarding it if another extractor wrote it"""
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get('fingerprint') == self.fingerprint:
+            self.entries = data.get('pages', {})
+
+    def lookup(self, filepath, schema=None, weight=None):
+        """Return cached (reviews, service_tags) for an unchanged page, else None
+
+        On a hit the page's JSON-LD data is copied into `schema` and its
+        page weight into `weight` if given.
+        """
+        key = str(filepath)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        stat = os.stat(filepath)
+        if entry['size'] != stat.st_size:
+            return None
+        if entry['mtime_ns'] != stat.st_mtime_ns:
+            if entry['sha256'] != _file_sha256(filepath):
+                return None
+            entry['mtime_ns'] = stat.st_mtime_ns
+            self._dirty = True
+
+        if schema is not None:
+            schema.update(entry['schema'])
+        if weight is not None:
+            weight.update(entry['weight'])
+        return entry['reviews'], entry['service_tags']
+
+    def store(self, filepath, reviews, service_tags, schema, weight, sha256=None):
+        """Record the extraction result for a page
+
+        `sha256` is the hex digest of the bytes that were extracted, taken
+        from the extractor's own read; the file is only hashed again when
+        it isn't given.
+        """
+        stat = os.stat(filepath)
+        self.entries[str(filepath)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256 or _file_sha256(filepath),
+            'reviews': reviews,
+            'service_tags': service_tags,
+            'schema': schema,
+            'weight': weight
+        }
+        self._dirty = True
+
+    def extract(self, filepath, schema=None, weight=None):
+        """Extract a page, parsing it only if it changed since the last run"""
+        cached = self.lookup(filepath, schema, weight)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        page_schema = {}
+        page_weight = {}
+        digest = hashlib.sha256()
+        reviews, service_tags = extract_review_data(filepath, schema=page_schema, weight=page_weight, digest=digest)
+        self.store(filepath, reviews, service_tags, page_schema, page_weight, digest.hexdigest())
+        if schema is not None:
+            schema.update(page_schema)
+        if weight is not None:
+            weight.update(page_weight)
+        return reviews, service_tags
+
+    def save(self):
+        """Write the cache back, dropping pages that no longer exist"""
+        stale = [key for key in self.entries if not os.path.exists(key)]
+        for key in stale:
+            del self.entries[key]
+
+        if not self._dirty and not stale:
+            return
+
+        tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'pages': self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+import json
+import hashlib
+from pathlib import Path
+from collections import Counter
+from review_store import ReviewStore, load_reviews, STORE_SUFFIX, JSONL_SUFFIX
+from review_index import ReviewIndex
+
+DIFF_FILENAME = 'comprehensive_audit_diff.json'
+
+# Similarity scores are compared at this precision, so float noise isn't a change
+SIMILARITY_DIGITS = 4
+
+
+def hash_key(value):
+    """Short stable hash of any JSON-serialisable value"""
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+def review_key(page, review):
+    return hash_key([page, review])
+
+
+def similar_pair_keys(similar_reviews):
+    """{"key1:key2": similarity} for find_similar_pairs output, order-independent
+
+    A page repeating the same review makes several pairs with the same two
+    keys; the copies after the first are numbered ("key1:key2#2") so
+    they're counted rather than merged.
+    """
+    pairs = {}
+    seen = Counter()
+    for pair in similar_reviews:
+        keys = []
+        for side in (pair['review1'], pair['review2']):
+            keys.append(review_key(side['page'], {'customer': side['customer'], 'text': side['text']}))
+        key = ':'.join(sorted(keys))
+        seen[key] += 1
+        if seen[key] > 1:
+            key += f"#{seen[key]}"
+        pairs[key] = round(pair['similarity'], SIMILARITY_DIGITS)
+    return pairs
+
+
+def _issue_keys(issues):
+    """Identity key -> (content hash, issue) for tag/schema issues
+
+    The identity is the page, the kind of issue (the text before any
+    ':' detail) and the customer, numbered when a page repeats it; the
+    content hash tells a changed issue from an unchanged one.
+    """
+    keyed = {}
+    seen = Counter()
+    for issue in issues:
+        identity = (issue.get('page'), issue['issue'].split(':')[0], issue.get('customer'))
+        seen[identity] += 1
+        keyed[hash_key(list(identity) + [seen[identity]])] = (hash_key(issue), issue)
+    return keyed
+
+
+def _page_reviews(store):
+    """page -> (category, Counter of review hashes, {hash: review})"""
+    pages = {}
+    for page_id, page in enumerate(store.pages.values):
+        reviews = {}
+        counts = Counter()
+        for review in store.page_reviews(page_id):
+            key = review_key(page, review)
+            counts[key] += 1
+            reviews[key] = review
+        pages[page] = (store.page_category_name(page_id), counts, reviews)
+    return pages
+
+
+def diff_pages(baseline_store, store):
+    """New, removed and changed pages, comparing each page's multiset of review hashes"""
+    before, after = _page_reviews(baseline_store), _page_reviews(store)
+    changed = []
+    for page in after.keys() & before.keys():
+        category_before, counts_before, reviews_before = before[page]
+        category_after, counts_after, reviews_after = after[page]
+        if category_before == category_after and counts_before == counts_after:
+            continue
+        added = counts_after - counts_before
+        removed = counts_before - counts_after
+        changed.append({
+            'page': page,
+            'category': [category_before, category_after] if category_before != category_after else category_after,
+            'added_reviews': [reviews_after[key].get('customer_name', 'Unknown') for key in added.elements()],
+            'removed_reviews': [reviews_before[key].get('customer_name', 'Unknown') for key in removed.elements()]
+        })
+    return {
+        'new': [page for page in after if page not in before],
+        'resolved': [page for page in before if page not in after],
+        'changed': sorted(changed, key=lambda entry: entry['page'])
+    }
+
+
+def diff_duplicate_names(before, after):
+    return {
+        'new': {name: pages for name, pages in after.items() if name not in before},
+        'resolved': {name: pages for name, pages in before.items() if name not in after},
+        'changed': {name: {'before': before[name], 'after': pages}
+                    for name, pages in after.items() if name in before and sorted(before[name]) != sorted(pages)}
+    }
+
+
+def diff_similar_pairs(before, after, describe):
+    """Diff {"key1:key2": similarity} maps; describe(pair_key) names the two reviews"""
+    return {
+        'new': [describe(key) + [score] for key, score in after.items() if key not in before],
+        'resolved': [describe(key) + [score] for key, score in before.items() if key not in after],
+        'changed': [describe(key) + [before[key], score] for key, score in after.items()
+                    if key in before and before[key] != score]
+    }
+
+
+def diff_issues(before, after):
+    before, after = _issue_keys(before), _issue_keys(after)
+    return {
+        'new': [issue for key, (_, issue) in after.items() if key not in before],
+        'resolved': [issue for key, (_, issue) in before.items() if key not in after],
+        'changed': [{'before': before[key][1], 'after': issue} for key, (content, issue) in after.items()
+                    if key in before and before[key][0] != content]
+    }
+
+
+def _review_labels(*stores):
+    """review hash -> "page (customer)" for describing similar pairs"""
+    labels = {}
+    for store in stores:
+        if store is None:
+            continue
+        for page_id, page in enumerate(store.pages.values):
+            for review in store.page_reviews(page_id):
+                if 'review_text' in review:
+                    customer = review.get('customer_name', 'Unknown')
+                    key = review_key(page, {'customer': customer, 'text': review['review_text']})
+                    labels[key] = f"{page} ({customer})"
+    return labels
+
+
+def diff_audits(baseline, current):
+    """Diff two {'store', 'duplicate_names', 'similar_pairs', 'tag_issues', 'schema_issues'} audits
+
+    Only new, resolved and changed entries are returned, so the report
+    grows with the size of the change rather than the size of the site.
+    """
+    labels = _review_labels(baseline['store'], current['store'])
+
+    def describe(pair_key):
+        return [labels.get(key, key) for key in pair_key.split('#')[0].split(':')]
+
+    diff = {}
+    if baseline['store'] is not None:
+        diff['pages'] = diff_pages(baseline['store'], current['store'])
+    diff['duplicate_names'] = diff_duplicate_names(baseline['duplicate_names'], current['duplicate_names'])
+    diff['similar_pairs'] = diff_similar_pairs(baseline['similar_pairs'], current['similar_pairs'], describe)
+    diff['tag_issues'] = diff_issues(baseline['tag_issues'], current['tag_issues'])
+    if 'schema_issues' in baseline:
+        # Runs from before the JSON-LD cross-check have nothing to compare against
+        diff['schema_issues'] = diff_issues(baseline['schema_issues'], current['schema_issues'])
+    return diff
+
+
+def count_changes(diff, kind):
+    """Number of `kind` ('new', 'resolved' or 'changed') entries across all sections"""
+    return sum(len(section[kind]) for section in diff.values())
+
+
+def load_baseline(path):
+    """Load a previous run: results JSON, review store / JSONL dump, or SQLite index
+
+    Returns the review store (None if the results no longer point at one)
+    and whatever findings the file recorded; missing findings are left for
+    the caller to recompute from the store. Raises FileNotFoundError when
+    `path` doesn't exist and ValueError for a SQLite file that isn't a
+    review index; the baseline is only ever read.
+    """
+    path = Path(path)
+    if not path.is_file():
+        raise FileNotFoundError(2, 'No such file or directory', str(path))
+    if path.suffix == '.sqlite':
+        with ReviewIndex(path, read_only=True) as index:
+            return {'store': index.to_store()}
+    if path.suffix in (STORE_SUFFIX, JSONL_SUFFIX):
+        return {'store': load_reviews(path)}
+
+    with open(path, 'r') as f:
+        data = json.load(f)
+    baseline = {key: data[key] for key in ('duplicate_names', 'similar_pairs', 'tag_issues', 'schema_issues')
+                if key in data}
+    baseline['store'] = None
+    if 'all_reviews' in data:
+        baseline['store'] = ReviewStore.from_dict(data['all_reviews'])
+    elif 'reviews_store' in data and (path.parent / data['reviews_store']).exists():
+        baseline['store'] = load_reviews(path.parent / data['reviews_store'])
+    return baseline
+
+
+def _print_limited(lines, limit):
+    for line in lines[:limit]:
+        print(line)
+    if len(lines) > limit:
+        print(f"   ... and {len(lines) - limit} more")
+
+
+def print_diff(diff, limit=10):
+    """Print the diff, at most `limit` entries per kind of change (the JSON has them all)"""
+    print(f"➕ {count_changes(diff, 'new')} new, ✅ {count_changes(diff, 'resolved')} resolved, "
+          f"🔁 {count_changes(diff, 'changed')} changed")
+
+    if 'pages' in diff:
+        section = diff['pages']
+        _print_limited([f"   ➕ New page: {page}" for page in section['new']], limit)
+        _print_limited([f"   ➖ Page gone: {page}" for page in section['resolved']], limit)
+        _print_limited([f"   🔁 {entry['page']}: +{len(entry['added_reviews'])} / -{len(entry['removed_reviews'])} reviews"
+                        for entry in section['changed']], limit)
+
+    section = diff['duplicate_names']
+    _print_limited([f"   ⚠️  New duplicate customer name: {name} ({len(pages)} reviews)"
+                    for name, pages in section['new'].items()], limit)
+    _print_limited([f"   ✅ No longer duplicated: {name}" for name in section['resolved']], limit)
+    _print_limited([f"   🔁 {name}: {len(change['before'])} → {len(change['after'])} reviews"
+                    for name, change in section['changed'].items()], limit)
+
+    section = diff['similar_pairs']
+    _print_limited([f"   ⚠️  New similar pair ({score:.0%}): {first} ↔ {second}"
+                    for first, second, score in section['new']], limit)
+    _print_limited([f"   ✅ No longer similar: {first} ↔ {second}" for first, second, _ in section['resolved']], limit)
+    _print_limited([f"   🔁 Similarity {before:.0%} → {after:.0%}: {first} ↔ {second}"
+                    for first, second, before, after in section['changed']], limit)
+
+    for label, key in [('Tag issue', 'tag_issues'), ('Structured data issue', 'schema_issues')]:
+        if key not in diff:
+            continue
+        section = diff[key]
+        _print_limited([f"   ⚠️  New {label.lower()}: {issue.get('page')}: {issue['issue']}"
+                        for issue in section['new']], limit)
+        _print_limited([f"   ✅ {label} resolved: {issue.get('page')}: {issue['issue']}"
+                        for issue in section['resolved']], limit)
+        _print_limited([f"   🔁 {label} changed: {change['after'].get('page')}: {change['after']['issue']}"
+                        for change in section['changed']], limit)
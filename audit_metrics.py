@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import json
+import cProfile
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+
+# How many of the slowest pages the metrics file calls out
+SLOWEST_PAGES = 10
+
+_DONE = object()
+
+
+def timed_iter(iterable, stats, key):
+    """Iterate while adding the time spent producing each item to stats[key]"""
+    iterator = iter(iterable)
+    while True:
+        start = perf_counter()
+        item = next(iterator, _DONE)
+        stats[key] = stats.get(key, 0.0) + perf_counter() - start
+        if item is _DONE:
+            return
+        yield item
+
+
+class AuditMetrics:
+    """Stage timers, per-page timers and hot-path counters for one audit run
+
+    Per-page stats come from the extractor (they are measured inside worker
+    processes when --jobs is used); stage timings and the optional
+    tracemalloc peaks are measured in the main process.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.stages = {}
+        self.pages = {}
+        self.counters = Counter()
+        self.trace_memory = trace_memory
+        if trace_memory:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage; repeated stages accumulate"""
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            entry['seconds'] += perf_counter() - start
+            entry['calls'] += 1
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                entry['peak_bytes'] = max(entry.get('peak_bytes', 0), peak)
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def add_counts(self, stats, prefix=''):
+        """Fold a stats dict (counts and *_seconds timers) into the run totals"""
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.counters[prefix + key] += value
+
+    def record_page(self, page, stats):
+        """Keep a page's extraction stats and add them to the run totals"""
+        self.pages[str(page)] = stats
+        self.add_counts(stats)
+        self.count('pages')
+
+    def slowest_pages(self, limit=SLOWEST_PAGES):
+        timed = [(stats.get('seconds', 0.0), page) for page, stats in self.pages.items()]
+        return [{'page': page, **self.pages[page]} for _, page in sorted(timed, reverse=True)[:limit]]
+
+    def to_dict(self):
+        result = {
+            'stages': {name: dict(entry, seconds=round(entry['seconds'], 6))
+                       for name, entry in self.stages.items()},
+            'counters': {key: round(value, 6) if isinstance(value, float) else value
+                         for key, value in sorted(self.counters.items())},
+            'slowest_pages': self.slowest_pages(),
+            'pages': self.pages
+        }
+        if self.trace_memory:
+            result['peak_traced_bytes'] = max((entry.get('peak_bytes', 0) for entry in self.stages.values()),
+                                              default=0)
+        return result
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def print_summary(self):
+        print("\n⏱️  STAGE TIMINGS")
+        print("-" * 40)
+        for name, entry in self.stages.items():
+            line = f"   • {name}: {entry['seconds']:.3f}s"
+            if 'peak_bytes' in entry:
+                line += f" (peak {entry['peak_bytes'] / 1024:.0f} KB)"
+            print(line)
+        slowest = self.slowest_pages(3)
+        if slowest:
+            print("   Slowest pages:")
+            for page in slowest:
+                print(f"     - {page['page']}: {page.get('seconds', 0.0) * 1000:.1f} ms")
+
+
+@contextmanager
+def profiled(path):
+    """Run the block under cProfile and dump the stats to `path` (no-op if None)"""
+    if not path:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+import os
+import hashlib
+from collections import deque
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from review_extractor import extract_review_data
+
+# Pages per worker task at the start of a stream whose length isn't known;
+# batches grow with the number of pages discovered so far
+STREAM_CHUNK_SIZE = 2
+
+
+def _extract_page(page_path, collect_stats=False):
+    """Worker entry point: never raises, failures come back as an error string"""
+    stats = {} if collect_stats else None
+    # JSON-LD data, page weight and the content hash are always collected so
+    # the cache has them for later runs without reading the page again
+    schema = {}
+    weight = {}
+    digest = hashlib.sha256()
+    start = perf_counter()
+    try:
+        reviews, service_tags = extract_review_data(page_path, stats=stats, schema=schema, weight=weight,
+                                                    digest=digest)
+        result = reviews, service_tags, None
+    except Exception as e:
+        result = [], [], f"{type(e).__name__}: {e}"
+    if stats is not None:
+        stats['seconds'] = perf_counter() - start
+        stats['reviews'] = len(result[0])
+    return result + (stats, schema, weight, digest.hexdigest())
+
+
+def resolve_jobs(jobs):
+    """Map the --jobs value to a worker count (0 means one per CPU)"""
+    if not jobs or jobs < 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def chunk_size_for(page_count, jobs):
+    """Pick a chunksize that gives each worker ~4 batches to balance uneven pages"""
+    return max(1, page_count // (jobs * 4))
+
+
+def _extract_batch(page_paths, collect_stats=False):
+    """Worker entry point for a batch of pages"""
+    return [_extract_page(page_path, collect_stats) for page_path in page_paths]
+
+
+def _cache_lookup(cache, metrics, schemas, weights, page_path):
+    if cache is None:
+        return None
+    schema = {}
+    weight = {}
+    try:
+        hit = cache.lookup(page_path, schema, weight)
+    except OSError:
+        return None
+    if hit is not None:
+        cache.hits += 1
+        if metrics is not None:
+            metrics.record_page(page_path, {'cached': True, 'seconds': 0.0, 'reviews': len(hit[0])})
+        if schemas is not None:
+            schemas[page_path] = schema
+        if weights is not None:
+            weights[page_path] = weight
+    return hit
+
+
+def _record(cache, metrics, schemas, weights, page_path, result):
+    """Store a fresh extraction in the cache, metrics, schemas and weights, return (reviews, tags, error)"""
+    reviews, service_tags, error, stats, schema, weight, sha256 = result
+    if cache is not None and error is None:
+        cache.misses += 1
+        cache.store(page_path, reviews, service_tags, schema, weight, sha256)
+    if metrics is not None and stats is not None:
+        metrics.record_page(page_path, stats)
+        if error:
+            metrics.count('page_errors')
+    if schemas is not None:
+        schemas[page_path] = schema
+    if weights is not None and error is None:
+        weights[page_path] = weight
+    return reviews, service_tags, error
+
+
+def _extract_inline(pages, cache, metrics, schemas, weights):
+    for page_path, category in pages:
+        hit = _cache_lookup(cache, metrics, schemas, weights, page_path)
+        if hit is not None:
+            yield page_path, category, hit[0], hit[1], None
+        else:
+            result = _extract_page(page_path, metrics is not None)
+            yield (page_path, category) + _record(cache, metrics, schemas, weights, page_path, result)
+
+
+def _extract_pooled(pages, jobs, cache, metrics, schemas, weights, page_count=None):
+    """Submit batches as pages are discovered, yield results in discovery order
+
+    With a known `page_count` every batch is sized from it. A stream starts
+    with batches of STREAM_CHUNK_SIZE so the workers get going at once, then
+    sizes each batch from the pages discovered so far, which keeps batches
+    at no more than ~1/4 of a worker's share however long the stream runs.
+    """
+    # Each window entry is (items, future); cached pages carry their result directly
+    window = deque()
+    batch = []
+    seen = 0
+
+    def flush(executor):
+        if not batch:
+            return
+        try:
+            future = executor.submit(_extract_batch, [page_path for page_path, _ in batch], metrics is not None)
+        except (BrokenProcessPool, RuntimeError) as e:
+            future = [([], [], f"worker pool unavailable: {e}")] * len(batch)
+        window.append((list(batch), future))
+        batch.clear()
+
+    def drain(block):
+        while window:
+            items, future = window[0]
+            if isinstance(future, list):
+                results = future
+            elif block or future.done():
+                try:
+                    results = [_record(cache, metrics, schemas, weights, page_path, result)
+                               for (page_path, _), result in zip(items, future.result())]
+                except BrokenProcessPool as e:
+                    results = [([], [], f"worker process died: {e}")] * len(items)
+            else:
+                return
+            window.popleft()
+            for (page_path, category), result in zip(items, results):
+                yield (page_path, category) + result
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for page_path, category in pages:
+            seen += 1
+            if page_count:
+                chunksize = chunk_size_for(page_count, jobs)
+            else:
+                chunksize = max(STREAM_CHUNK_SIZE, chunk_size_for(seen, jobs))
+            hit = _cache_lookup(cache, metrics, schemas, weights, page_path)
+            if hit is not None:
+                # Cached pages still wait their turn so output order is stable
+                flush(executor)
+                window.append(([(page_path, category)], [(hit[0], hit[1], None)]))
+            else:
+                batch.append((page_path, category))
+                if len(batch) >= chunksize:
+                    flush(executor)
+            yield from drain(block=False)
+
+        flush(executor)
+        yield from drain(block=True)
+
+
+def extract_pages(pages, jobs=1, cache=None, metrics=None, schemas=None, weights=None):
+    """Extract every page, spreading uncached pages over a process pool
+
+    `pages` is an iterable of (page_path, category) pairs, typically straight
+    from page_discovery.discover_pages, and is consumed lazily so extraction
+    overlaps with discovery; worker batches grow as pages turn up (a list
+    gets batches sized from its length up front). Yields (page_path, category, reviews,
+    service_tags, error) in input order, so output stays deterministic
+    whatever the worker count. Per-page stats go to `metrics` if given, and
+    each page's JSON-LD review data to `schemas[page_path]` and its page
+    weight to `weights[page_path]` for whichever of them is a dict.
+    """
+    jobs = resolve_jobs(jobs)
+    if jobs <= 1:
+        yield from _extract_inline(pages, cache, metrics, schemas, weights)
+        return
+
+    page_count = len(pages) if hasattr(pages, '__len__') else None
+    yield from _extract_pooled(pages, jobs, cache, metrics, schemas, weights, page_count)
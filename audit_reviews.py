@@ -1,142 +1,118 @@
 #!/usr/bin/env python3
 
 import os
-import re
+import sys
+import argparse
 import json
 from pathlib import Path
-import html
+from contextlib import nullcontext
 from collections import defaultdict
-
-def extract_reviews_from_html(filepath):
-    """Extract all reviews from an HTML file"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except Exception as e:
-        print(f"Error reading {filepath}: {e}")
-        return []
-
-    reviews = []
-
-    # Pattern to match review cards - more comprehensive
-    review_pattern = r'<div class="review-card[^>]*>(.*?)</div>\s*</div>\s*</div>'
-    matches = re.findall(review_pattern, content, re.DOTALL)
-
-    for match in matches:
-        review_data = {}
-
-        # Extract customer name
-        name_pattern = r'<p class="font-bold[^>]*>([^<]+)</p>'
-        name_match = re.search(name_pattern, match)
-        if name_match:
-            review_data['customer_name'] = name_match.group(1).strip()
-
-        # Extract review text
-        text_pattern = r'<p class="text-[^>]*mb-6[^>]*>([^<]+)</p>'
-        text_match = re.search(text_pattern, match)
-        if not text_match:
-            # Try alternative pattern
-            text_pattern = r'<p[^>]*class="[^"]*text-[^"]*"[^>]*>([^<]+)</p>'
-            text_match = re.search(text_pattern, match)
-
-        if text_match:
-            review_data['review_text'] = html.unescape(text_match.group(1).strip())
-
-        # Extract service tag - updated pattern
-        tag_pattern = r'<div class="service-tag[^>]*>[\s\S]*?<span[^>]*>([^<]+)</span>'
-        tag_match = re.search(tag_pattern, match)
-        if tag_match:
-            review_data['service_tag'] = tag_match.group(1).strip()
-
-        # Extract location if present
-        location_pattern = r'<span[^>]*>([^<]*(?:Indiana|IN)[^<]*)</span>'
-        location_match = re.search(location_pattern, match, re.IGNORECASE)
-        if location_match:
-            review_data['location'] = location_match.group(1).strip()
-
-        if review_data:
-            reviews.append(review_data)
-
-    return reviews
-
-def categorize_pages():
-    """Categorize all HTML pages by type"""
-    base_path = Path('/Users/yaronhayo/Desktop/I Locksmith 2025/i-locksmith')
-
-    categories = {
-        'service_area_pages': [],
-        'service_category_pages': [],
-        'individual_service_pages': [],
-        'main_pages': []
-    }
-
-    # Service area pages
-    service_area_dir = base_path / 'service-areas'
-    if service_area_dir.exists():
-        categories['service_area_pages'] = list(service_area_dir.glob('locksmith-*.html'))
-
-    # Main pages
-    for main_page in ['index.html', 'about.html', 'services.html', 'service-areas.html']:
-        page_path = base_path / main_page
-        if page_path.exists():
-            categories['main_pages'].append(page_path)
-
-    # Service pages
-    services_dir = base_path / 'services'
-    if services_dir.exists():
-        # Service category pages
-        category_pages = ['residential-locksmith.html', 'auto-locksmith.html', 'commercial-locksmith.html']
-        for page in category_pages:
-            page_path = services_dir / page
-            if page_path.exists():
-                categories['service_category_pages'].append(page_path)
-
-        # Individual service pages
-        individual_pages = [
-            'car-lockout.html', 'house-lockout.html', 'business-lockout.html',
-            'storage-unit-lockout.html', 'lock-rekey.html', 'lock-replacement.html',
-            'car-key-replacement.html'
-        ]
-        for page in individual_pages:
-            page_path = services_dir / page
-            if page_path.exists():
-                categories['individual_service_pages'].append(page_path)
-
-    return categories
-
-def main():
+from audit_cache import AuditCache, CACHE_FILENAME
+from audit_parallel import extract_pages
+from audit_metrics import AuditMetrics, profiled
+from review_store import ReviewStore, PageRecordWriter, FORMAT_SUFFIXES
+from review_index import ReviewIndex, INDEX_FILENAME
+from page_discovery import discover_pages, load_page_rules, relative_page_path, DEFAULT_ROOT
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Extract review cards from every site page')
+    parser.add_argument('--root', type=Path, default=DEFAULT_ROOT,
+                        help='Site root to audit (default: the directory holding this script)')
+    parser.add_argument('--rules', type=Path, default=None,
+                        help='Page-type rules file (default: page_rules.json)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-parse every page instead of reusing unchanged results from ' + CACHE_FILENAME)
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help='Extract pages in N worker processes (0 = one per CPU core)')
+    parser.add_argument('--format', choices=sorted(FORMAT_SUFFIXES), default='store',
+                        help='Save reviews as a compact binary store (default), the legacy indented JSON, '
+                             'or JSON Lines written page by page as pages are extracted')
+    parser.add_argument('--index', nargs='?', const=INDEX_FILENAME, default=None, metavar='PATH',
+                        help='Also write the reviews to a SQLite index (default name: ' + INDEX_FILENAME +
+                             ', relative to the site root)')
+    parser.add_argument('--metrics', type=Path, default=None, metavar='PATH',
+                        help='Write per-stage and per-page timings and counters to a JSON file')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Track peak Python memory per stage with tracemalloc')
+    parser.add_argument('--profile', type=Path, default=None, metavar='PATH',
+                        help='Dump cProfile stats for the whole run to PATH')
+    return parser.parse_args()
+
+def run_audit(args):
     print("🔍 Starting comprehensive I Locksmith website review audit...")
     print("=" * 70)
 
-    # Categorize pages
-    categories = categorize_pages()
-
-    # Extract reviews from all pages
-    all_reviews = {}
-
-    for category_name, pages in categories.items():
-        print(f"\n📋 Processing {category_name.replace('_', ' ').title()}:")
-        print("-" * 50)
-
-        for page_path in pages:
-            reviews = extract_reviews_from_html(page_path)
-            relative_path = str(page_path).replace('/Users/yaronhayo/Desktop/I Locksmith 2025/i-locksmith/', '')
-            all_reviews[relative_path] = {
-                'category': category_name,
-                'reviews': reviews
-            }
-            print(f"  📄 {relative_path}: {len(reviews)} reviews found")
+    root = args.root.resolve()
+    if not root.is_dir():
+        sys.exit(f"❌ Site root not found: {root}")
+    rules = load_page_rules(args.rules) if args.rules else None
+    cache = None if args.no_cache else AuditCache(root / CACHE_FILENAME)
+    metrics = AuditMetrics(trace_memory=args.trace_memory)
+
+    # Discovery is lazy: each page is extracted as soon as it is found, and
+    # results come back in discovery order however many workers run
+    pages = discover_pages(root, rules)
+    failed_pages = []
+    store = ReviewStore()
+
+    # With --format jsonl each page is written out as soon as it is extracted
+    output_name = 'review_audit_data' + FORMAT_SUFFIXES[args.format]
+    writer = PageRecordWriter(root / output_name) if args.format == 'jsonl' else nullcontext()
+
+    print(f"\n📋 Processing pages under {root}:")
+    print("-" * 50)
+
+    with metrics.stage('extraction'), writer:
+        for page_path, category_name, reviews, _, error in extract_pages(pages, jobs=args.jobs, cache=cache, metrics=metrics):
+            if error:
+                failed_pages.append(page_path)
+                print(f"Error reading {page_path}: {error}")
+            relative_path = relative_page_path(page_path, root)
+            store.add_page(relative_path, category_name, reviews)
+            if args.format == 'jsonl':
+                writer.add_page(relative_path, category_name, reviews)
+
+            print(f"  📄 {relative_path} [{category_name}]: {len(reviews)} reviews found")
+
+    if cache is not None:
+        cache.save()
+        print(f"\n💾 Cache: {cache.hits} pages unchanged, {cache.misses} re-parsed")
+
+    if failed_pages:
+        print(f"\n⚠️  {len(failed_pages)} pages could not be extracted and are recorded with no reviews")
 
     # Save raw data for detailed analysis
-    with open('/Users/yaronhayo/Desktop/I Locksmith 2025/i-locksmith/review_audit_data.json', 'w') as f:
-        json.dump(all_reviews, f, indent=2, ensure_ascii=False)
-
-    print(f"\n✅ Audit complete! Data saved to review_audit_data.json")
-    print(f"📊 Total pages processed: {len(all_reviews)}")
+    with metrics.stage('json_dump'):
+        if args.format == 'store':
+            store.save(root / output_name)
+        elif args.format == 'json':
+            with open(root / output_name, 'w') as f:
+                json.dump(store.to_dict(), f, indent=2, ensure_ascii=False)
+
+    print(f"\n✅ Audit complete! Data saved to {output_name}")
+    if args.index:
+        with metrics.stage('index'):
+            with ReviewIndex(root / args.index) as index:
+                index.write_store(store)
+        print(f"✅ Review index updated: {root / args.index}")
+    print(f"📊 Total pages processed: {store.page_count}")
 
     # Quick summary
-    total_reviews = sum(len(data['reviews']) for data in all_reviews.values())
+    total_reviews = store.review_count
     print(f"📋 Total reviews found: {total_reviews}")
+    return metrics
+
+def main():
+    args = parse_args()
+    with profiled(args.profile):
+        metrics = run_audit(args)
+
+    if args.metrics:
+        metrics.write(args.metrics)
+        metrics.print_summary()
+        print(f"📊 Metrics saved to {args.metrics}")
+    if args.profile:
+        print(f"📊 Profile saved to {args.profile}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
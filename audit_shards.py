@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+from audit_cache import AuditCache, CACHE_FILENAME, extractor_fingerprint
+from audit_parallel import extract_pages
+from audit_metrics import AuditMetrics
+from audit_analyzers import map_analyzers, reduce_analyzers, default_analyzers
+from page_discovery import discover_pages, load_page_rules, relative_page_path, DEFAULT_ROOT
+from review_store import ReviewStore, PageRecordWriter, FORMAT_SUFFIXES
+from schema_check import check_page_schema, check_aggregate_ratings
+from page_weight import load_budgets, check_page, ImageSizes, BUDGETS_FILENAME
+from service_taxonomy import load_service_taxonomy, TAXONOMY_FILENAME
+from tfidf_similarity import tfidf_available
+from score_cache import ScoreCache, SCORE_CACHE_FILENAME
+from comprehensive_audit import audit_findings, save_results, RESULTS_FILENAME, REVIEWS_BASENAME
+
+# Bumped whenever the partial file layout changes
+PARTIAL_VERSION = 3
+
+# Seconds between checks for missing partials while the reducer waits
+WAIT_INTERVAL = 1.0
+
+
+def shard_of(page, shard_count):
+    """Shard a relative page path belongs to: the same on every machine and every run"""
+    digest = hashlib.blake2b(page.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shard_count
+
+
+def partial_path(exchange, shard, shard_count):
+    return Path(exchange) / f"shard-{shard:04d}-of-{shard_count:04d}.json"
+
+
+def shard_cache_path(root, shard, shard_count):
+    """Per-shard extraction cache, so mappers sharing a site root don't overwrite each other"""
+    return root / CACHE_FILENAME.replace('.json', f'.shard-{shard}-of-{shard_count}.json')
+
+
+def discovery_digest(pages):
+    """Fingerprint of the full page list, so the reducer can tell every mapper saw the same site"""
+    digest = hashlib.blake2b(digest_size=16)
+    for page, category in pages:
+        digest.update(f"{page}\0{category}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def map_shard(root, shard, shard_count, exchange, rules=None, taxonomy=None, budgets=None,
+              similarity_backend='minhash', jobs=1, cache=None, metrics=None):
+    """Audit the pages hashed to one shard and write its partial results to `exchange`
+
+    Every mapper discovers the whole site, so pages keep their single-run
+    position (`rank`), but only extracts its own share. The partial holds
+    each page's reviews, per-page schema and weight checks, and the
+    analyzers' mergeable state (name -> pages multimaps, tag counters,
+    review texts with their MinHash signatures).
+    """
+    budgets = budgets if budgets is not None else load_budgets()
+    discovered = list(discover_pages(root, rules))
+    pages = [(relative_page_path(page_path, root), category) for page_path, category in discovered]
+    rank = {page: position for position, (page, _) in enumerate(pages)}
+    mine = [(page_path, category) for (page_path, category), (page, _) in zip(discovered, pages)
+            if shard_of(page, shard_count) == shard]
+
+    schemas = {}
+    weights = {}
+    store = ReviewStore()
+    image_sizes = ImageSizes(root, budgets.get('image_dirs', []))
+    records = []
+    for page_path, category, reviews, service_tags, error in extract_pages(
+            mine, jobs=jobs, cache=cache, metrics=metrics, schemas=schemas, weights=weights):
+        page = relative_page_path(page_path, root)
+        store.add_page(page, category, reviews, service_tags)
+        schema = schemas.get(page_path, {})
+        record = {
+            'page': page,
+            'rank': rank[page],
+            'category': category,
+            'reviews': reviews,
+            'service_tags': service_tags,
+            'error': error,
+            'schema_issues': check_page_schema(page, reviews, schema)
+        }
+        if schema.get('aggregate_ratings'):
+            # The AggregateRating check compares every page against the site-wide majority
+            record['schema'] = {'aggregate_ratings': schema['aggregate_ratings'], 'reviews': schema.get('reviews', [])}
+        if page_path in weights:
+            record['page_weight'] = check_page(page, category, weights[page_path], budgets, image_sizes)
+        records.append(record)
+
+    partial = {
+        'version': PARTIAL_VERSION,
+        'fingerprint': extractor_fingerprint(),
+        'shard': shard,
+        'shard_count': shard_count,
+        'discovery': discovery_digest(pages),
+        'page_count': len(pages),
+        'similarity_backend': similarity_backend,
+        'pages': records,
+        'analyzers': map_analyzers(store, default_analyzers(taxonomy, similarity_backend), metrics)
+    }
+    Path(exchange).mkdir(parents=True, exist_ok=True)
+    _write_atomic(partial_path(exchange, shard, shard_count), partial)
+    return partial
+
+
+def load_partials(exchange, shard_count, wait=0.0):
+    """Read every shard's partial, waiting up to `wait` seconds for mappers still running
+
+    Raises FileNotFoundError naming the missing shards, or ValueError when
+    the partials can't be merged (different site, extractor or settings).
+    """
+    paths = [partial_path(exchange, shard, shard_count) for shard in range(shard_count)]
+    deadline = time.monotonic() + wait
+    missing = [path for path in paths if not path.exists()]
+    while missing and time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        missing = [path for path in missing if not path.exists()]
+    if missing:
+        raise FileNotFoundError(f"no partial results for {', '.join(path.name for path in missing)}")
+
+    partials = []
+    for path in paths:
+        with open(path, 'r') as f:
+            partials.append(json.load(f))
+
+    first = partials[0]
+    for partial in partials:
+        if partial.get('version') != PARTIAL_VERSION:
+            raise ValueError(f"shard {partial.get('shard')} was written by another version of {Path(__file__).name}")
+        for key in ('fingerprint', 'discovery', 'similarity_backend'):
+            if partial[key] != first[key]:
+                raise ValueError(f"shards {first['shard']} and {partial['shard']} disagree on {key}")
+    ranks = sorted(record['rank'] for partial in partials for record in partial['pages'])
+    if ranks != list(range(first['page_count'])):
+        raise ValueError(f"shards cover {len(ranks)} page slots of {first['page_count']} discovered pages")
+    return partials
+
+
+def reduce_shards(partials, taxonomy=None, metrics=None, score_cache=None):
+    """Merge shard partials into what a single comprehensive audit computes
+
+    Returns (store, records, analysis, schema_issues, weight_report) with
+    pages in single-run order, so the results are identical to an audit
+    of the whole site in one process. Pair scoring happens here, so this
+    is where a ScoreCache saves work.
+    """
+    records = sorted((record for partial in partials for record in partial['pages']),
+                     key=lambda record: record['rank'])
+    store = ReviewStore()
+    for record in records:
+        store.add_page(record['page'], record['category'], record['reviews'], record['service_tags'])
+
+    analyzers = default_analyzers(taxonomy, partials[0]['similarity_backend'], score_cache=score_cache)
+    analysis = reduce_analyzers(store, analyzers, [partial['analyzers'] for partial in partials], metrics)
+
+    schema_issues = [issue for record in records for issue in record['schema_issues']]
+    schema_issues.extend(check_aggregate_ratings({record['page']: record['schema']
+                                                  for record in records if 'schema' in record}))
+    weight_report = sorted((record['page_weight'] for record in records if 'page_weight' in record),
+                           key=lambda entry: (-entry['score'], entry['page']))
+    return store, records, analysis, schema_issues, weight_report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run the comprehensive audit as sharded map and reduce steps')
+    parser.add_argument('--shards', type=int, required=True, metavar='N',
+                        help='Number of shards the pages are hash-partitioned into')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--map', type=int, default=None, metavar='SHARD',
+                      help='Audit shard SHARD (0 to N-1) and write its partial results to --exchange')
+    mode.add_argument('--reduce', action='store_true',
+                      help='Merge every shard\'s partial results into ' + RESULTS_FILENAME)
+    mode.add_argument('--local', action='store_true',
+                      help='Run all N map steps as local processes, then the reduce step')
+    parser.add_argument('--exchange', type=Path, required=True, metavar='DIR',
+                        help='Shared directory the map steps write to and the reduce step reads from')
+    parser.add_argument('--wait', type=float, default=0.0, metavar='SECONDS',
+                        help='With --reduce, wait this long for missing shards (default: fail at once)')
+    parser.add_argument('--root', type=Path, default=DEFAULT_ROOT,
+                        help='Site root to audit, and where --reduce saves its results')
+    parser.add_argument('--rules', type=Path, default=None,
+                        help='Page-type rules file (default: page_rules.json)')
+    parser.add_argument('--taxonomy', type=Path, default=None,
+                        help='Service tag taxonomy (default: ' + TAXONOMY_FILENAME + ')')
+    parser.add_argument('--budgets', type=Path, default=None,
+                        help='Page weight budgets (default: ' + BUDGETS_FILENAME + ')')
+    parser.add_argument('--similarity-backend', choices=['minhash', 'tfidf'], default='minhash',
+                        help='Similarity backend the map steps prepare for (default: minhash)')
+    parser.add_argument('--format', choices=sorted(FORMAT_SUFFIXES), default='store',
+                        help='How --reduce saves the merged reviews (default: store)')
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help='Extract each shard\'s pages in N worker processes (0 = one per CPU core)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-parse every page instead of reusing the shard\'s extraction cache, '
+                             'and have --reduce re-score every review pair instead of reusing ' + SCORE_CACHE_FILENAME)
+    return parser.parse_args()
+
+
+def run_map(args, root):
+    shard, shard_count = args.map, args.shards
+    cache = None if args.no_cache else AuditCache(shard_cache_path(root, shard, shard_count))
+    metrics = AuditMetrics()
+    start = time.perf_counter()
+    partial = map_shard(root, shard, shard_count, args.exchange,
+                        rules=load_page_rules(args.rules) if args.rules else None,
+                        taxonomy=load_service_taxonomy(args.taxonomy), budgets=load_budgets(args.budgets),
+                        similarity_backend=args.similarity_backend, jobs=args.jobs, cache=cache, metrics=metrics)
+    if cache is not None:
+        cache.save()
+    reviews = sum(len(record['reviews']) for record in partial['pages'])
+    print(f"🗺️  Shard {shard}/{shard_count}: {len(partial['pages'])} of {partial['page_count']} pages, "
+          f"{reviews} reviews in {time.perf_counter() - start:.2f}s -> "
+          f"{partial_path(args.exchange, shard, shard_count)}")
+
+
+def run_reduce(args, root):
+    start = time.perf_counter()
+    try:
+        partials = load_partials(args.exchange, args.shards, args.wait)
+    except FileNotFoundError as e:
+        sys.exit(f"❌ Can't reduce yet: {e}")
+    except ValueError as e:
+        sys.exit(f"❌ Shards can't be merged: {e}")
+
+    score_cache = None if args.no_cache else ScoreCache(root / SCORE_CACHE_FILENAME)
+    store, records, analysis, schema_issues, weight_report = reduce_shards(
+        partials, load_service_taxonomy(args.taxonomy), AuditMetrics(), score_cache)
+    if score_cache is not None:
+        score_cache.save()
+    if args.format == 'jsonl':
+        with PageRecordWriter(root / (REVIEWS_BASENAME + FORMAT_SUFFIXES['jsonl']), include_service_tags=True) as writer:
+            for record in records:
+                writer.add_page(record['page'], record['category'], record['reviews'], record['service_tags'])
+    results = save_results(root, store, audit_findings(analysis, schema_issues, weight_report), args.format)
+
+    failed = [record['page'] for record in records if record['error']]
+    print(f"🧩 Merged {args.shards} shards: {store.page_count} pages, {store.review_count} reviews "
+          f"in {time.perf_counter() - start:.2f}s")
+    if failed:
+        print(f"⚠️  {len(failed)} pages could not be extracted and are recorded with no reviews")
+    print(f"   • {len(results['duplicate_names'])} duplicate customer names, "
+          f"{len(results['fuzzy_duplicate_names'])} spelled several ways")
+    print(f"   • {results['similar_reviews']} similar review pairs")
+    print(f"   • {len(results['tag_issues'])} service tag issues, {len(results['schema_issues'])} structured data issues")
+    print(f"   • {sum(1 for entry in weight_report if entry['over'])} pages over their weight budgets")
+    print(f"✅ Full audit data saved to {RESULTS_FILENAME}")
+    if args.format != 'json':
+        print(f"✅ Review data saved to {results['reviews_store']}")
+
+
+def run_local(args, root):
+    """Every shard as its own process, exchanging results through the directory like separate machines"""
+    command = [sys.executable, str(Path(__file__).resolve()), '--shards', str(args.shards),
+               '--exchange', str(args.exchange), '--root', str(root),
+               '--similarity-backend', args.similarity_backend, '--jobs', str(args.jobs)]
+    for flag, value in (('--rules', args.rules), ('--taxonomy', args.taxonomy), ('--budgets', args.budgets)):
+        if value is not None:
+            command += [flag, str(value)]
+    if args.no_cache:
+        command.append('--no-cache')
+
+    mappers = [subprocess.Popen(command + ['--map', str(shard)]) for shard in range(args.shards)]
+    failed = [shard for shard, mapper in enumerate(mappers) if mapper.wait() != 0]
+    if failed:
+        sys.exit(f"❌ Map step failed for shards {', '.join(map(str, failed))}")
+    run_reduce(args, root)
+
+
+def main():
+    args = parse_args()
+    root = args.root.resolve()
+    if args.shards < 1:
+        sys.exit("❌ --shards must be at least 1")
+    if args.similarity_backend == 'tfidf' and not tfidf_available():
+        sys.exit("❌ NumPy is not installed; the tfidf similarity backend needs it")
+    if args.map is not None:
+        if not 0 <= args.map < args.shards:
+            sys.exit(f"❌ Shard {args.map} is outside 0-{args.shards - 1}")
+        if not root.is_dir():
+            sys.exit(f"❌ Site root not found: {root}")
+        run_map(args, root)
+    elif args.reduce:
+        run_reduce(args, root)
+    else:
+        run_local(args, root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import json
+from collections import defaultdict, Counter
+from review_extractor import extract_review_data
+from review_store import ReviewStore
+from page_discovery import discover_pages, relative_page_path
+from review_similarity import (
+    minhash_signature, signature_agreement, similarity_score,
+    SIMILARITY_THRESHOLD, MIN_SIGNATURE_AGREEMENT, BANDS
+)
+
+# Seconds between polls of the site root; stat() on a few dozen pages is ~free
+POLL_INTERVAL = 0.5
+
+
+class IncrementalAudit:
+    """Audit state for the whole site, updated one page at a time
+
+    Keeps the name -> pages occurrences, the MinHash/LSH band buckets and the
+    similar pairs, and each page's tag issues in memory. Replacing a page only
+    touches that page's reviews: its signatures leave the buckets, its pairs
+    are dropped, and the new reviews are scored against the remaining buckets
+    exactly as find_similar_pairs would score them (pairs ordered by page
+    discovery order, then position on the page).
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, tag_checker=None):
+        self.threshold = threshold
+        self.tag_checker = tag_checker
+        self.pages = {}
+        self.page_rank = {}
+        self.name_pages = defaultdict(Counter)
+        self.tag_issues = {}
+
+        self.texts = {}
+        self.signatures = {}
+        self.buckets = [defaultdict(set) for _ in range(BANDS)]
+        self.similar = {}
+        self.partners = defaultdict(set)
+
+    # Similarity index
+
+    def _bands(self, signature):
+        rows = len(signature) // BANDS
+        return [tuple(signature[band * rows:(band + 1) * rows]) for band in range(BANDS)]
+
+    def _order(self, key1, key2):
+        rank1 = (self.page_rank[key1[0]], key1[1])
+        rank2 = (self.page_rank[key2[0]], key2[1])
+        return (key1, key2) if rank1 < rank2 else (key2, key1)
+
+    def _add_review(self, key, text):
+        signature = minhash_signature(text)
+        bands = self._bands(signature)
+        candidates = set()
+        for band, value in enumerate(bands):
+            candidates.update(self.buckets[band].get(value, ()))
+
+        self.texts[key] = text
+        self.signatures[key] = signature
+        for other in candidates:
+            if signature_agreement(signature, self.signatures[other]) < MIN_SIGNATURE_AGREEMENT:
+                continue
+            # difflib's ratio depends on argument order, so score in review order
+            first, second = self._order(key, other)
+            similarity = similarity_score(self.texts[first], self.texts[second], self.threshold)
+            if similarity is not None and similarity > self.threshold:
+                self.similar[first, second] = similarity
+                self.partners[first].add(second)
+                self.partners[second].add(first)
+
+        for band, value in enumerate(bands):
+            self.buckets[band][value].add(key)
+
+    def _remove_review(self, key):
+        signature = self.signatures.pop(key)
+        del self.texts[key]
+        for band, value in enumerate(self._bands(signature)):
+            bucket = self.buckets[band][value]
+            bucket.discard(key)
+            if not bucket:
+                del self.buckets[band][value]
+        for other in self.partners.pop(key, ()):
+            self.partners[other].discard(key)
+            self.similar.pop(self._order(key, other), None)
+
+    # Pages
+
+    def _page_pairs(self, page):
+        """Similar pairs touching a page, keyed by content so re-ordering isn't a change"""
+        pairs = {}
+        for idx in range(len(self.pages[page]['reviews']) if page in self.pages else 0):
+            key = (page, idx)
+            for other in self.partners.get(key, ()):
+                first, second = self._order(key, other)
+                described = (self._describe(first), self._describe(second))
+                pairs[frozenset(described)] = described + (self.similar[first, second],)
+        return pairs
+
+    def _describe(self, key):
+        page, idx = key
+        review = self.pages[page]['reviews'][idx]
+        return page, review.get('customer_name', 'Unknown'), review['review_text']
+
+    def _page_names(self, page):
+        if page not in self.pages:
+            return Counter()
+        return Counter(review['customer_name'] for review in self.pages[page]['reviews'] if 'customer_name' in review)
+
+    def load_store(self, store):
+        """Seed the state from a full extraction"""
+        for page_id, page in enumerate(store.pages.values):
+            self.add_page(page, store.page_category_name(page_id), store.page_reviews(page_id),
+                          store.page_service_tags(page_id))
+
+    def remove_page(self, page):
+        if page not in self.pages:
+            return
+        for idx, review in enumerate(self.pages[page]['reviews']):
+            if 'review_text' in review:
+                self._remove_review((page, idx))
+        for name, count in self._page_names(page).items():
+            self.name_pages[name][page] -= count
+            if self.name_pages[name][page] <= 0:
+                del self.name_pages[name][page]
+            if not self.name_pages[name]:
+                del self.name_pages[name]
+        self.tag_issues.pop(page, None)
+        del self.pages[page]
+
+    def add_page(self, page, category, reviews, service_tags=()):
+        self.page_rank.setdefault(page, len(self.page_rank))
+        self.pages[page] = {'category': category, 'reviews': reviews, 'service_tags': service_tags}
+        for name, count in self._page_names(page).items():
+            self.name_pages[name][page] += count
+        for idx, review in enumerate(reviews):
+            if 'review_text' in review:
+                self._add_review((page, idx), review['review_text'])
+        if self.tag_checker is not None:
+            single_page = ReviewStore()
+            single_page.add_page(page, category, reviews, service_tags)
+            self.tag_issues[page] = self.tag_checker(single_page)
+
+    def update_page(self, page, category=None, reviews=None, service_tags=()):
+        """Replace (or, with reviews=None, remove) a page and return what changed"""
+        names_before = {name: sum(self.name_pages[name].values()) for name in self._page_names(page)}
+        pairs_before = self._page_pairs(page)
+        issues_before = self.tag_issues.get(page, [])
+
+        self.remove_page(page)
+        if reviews is not None:
+            self.add_page(page, category, reviews, service_tags)
+
+        touched = set(names_before) | set(self._page_names(page))
+        names_after = {name: sum(self.name_pages[name].values()) for name in touched if name in self.name_pages}
+        pairs_after = self._page_pairs(page)
+        issues_after = self.tag_issues.get(page, [])
+
+        def issue_keys(issues):
+            return {json.dumps(issue, sort_keys=True): issue for issue in issues}
+
+        before_issues, after_issues = issue_keys(issues_before), issue_keys(issues_after)
+        return {
+            'page': page,
+            'removed': reviews is None,
+            'new_duplicate_names': sorted(name for name in touched
+                                          if names_after.get(name, 0) > 1 and names_before.get(name, 0) <= 1),
+            'resolved_duplicate_names': sorted(name for name in touched
+                                               if names_before.get(name, 0) > 1 and names_after.get(name, 0) <= 1),
+            'new_similar_pairs': [pair for key, pair in pairs_after.items() if key not in pairs_before],
+            'resolved_similar_pairs': [pair for key, pair in pairs_before.items() if key not in pairs_after],
+            'new_tag_issues': [issue for key, issue in after_issues.items() if key not in before_issues],
+            'resolved_tag_issues': [issue for key, issue in before_issues.items() if key not in after_issues]
+        }
+
+    # Whole-site views, same shapes as the batch analyses
+
+    def duplicate_names(self):
+        return {name: [page for page in sorted(pages, key=self.page_rank.get) for _ in range(pages[page])]
+                for name, pages in self.name_pages.items() if sum(pages.values()) > 1}
+
+    def similar_pairs(self):
+        return sorted(self.similar.items(), key=lambda item: ((self.page_rank[item[0][0][0]], item[0][0][1]),
+                                                             (self.page_rank[item[0][1][0]], item[0][1][1])))
+
+
+def snapshot_pages(root, rules):
+    """(category, size, mtime_ns) for every page discovery currently finds"""
+    snapshot = {}
+    for page_path, category in discover_pages(root, rules):
+        try:
+            stat = os.stat(page_path)
+        except OSError:
+            continue
+        snapshot[page_path] = (category, stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def _print_delta(delta, seconds):
+    status = 'removed' if delta['removed'] else 'changed'
+    print(f"\n🔄 {delta['page']} {status} (re-audited in {seconds * 1000:.0f} ms)")
+    for name in delta['new_duplicate_names']:
+        print(f"   ⚠️  Duplicate customer name: {name}")
+    for name in delta['resolved_duplicate_names']:
+        print(f"   ✅ No longer duplicated: {name}")
+    for (page1, customer1, _), (page2, customer2, _), score in delta['new_similar_pairs']:
+        print(f"   ⚠️  Similar reviews ({score:.0%}): {page1} ({customer1}) ↔ {page2} ({customer2})")
+    for (page1, customer1, _), (page2, customer2, _), _ in delta['resolved_similar_pairs']:
+        print(f"   ✅ No longer similar: {page1} ({customer1}) ↔ {page2} ({customer2})")
+    for issue in delta['new_tag_issues']:
+        print(f"   ⚠️  Tag issue: {issue['issue']}")
+    for issue in delta['resolved_tag_issues']:
+        print(f"   ✅ Tag issue resolved: {issue['issue']}")
+    if not any(delta[key] for key in delta if key not in ('page', 'removed')):
+        print("   • No change in duplicate names, similar reviews or tag issues")
+
+
+def watch(root, rules, state, cache=None, interval=POLL_INTERVAL):
+    """Poll the site root and re-audit pages as they change, until Ctrl-C"""
+    snapshot = snapshot_pages(root, rules)
+    print(f"\n👀 Watching {len(snapshot)} pages under {root} (Ctrl-C to stop)")
+    sys.stdout.flush()
+
+    try:
+        while True:
+            time.sleep(interval)
+            current = snapshot_pages(root, rules)
+            changed = [page_path for page_path, entry in current.items() if snapshot.get(page_path) != entry]
+            removed = [page_path for page_path in snapshot if page_path not in current]
+            snapshot = current
+
+            for page_path in changed + removed:
+                start = time.perf_counter()
+                relative_path = relative_page_path(page_path, root)
+                if page_path in current:
+                    try:
+                        if cache is not None:
+                            reviews, service_tags = cache.extract(page_path)
+                        else:
+                            reviews, service_tags = extract_review_data(page_path)
+                    except Exception as e:
+                        print(f"Error reading {page_path}: {e}")
+                        continue
+                    delta = state.update_page(relative_path, current[page_path][0], reviews, service_tags)
+                else:
+                    delta = state.update_page(relative_path)
+                _print_delta(delta, time.perf_counter() - start)
+
+            if changed and cache is not None:
+                cache.save()
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
@@ -1,277 +1,243 @@
 #!/usr/bin/env python3
 
 import os
-import re
+import sys
+import argparse
+import asyncio
 import json
+from functools import partial
 from pathlib import Path
-import html
-from collections import defaultdict, Counter
-import difflib
-
-def extract_comprehensive_review_data(filepath):
-    """Extract reviews and all service tags from an HTML file"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except Exception as e:
-        print(f"Error reading {filepath}: {e}")
-        return [], []
-
-    reviews = []
-    service_tags = []
-
-    # Extract all service tags from the page
-    tag_pattern = r'<div class="service-tag[^>]*>[\s\S]*?<span[^>]*>([^<]+)</span>[\s\S]*?</div>'
-    tag_matches = re.findall(tag_pattern, content)
-    service_tags = [tag.strip() for tag in tag_matches]
-
-    # Extract reviews
-    review_pattern = r'<div class="review-card[^>]*>(.*?)</div>\s*</div>\s*</div>'
-    review_matches = re.findall(review_pattern, content, re.DOTALL)
-
-    for i, match in enumerate(review_matches):
-        review_data = {}
-
-        # Extract customer name
-        name_pattern = r'<p class="font-bold[^>]*>([^<]+)</p>'
-        name_match = re.search(name_pattern, match)
-        if name_match:
-            review_data['customer_name'] = name_match.group(1).strip()
-
-        # Extract location
-        location_pattern = r'<span class="material-icons[^>]*>location_on</span>\s*([^<]+)'
-        location_match = re.search(location_pattern, match)
-        if location_match:
-            review_data['location'] = location_match.group(1).strip()
-
-        # Extract review text
-        text_pattern = r'<div class="bg-white[^>]*rounded-2xl[^>]*>\s*<p[^>]*>(.*?)</p>'
-        text_match = re.search(text_pattern, match, re.DOTALL)
-        if text_match:
-            text = text_match.group(1).strip()
-            text = re.sub(r'\s+', ' ', text)  # Normalize whitespace
-            review_data['review_text'] = html.unescape(text)
-
-        # Associate service tag (if available, use index-based association)
-        if i < len(service_tags):
-            review_data['service_tag'] = service_tags[i]
-
-        if review_data:
-            reviews.append(review_data)
-
-    return reviews, service_tags
-
-def categorize_pages():
-    """Categorize all HTML pages by type"""
-    base_path = Path('/Users/yaronhayo/Desktop/I Locksmith 2025/i-locksmith')
-
-    categories = {
-        'service_area_pages': [],
-        'service_category_pages': [],
-        'individual_service_pages': [],
-        'main_pages': []
-    }
-
-    # Service area pages
-    service_area_dir = base_path / 'service-areas'
-    if service_area_dir.exists():
-        categories['service_area_pages'] = list(service_area_dir.glob('locksmith-*.html'))
-
-    # Main pages
-    for main_page in ['index.html', 'about.html', 'services.html', 'service-areas.html']:
-        page_path = base_path / main_page
-        if page_path.exists():
-            categories['main_pages'].append(page_path)
-
-    # Service pages
-    services_dir = base_path / 'services'
-    if services_dir.exists():
-        # Service category pages
-        category_pages = ['residential-locksmith.html', 'auto-locksmith.html', 'commercial-locksmith.html']
-        for page in category_pages:
-            page_path = services_dir / page
-            if page_path.exists():
-                categories['service_category_pages'].append(page_path)
-
-        # Individual service pages
-        individual_pages = [
-            'car-lockout.html', 'house-lockout.html', 'business-lockout.html',
-            'storage-unit-lockout.html', 'lock-rekey.html', 'lock-replacement.html',
-            'car-key-replacement.html'
-        ]
-        for page in individual_pages:
-            page_path = services_dir / page
-            if page_path.exists():
-                categories['individual_service_pages'].append(page_path)
-
-    return categories
-
-def analyze_duplicate_names(all_reviews):
+from contextlib import nullcontext
+from audit_cache import AuditCache, CACHE_FILENAME
+from audit_parallel import extract_pages
+from audit_metrics import AuditMetrics, profiled
+from review_index import ReviewIndex, INDEX_FILENAME
+from page_discovery import discover_pages, load_page_rules, relative_page_path, DEFAULT_ROOT
+from review_store import ReviewStore, PageRecordWriter, FORMAT_SUFFIXES
+from review_similarity import NEAR_IDENTICAL_THRESHOLD
+from schema_check import cross_check_schema
+from audit_watch import IncrementalAudit, watch, POLL_INTERVAL
+from site_crawler import crawl_site, CrawlCache, FetchError, CRAWL_CACHE_FILENAME, CONCURRENCY
+from tfidf_similarity import tfidf_available
+from external_similarity import DEFAULT_MEMORY_LIMIT, SIMILAR_PAIRS_FILENAME
+from score_cache import ScoreCache, SCORE_CACHE_FILENAME
+from service_taxonomy import load_service_taxonomy, TAXONOMY_FILENAME
+from audit_analyzers import run_analyzers, default_analyzers, DuplicateNames, SimilarReviews, TagAppropriateness
+from page_weight import load_budgets, check_pages, print_report, BUDGETS_FILENAME
+from audit_diff import (
+    load_baseline, diff_audits, similar_pair_keys, count_changes, print_diff, DIFF_FILENAME
+)
+
+RESULTS_FILENAME = 'comprehensive_audit_results.json'
+REVIEWS_BASENAME = 'comprehensive_audit_reviews'
+
+def analyze_duplicate_names(store):
     """Check for duplicate customer names across pages"""
-    name_to_pages = defaultdict(list)
-
-    for page_path, page_data in all_reviews.items():
-        for review in page_data['reviews']:
-            if 'customer_name' in review:
-                name_to_pages[review['customer_name']].append(page_path)
+    return run_analyzers(store, [DuplicateNames()])['duplicate_names']
 
-    return {name: pages for name, pages in name_to_pages.items() if len(pages) > 1}
-
-def analyze_similar_reviews(all_reviews):
+def analyze_similar_reviews(store, stats=None, backend='minhash', score_cache=None):
     """Check for very similar review text across pages"""
-    all_review_texts = []
-
-    for page_path, page_data in all_reviews.items():
-        for review in page_data['reviews']:
-            if 'review_text' in review:
-                all_review_texts.append({
-                    'text': review['review_text'],
-                    'page': page_path,
-                    'customer': review.get('customer_name', 'Unknown')
-                })
-
-    similar_pairs = []
-    for i, review1 in enumerate(all_review_texts):
-        for j, review2 in enumerate(all_review_texts[i+1:], i+1):
-            similarity = difflib.SequenceMatcher(None, review1['text'], review2['text']).ratio()
-            if similarity > 0.8:  # 80% similarity threshold
-                similar_pairs.append({
-                    'similarity': similarity,
-                    'review1': review1,
-                    'review2': review2
-                })
-
-    return similar_pairs
-
-def analyze_service_tag_appropriateness(all_reviews):
+    analyzer = SimilarReviews(backend, score_cache=score_cache)
+    similar_reviews = run_analyzers(store, [analyzer])['similar_reviews']
+    if stats is not None:
+        stats.update(analyzer.stats)
+    return similar_reviews
+
+def analyze_service_tag_appropriateness(store, taxonomy=None):
     """Analyze if service tags are appropriate for each page type"""
-    issues = []
-
-    # Define expected service categories
-    residential_services = ['Residential', 'Home', 'House Lockout', 'Lock Rekey', 'Lock Replacement', 'Emergency', 'Key Cutting']
-    automotive_services = ['Automotive', 'Car', 'Vehicle', 'Car Lockout', 'Car Key Replacement', 'Key Programming', 'Ignition']
-    commercial_services = ['Commercial', 'Business', 'Office', 'Business Lockout', 'Access Control', 'Master Key']
-    general_services = ['Emergency', 'Lockout', 'Key Cutting', 'Lock Repair']
-
-    for page_path, page_data in all_reviews.items():
-        category = page_data['category']
-        page_tags = []
-
-        for review in page_data['reviews']:
-            if 'service_tag' in review:
-                page_tags.append(review['service_tag'])
-
-        unique_tags = list(set(page_tags))
-
-        if category == 'service_area_pages':
-            # Service area pages should show diverse services from same city
-            if len(unique_tags) < 3:
-                issues.append({
-                    'page': page_path,
-                    'category': category,
-                    'issue': f'Insufficient service diversity: only {len(unique_tags)} unique service tags',
-                    'tags': unique_tags
-                })
-
-        elif category == 'service_category_pages':
-            # Service category pages should show services matching the category
-            if 'residential-locksmith' in page_path:
-                expected = set(residential_services + general_services)
-                unexpected = [tag for tag in unique_tags if not any(exp.lower() in tag.lower() for exp in expected)]
-            elif 'auto-locksmith' in page_path:
-                expected = set(automotive_services + general_services)
-                unexpected = [tag for tag in unique_tags if not any(exp.lower() in tag.lower() for exp in expected)]
-            elif 'commercial-locksmith' in page_path:
-                expected = set(commercial_services + general_services)
-                unexpected = [tag for tag in unique_tags if not any(exp.lower() in tag.lower() for exp in expected)]
-            else:
-                unexpected = []
-
-            if unexpected:
-                issues.append({
-                    'page': page_path,
-                    'category': category,
-                    'issue': f'Unexpected service tags for category',
-                    'unexpected_tags': unexpected,
-                    'all_tags': unique_tags
-                })
-
-        elif category == 'individual_service_pages':
-            # Individual service pages should be more consistent
-            if 'car-lockout' in page_path:
-                expected_keywords = ['car', 'vehicle', 'automotive', 'lockout']
-            elif 'house-lockout' in page_path:
-                expected_keywords = ['house', 'home', 'residential', 'lockout']
-            elif 'business-lockout' in page_path:
-                expected_keywords = ['business', 'commercial', 'office', 'lockout']
-            elif 'lock-rekey' in page_path:
-                expected_keywords = ['rekey', 'key']
-            elif 'lock-replacement' in page_path:
-                expected_keywords = ['replacement', 'lock']
-            elif 'car-key-replacement' in page_path:
-                expected_keywords = ['car', 'key', 'replacement', 'automotive']
-            else:
-                expected_keywords = []
-
-            if expected_keywords:
-                mismatched_tags = [tag for tag in unique_tags if not any(keyword.lower() in tag.lower() for keyword in expected_keywords)]
-                if len(mismatched_tags) > len(unique_tags) * 0.5:  # More than half don't match
-                    issues.append({
-                        'page': page_path,
-                        'category': category,
-                        'issue': f'Service tags may not match page focus',
-                        'expected_keywords': expected_keywords,
-                        'found_tags': unique_tags,
-                        'mismatched_tags': mismatched_tags
-                    })
-
-        elif category == 'main_pages':
-            # Main pages should show diverse services
-            if len(unique_tags) < 3:
-                issues.append({
-                    'page': page_path,
-                    'category': category,
-                    'issue': f'Insufficient service diversity: only {len(unique_tags)} unique service tags',
-                    'tags': unique_tags
-                })
-
-    return issues
+    return run_analyzers(store, [TagAppropriateness(taxonomy)])['tag_issues']
+
+def audit_findings(analysis, schema_issues, weight_report):
+    """The findings saved to the results JSON, from the analyzers' results and the per-page checks"""
+    return {
+        'duplicate_names': analysis['duplicate_names'],
+        'fuzzy_duplicate_names': analysis['fuzzy_duplicate_names'],
+        'similar_reviews': len(analysis['similar_reviews']),
+        'similar_pairs': similar_pair_keys(analysis['similar_reviews']),
+        'tag_issues': analysis['tag_issues'],
+        'schema_issues': schema_issues,
+        'page_weight': weight_report
+    }
 
-def main():
+def save_results(root, store, findings, output_format):
+    """Write the results JSON; review data goes inline (json) or to its own file
+
+    A JSONL review file is written page by page while pages are extracted,
+    so only its name is recorded here.
+    """
+    reviews_name = REVIEWS_BASENAME + FORMAT_SUFFIXES[output_format]
+    if output_format == 'json':
+        results = {'all_reviews': store.to_dict(include_service_tags=True), **findings}
+    else:
+        if output_format == 'store':
+            store.save(root / reviews_name)
+        results = {**findings, 'reviews_store': reviews_name}
+    with open(root / RESULTS_FILENAME, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Comprehensive review audit across all site pages')
+    parser.add_argument('--root', type=Path, default=DEFAULT_ROOT,
+                        help='Site root to audit (default: the directory holding this script)')
+    parser.add_argument('--rules', type=Path, default=None,
+                        help='Page-type rules file (default: page_rules.json)')
+    parser.add_argument('--taxonomy', type=Path, default=None,
+                        help='Service tag taxonomy (default: ' + TAXONOMY_FILENAME + ')')
+    parser.add_argument('--budgets', type=Path, default=None,
+                        help='Page weight budgets (default: ' + BUDGETS_FILENAME + ')')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-parse every page and re-score every review pair instead of reusing '
+                             'unchanged results from ' + CACHE_FILENAME + ' and ' + SCORE_CACHE_FILENAME)
+    parser.add_argument('--crawl', default=None, metavar='URL',
+                        help='Audit the deployed site at URL over HTTP instead of the files under --root '
+                             '(unchanged pages are revalidated against ' + CRAWL_CACHE_FILENAME + ')')
+    parser.add_argument('--crawl-concurrency', type=int, default=CONCURRENCY, metavar='N',
+                        help=f'Requests in flight at once with --crawl (default: {CONCURRENCY})')
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help='Extract pages in N worker processes (0 = one per CPU core)')
+    parser.add_argument('--similarity-backend', choices=['minhash', 'tfidf', 'external'], default='minhash',
+                        help='Score review similarity with difflib over MinHash/LSH candidates (default), '
+                             'with TF-IDF cosine similarity (needs NumPy), or with the MinHash/LSH pipeline '
+                             'sorted on disk within --memory-limit (pairs streamed to ' + SIMILAR_PAIRS_FILENAME + ')')
+    parser.add_argument('--memory-limit', type=int, default=DEFAULT_MEMORY_LIMIT // (1024 * 1024), metavar='MB',
+                        help='In-memory sort buffer ceiling for --similarity-backend external '
+                             f'(default: {DEFAULT_MEMORY_LIMIT // (1024 * 1024)} MB)')
+    parser.add_argument('--format', choices=sorted(FORMAT_SUFFIXES), default='store',
+                        help='Save reviews as a compact binary store (default), the legacy indented JSON, '
+                             'or JSON Lines written page by page as pages are extracted')
+    parser.add_argument('--index', nargs='?', const=INDEX_FILENAME, default=None, metavar='PATH',
+                        help='Also write the reviews to a SQLite index (default name: ' + INDEX_FILENAME +
+                             ', relative to the site root)')
+    parser.add_argument('--baseline', type=Path, default=None, metavar='PATH',
+                        help='Report only what changed since a previous run: its results JSON, review store, '
+                             'JSONL dump or SQLite index (diff saved to ' + DIFF_FILENAME + ')')
+    parser.add_argument('--fail-on-new', action='store_true',
+                        help='With --baseline, exit with status 1 when there are new findings (for CI)')
+    parser.add_argument('--watch', action='store_true',
+                        help='After the audit, keep watching the site and re-audit pages as they change '
+                             '(uses the MinHash/LSH similarity index, so only with --similarity-backend minhash)')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, metavar='SECONDS',
+                        help=f'Polling interval for --watch (default: {POLL_INTERVAL}s)')
+    parser.add_argument('--metrics', type=Path, default=None, metavar='PATH',
+                        help='Write per-stage and per-page timings and counters to a JSON file')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Track peak Python memory per stage with tracemalloc')
+    parser.add_argument('--profile', type=Path, default=None, metavar='PATH',
+                        help='Dump cProfile stats for the whole run to PATH')
+    return parser.parse_args()
+
+def run_audit(args):
     print("🔍 COMPREHENSIVE I LOCKSMITH WEBSITE REVIEW AUDIT")
     print("=" * 70)
     print("Checking: Review Uniqueness | Service Tag Appropriateness | Diversity Logic")
     print("=" * 70)
 
-    # Categorize pages
-    categories = categorize_pages()
-    all_reviews = {}
-
-    # Extract data from all pages
-    for category_name, pages in categories.items():
-        print(f"\n📋 Processing {category_name.replace('_', ' ').title()}:")
-        print("-" * 50)
-
-        for page_path in pages:
-            reviews, service_tags = extract_comprehensive_review_data(page_path)
-            relative_path = str(page_path).replace('/Users/yaronhayo/Desktop/I Locksmith 2025/i-locksmith/', '')
-
-            all_reviews[relative_path] = {
-                'category': category_name,
-                'reviews': reviews,
-                'all_service_tags': service_tags
-            }
-
-            print(f"  📄 {relative_path}: {len(reviews)} reviews, {len(service_tags)} service tags")
+    root = args.root.resolve()
+    if not root.is_dir():
+        sys.exit(f"❌ Site root not found: {root}")
+    if args.similarity_backend == 'tfidf' and not tfidf_available():
+        sys.exit("❌ NumPy is not installed; the tfidf similarity backend needs it")
+    if args.crawl and args.watch:
+        sys.exit("❌ --watch follows files under the site root and can't be combined with --crawl")
+    if args.watch and args.similarity_backend != 'minhash':
+        # The incremental index finds pairs the way the minhash backend does, so
+        # its deltas wouldn't line up with another backend's full-run pairs
+        sys.exit(f"❌ --watch keeps a MinHash/LSH similarity index and can't be combined with "
+                 f"--similarity-backend {args.similarity_backend}")
+    rules = load_page_rules(args.rules) if args.rules else None
+    taxonomy = load_service_taxonomy(args.taxonomy)
+    budgets = load_budgets(args.budgets)
+    cache = None if args.no_cache or args.crawl else AuditCache(root / CACHE_FILENAME)
+    crawl_cache = CrawlCache(root / CRAWL_CACHE_FILENAME) if args.crawl and not args.no_cache else None
+    # Keyed by review text, so crawled and local runs share one score cache
+    score_cache = None if args.no_cache else ScoreCache(root / SCORE_CACHE_FILENAME)
+    metrics = AuditMetrics(trace_memory=args.trace_memory)
+
+    # The baseline may point at review files this run is about to overwrite,
+    # so it is loaded before anything is written
+    baseline = None
+    if args.baseline:
+        with metrics.stage('baseline_load'):
+            try:
+                baseline = load_baseline(args.baseline)
+            except FileNotFoundError:
+                sys.exit(f"❌ Baseline not found: {args.baseline}")
+            except ValueError as e:
+                sys.exit(f"❌ Can't read baseline: {e}")
+        if baseline['store'] is None and not {'duplicate_names', 'similar_pairs', 'tag_issues'} <= baseline.keys():
+            sys.exit(f"❌ Baseline {args.baseline} has neither the findings nor the review data to compare against")
+
+    # Discovery is lazy: each page is extracted as soon as it is found, and
+    # results come back in discovery order however many workers run
+    pages = discover_pages(root, rules)
+    failed_pages = []
+    store = ReviewStore()
+    schemas = {}
+    weights = {}
+
+    # With --format jsonl each page is written out as soon as it is extracted
+    reviews_name = REVIEWS_BASENAME + FORMAT_SUFFIXES[args.format]
+    writer = PageRecordWriter(root / reviews_name, include_service_tags=True) if args.format == 'jsonl' else nullcontext()
+
+    print(f"\n📋 Processing pages {'from ' + args.crawl if args.crawl else 'under ' + str(root)}:")
+    print("-" * 50)
+
+    crawl_stats = {}
+    with metrics.stage('extraction'), writer:
+        if args.crawl:
+            # Crawled pages come back keyed by their relative path already
+            try:
+                extracted = crawl_site(args.crawl, rules, args.crawl_concurrency, cache=crawl_cache,
+                                       schemas=schemas, weights=weights, stats=crawl_stats)
+            except (OSError, asyncio.TimeoutError, FetchError) as e:
+                sys.exit(f"❌ Could not crawl {args.crawl}: {e}")
+        else:
+            extracted = extract_pages(pages, jobs=args.jobs, cache=cache, metrics=metrics, schemas=schemas,
+                                      weights=weights)
+        for page_path, category_name, reviews, service_tags, error in extracted:
+            if error:
+                failed_pages.append(page_path)
+                print(f"Error reading {page_path}: {error}")
+            relative_path = page_path if args.crawl else relative_page_path(page_path, root)
+            store.add_page(relative_path, category_name, reviews, service_tags)
+            if args.format == 'jsonl':
+                writer.add_page(relative_path, category_name, reviews, service_tags)
+
+            print(f"  📄 {relative_path} [{category_name}]: {len(reviews)} reviews, {len(service_tags)} service tags")
+
+    if cache is not None:
+        cache.save()
+        print(f"\n💾 Cache: {cache.hits} pages unchanged, {cache.misses} re-parsed")
+    if args.crawl:
+        if crawl_cache is not None:
+            crawl_cache.save()
+        metrics.add_counts(crawl_stats, prefix='crawl_')
+        print(f"\n🌐 Crawl: {crawl_stats['fetched']} pages fetched ({crawl_stats['bytes'] / 1024:.0f} KB), "
+              f"{crawl_stats['not_modified']} not modified, "
+              f"{crawl_stats['requests']} requests over {crawl_stats['connections']} connections")
+
+    if failed_pages:
+        print(f"\n⚠️  {len(failed_pages)} pages could not be extracted and are recorded with no reviews")
+
+    # ANALYSIS PHASE: every check runs in one traversal of the review store
+    analysis = run_analyzers(store, default_analyzers(taxonomy, args.similarity_backend,
+                                                      memory_limit=args.memory_limit * 1024 * 1024,
+                                                      pairs_path=root / SIMILAR_PAIRS_FILENAME,
+                                                      score_cache=score_cache), metrics)
+    duplicate_names = analysis['duplicate_names']
+    name_clusters = analysis['fuzzy_duplicate_names']
+    similar_reviews = analysis['similar_reviews']
+    tag_issues = analysis['tag_issues']
+    if score_cache is not None and args.similarity_backend != 'tfidf':
+        print(f"\n💾 Similarity cache: {score_cache.hits} review pairs unchanged, {score_cache.misses} scored")
 
-    # ANALYSIS PHASE
     print("\n\n📊 ANALYSIS RESULTS")
     print("=" * 70)
 
     # 1. Duplicate Customer Names
     print("\n🔍 DUPLICATE CUSTOMER NAMES")
     print("-" * 40)
-    duplicate_names = analyze_duplicate_names(all_reviews)
     if duplicate_names:
         print(f"⚠️  CRITICAL ISSUE: Found {len(duplicate_names)} customers appearing on multiple pages:")
         for name, pages in list(duplicate_names.items())[:5]:  # Show first 5
@@ -280,14 +246,21 @@ def main():
     else:
         print("✅ No duplicate customer names found")
 
+    # Names that differ only in spelling: "Betty Lou W." / "Betty W.", "R. Thompson" / "Robert T."
+    if name_clusters:
+        print(f"⚠️  Found {len(name_clusters)} customers listed under several spellings:")
+        for cluster in name_clusters[:5]:  # Show first 5
+            print(f"   • {' / '.join(cluster['names'])}: {cluster['occurrences']} reviews on {len(cluster['pages'])} pages")
+    else:
+        print("✅ No near-duplicate customer names found")
+
     # 2. Similar Review Text
     print("\n🔍 SIMILAR REVIEW TEXT")
     print("-" * 40)
-    similar_reviews = analyze_similar_reviews(all_reviews)
     if similar_reviews:
         print(f"⚠️  CRITICAL ISSUE: Found {len(similar_reviews)} pairs of very similar/identical reviews")
-        high_similarity = [r for r in similar_reviews if r['similarity'] > 0.95]
-        print(f"   • {len(high_similarity)} pairs are >95% similar (likely identical)")
+        high_similarity = sum(1 for r in similar_reviews if r['similarity'] > NEAR_IDENTICAL_THRESHOLD)
+        print(f"   • {high_similarity} pairs are >95% similar (likely identical)")
         print(f"   • This suggests systematic copy-paste of reviews across pages")
     else:
         print("✅ No highly similar reviews found")
@@ -295,7 +268,6 @@ def main():
     # 3. Service Tag Analysis
     print("\n🔍 SERVICE TAG APPROPRIATENESS")
     print("-" * 40)
-    tag_issues = analyze_service_tag_appropriateness(all_reviews)
     if tag_issues:
         print(f"⚠️  Found {len(tag_issues)} service tag issues:")
         for issue in tag_issues[:10]:  # Show first 10
@@ -307,34 +279,51 @@ def main():
     else:
         print("✅ All service tags appear appropriately categorized")
 
-    # 4. Service Tag Distribution by Category
+    # 4. JSON-LD Review Schema vs Visible Cards
+    print("\n🔍 STRUCTURED DATA CROSS-CHECK")
+    print("-" * 40)
+    with metrics.stage('schema_check'):
+        page_schemas = schemas if args.crawl else {
+            relative_page_path(page_path, root): schema for page_path, schema in schemas.items()}
+        schema_issues = cross_check_schema(store, page_schemas)
+    schema_pages = sum(1 for schema in page_schemas.values() if schema.get('reviews'))
+    print(f"JSON-LD Review markup found on {schema_pages} of {store.page_count} pages")
+    if schema_issues:
+        print(f"⚠️  Found {len(schema_issues)} structured data issues:")
+        for issue in schema_issues[:10]:  # Show first 10
+            print(f"   • {issue['page']}: {issue['issue']}" + (f" ({issue['customer']})" if 'customer' in issue else ''))
+    else:
+        print("✅ JSON-LD reviews match the visible review cards")
+
+    # 5. Page Weight, measured in the same read of each page as its reviews
+    print("\n🔍 PAGE WEIGHT BUDGETS")
+    print("-" * 40)
+    with metrics.stage('page_weight'):
+        page_weights = weights if args.crawl else {
+            relative_page_path(page_path, root): weight for page_path, weight in weights.items()}
+        page_categories = {page: store.page_category_name(page_id)
+                           for page_id, page in enumerate(store.pages.values)}
+        weight_report = check_pages(page_weights, page_categories, budgets, root)
+    print_report(weight_report)
+
+    # 6. Service Tag Distribution by Category
     print("\n🔍 SERVICE TAG DISTRIBUTION BY CATEGORY")
     print("-" * 40)
-    for category in ['service_area_pages', 'service_category_pages', 'individual_service_pages', 'main_pages']:
-        category_tags = []
-        category_pages = []
-
-        for page_path, data in all_reviews.items():
-            if data['category'] == category:
-                category_pages.append(page_path)
-                for review in data['reviews']:
-                    if 'service_tag' in review:
-                        category_tags.append(review['service_tag'])
-
-        if category_tags:
-            print(f"\n{category.replace('_', ' ').title()} ({len(category_pages)} pages):")
-            tag_counts = Counter(category_tags)
-            for tag, count in tag_counts.most_common(10):
+    for category, distribution in analysis['tag_distribution'].items():
+        if distribution['tags']:
+            print(f"\n{category.replace('_', ' ').title()} ({distribution['pages']} pages):")
+            for tag, count in distribution['tags'][:10]:
                 print(f"   • {tag}: {count} occurrences")
         else:
             print(f"\n{category.replace('_', ' ').title()}: No service tags found")
 
-    # 5. Summary Statistics
+    # 7. Summary Statistics
     print("\n\n📈 SUMMARY STATISTICS")
     print("-" * 40)
-    total_pages = len(all_reviews)
-    total_reviews = sum(len(data['reviews']) for data in all_reviews.values())
-    total_service_tags = sum(len(data['all_service_tags']) for data in all_reviews.values())
+    summary = analysis['summary']
+    total_pages = summary['total_pages']
+    total_reviews = summary['total_reviews']
+    total_service_tags = summary['total_service_tags']
 
     print(f"Total pages audited: {total_pages}")
     print(f"Total reviews found: {total_reviews}")
@@ -343,11 +332,9 @@ def main():
     print(f"Average service tags per page: {total_service_tags/total_pages:.1f}")
 
     # Category breakdown
-    pages_by_category = Counter(data['category'] for data in all_reviews.values())
     print(f"\nPages by category:")
-    for category, count in pages_by_category.items():
-        category_reviews = sum(len(data['reviews']) for data in all_reviews.values() if data['category'] == category)
-        print(f"   • {category.replace('_', ' ').title()}: {count} pages ({category_reviews} reviews)")
+    for category, counts in summary['categories'].items():
+        print(f"   • {category.replace('_', ' ').title()}: {counts['pages']} pages ({counts['reviews']} reviews)")
 
     # RECOMMENDATIONS
     print("\n\n💡 RECOMMENDATIONS")
@@ -370,16 +357,78 @@ def main():
         print("     - Service category pages: Show only services from that category")
         print("     - Individual service pages: Show only that specific service")
 
-    # Save comprehensive audit data
-    with open('/Users/yaronhayo/Desktop/I Locksmith 2025/i-locksmith/comprehensive_audit_results.json', 'w') as f:
-        json.dump({
-            'all_reviews': all_reviews,
-            'duplicate_names': duplicate_names,
-            'similar_reviews': len(similar_reviews),
-            'tag_issues': tag_issues
-        }, f, indent=2, ensure_ascii=False)
+    if any(entry['over'] for entry in weight_report):
+        print("⚠️  MEDIUM PRIORITY:")
+        print("   • Bring the heaviest pages back within " + (str(args.budgets) if args.budgets else BUDGETS_FILENAME) + ":")
+        print("     - Add defer/async to scripts in <head> and load non-critical CSS with media or preload")
+        print("     - Compress or resize large images and drop unused third-party origins")
+
+    # Save comprehensive audit data; with --format store/jsonl the review data
+    # goes to its own file and the JSON only carries the findings
+    with metrics.stage('json_dump'):
+        results = save_results(root, store, audit_findings(analysis, schema_issues, weight_report), args.format)
+
+    print(f"\n✅ Full audit data saved to {RESULTS_FILENAME}")
+    if args.format != 'json':
+        print(f"✅ Review data saved to {results['reviews_store']}")
+    if args.similarity_backend == 'external':
+        print(f"✅ Similar pairs saved to {SIMILAR_PAIRS_FILENAME}")
+    if args.index:
+        with metrics.stage('index'):
+            with ReviewIndex(root / args.index) as index:
+                index.write_store(store)
+        print(f"✅ Review index updated: {root / args.index}")
+
+    # 8. Changes since the baseline run
+    diff = None
+    if baseline is not None:
+        print("\n\n🔀 CHANGES SINCE BASELINE")
+        print("-" * 40)
+        with metrics.stage('baseline_diff'):
+            # Older results files lack some findings; recompute those from their reviews
+            if 'duplicate_names' not in baseline:
+                baseline['duplicate_names'] = analyze_duplicate_names(baseline['store'])
+            if 'tag_issues' not in baseline:
+                baseline['tag_issues'] = analyze_service_tag_appropriateness(baseline['store'], taxonomy)
+            if 'similar_pairs' not in baseline:
+                baseline['similar_pairs'] = similar_pair_keys(
+                    analyze_similar_reviews(baseline['store'], backend=args.similarity_backend,
+                                            score_cache=score_cache))
+            diff = diff_audits(baseline, {'store': store, **results})
+            with open(root / DIFF_FILENAME, 'w') as f:
+                json.dump(diff, f, indent=2, ensure_ascii=False)
+        print(f"Baseline: {args.baseline}")
+        print_diff(diff)
+        print(f"\n✅ Changes saved to {DIFF_FILENAME}")
+
+    if score_cache is not None:
+        score_cache.save()
+    return metrics, store, diff
 
-    print(f"\n✅ Full audit data saved to comprehensive_audit_results.json")
+def main():
+    args = parse_args()
+    with profiled(args.profile):
+        metrics, store, diff = run_audit(args)
+
+    if args.metrics:
+        metrics.write(args.metrics)
+        metrics.print_summary()
+        print(f"📊 Metrics saved to {args.metrics}")
+    if args.profile:
+        print(f"📊 Profile saved to {args.profile}")
+
+    if args.fail_on_new and diff is not None and count_changes(diff, 'new'):
+        sys.exit(f"❌ {count_changes(diff, 'new')} new findings since the baseline")
+
+    if args.watch:
+        # Seed the incremental state from the full run, then only touch changed pages
+        root = args.root.resolve()
+        rules = load_page_rules(args.rules)
+        cache = None if args.no_cache else AuditCache(root / CACHE_FILENAME)
+        taxonomy = load_service_taxonomy(args.taxonomy)
+        state = IncrementalAudit(tag_checker=partial(analyze_service_tag_appropriateness, taxonomy=taxonomy))
+        state.load_store(store)
+        watch(root, rules, state, cache, args.interval)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
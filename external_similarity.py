@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import heapq
+import shutil
+import struct
+import argparse
+import tempfile
+import weakref
+from pathlib import Path
+from functools import lru_cache
+from itertools import combinations
+from time import perf_counter
+from review_store import load_reviews, iter_page_records, STORE_SUFFIX, JSONL_SUFFIX
+from review_similarity import (
+    minhash_signature, similarity_score, SIMILARITY_THRESHOLD, MIN_SIGNATURE_AGREEMENT, NUM_PERM, BANDS
+)
+
+SIMILAR_PAIRS_FILENAME = 'similar_pairs.jsonl'
+
+# Default ceiling for the sort buffers; everything past it goes to sorted runs on disk
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+
+# What one buffered entry costs in CPython: a small int object plus its list slot
+ENTRY_COST = 48
+
+# Read buffer per run while merging; the fan-in is capped so these fit the ceiling too
+RUN_BUFFER = 64 * 1024
+MIN_FAN_IN = 4
+
+# Review numbers take the low bits of every sort key (up to 2**40 reviews)
+INDEX_BITS = 40
+INDEX_MASK = (1 << INDEX_BITS) - 1
+
+ROWS = NUM_PERM // BANDS
+_SIGNATURE = struct.Struct(f'<{NUM_PERM}I')
+_OFFSET = struct.Struct('<QI')
+
+# Scores for repeated text pairs (copy-pasted reviews) without an unbounded dict
+SCORE_CACHE_SIZE = 4096
+
+
+class SpillSorter:
+    """Sort an unbounded stream of non-negative ints in a fixed amount of memory
+
+    Values are buffered until `capacity` of them are held, then sorted and
+    written to a run file as fixed-width big-endian records. merged() yields
+    every value in order by a k-way merge of the runs, merging them in
+    rounds first when there are more runs than read buffers fit in memory.
+    """
+
+    def __init__(self, spill_dir, prefix, width, memory_limit):
+        self.spill_dir = Path(spill_dir)
+        self.prefix = prefix
+        self.width = width
+        self.capacity = max(1, memory_limit // ENTRY_COST)
+        self.fan_in = max(MIN_FAN_IN, memory_limit // RUN_BUFFER)
+        self.buffer = []
+        self.runs = []
+        self.count = 0
+
+    def add(self, value):
+        self.buffer.append(value)
+        if len(self.buffer) >= self.capacity:
+            self.spill()
+
+    def spill(self):
+        if not self.buffer:
+            return
+        self.buffer.sort()
+        self.runs.append(self._write_run(self.buffer))
+        self.count += len(self.buffer)
+        self.buffer = []
+
+    def _write_run(self, values):
+        path = self.spill_dir / f"{self.prefix}-{len(self.runs):05d}.run"
+        width = self.width
+        with open(path, 'wb', buffering=RUN_BUFFER) as f:
+            for value in values:
+                f.write(value.to_bytes(width, 'big'))
+        return path
+
+    def _read_run(self, path):
+        width = self.width
+        chunk_size = RUN_BUFFER - RUN_BUFFER % width
+        with open(path, 'rb', buffering=0) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                for start in range(0, len(chunk), width):
+                    yield int.from_bytes(chunk[start:start + width], 'big')
+        path.unlink()
+
+    def merged(self):
+        """Every added value in ascending order; the runs are deleted as they are consumed"""
+        self.spill()
+        generation = 0
+        while len(self.runs) > self.fan_in:
+            generation += 1
+            groups = [self.runs[start:start + self.fan_in] for start in range(0, len(self.runs), self.fan_in)]
+            self.runs = []
+            for group in groups:
+                path = self.spill_dir / f"{self.prefix}-g{generation}-{len(self.runs):05d}.run"
+                with open(path, 'wb', buffering=RUN_BUFFER) as f:
+                    for value in heapq.merge(*(self._read_run(run) for run in group)):
+                        f.write(value.to_bytes(self.width, 'big'))
+                self.runs.append(path)
+        runs, self.runs = self.runs, []
+        return heapq.merge(*(self._read_run(run) for run in runs))
+
+
+class ReviewSpill:
+    """Reviews and their MinHash signatures on disk, read back by review number"""
+
+    def __init__(self, spill_dir):
+        spill_dir = Path(spill_dir)
+        self.records = open(spill_dir / 'reviews.dat', 'w+b')
+        self.offsets = open(spill_dir / 'offsets.dat', 'w+b')
+        self.signatures = open(spill_dir / 'signatures.dat', 'w+b')
+        self.size = 0
+        self.count = 0
+
+    def add(self, review, signature):
+        record = json.dumps([review['text'], review['page'], review['customer']], ensure_ascii=False).encode('utf-8')
+        self.records.write(record)
+        self.offsets.write(_OFFSET.pack(self.size, len(record)))
+        self.signatures.write(_SIGNATURE.pack(*signature))
+        self.size += len(record)
+        self.count += 1
+
+    def finish_writing(self):
+        for f in (self.records, self.offsets, self.signatures):
+            f.flush()
+
+    def review(self, index):
+        offset, length = _OFFSET.unpack(os.pread(self.offsets.fileno(), _OFFSET.size, index * _OFFSET.size))
+        text, page, customer = json.loads(os.pread(self.records.fileno(), length, offset))
+        return {'text': text, 'page': page, 'customer': customer}
+
+    def signature(self, index):
+        return _SIGNATURE.unpack(os.pread(self.signatures.fileno(), _SIGNATURE.size, index * _SIGNATURE.size))
+
+    def close(self):
+        for f in (self.records, self.offsets, self.signatures):
+            f.close()
+
+
+class SimilarPairsFile:
+    """Similar pairs streamed to a JSON Lines file: len() and iteration without loading them
+
+    Each line is one {'similarity', 'review1', 'review2'} pair, in the
+    order find_similar_pairs returns them. A file written to a temporary
+    path is removed once this object is garbage collected.
+    """
+
+    def __init__(self, path, count, temporary=False):
+        self.path = Path(path)
+        self.count = count
+        if temporary:
+            weakref.finalize(self, os.unlink, self.path)
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __iter__(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+
+class ExternalSimilarity:
+    """find_similar_pairs for corpora that don't fit in memory
+
+    Reviews are added one at a time: each is signed, written to disk and
+    its LSH band keys go to a SpillSorter. run() merges the band runs into
+    buckets, keeps each colliding pair once (in the first band it collides
+    in) if its signatures agree enough, spills those candidate pairs to
+    sorted runs, then scores them in review order and streams the pairs
+    above the threshold to a file. Memory stays within `memory_limit` plus
+    the members of the largest single bucket, however many reviews there
+    are. Results match find_similar_pairs.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, memory_limit=DEFAULT_MEMORY_LIMIT, spill_dir=None,
+                 score_cache=None):
+        self.threshold = threshold
+        self.memory_limit = memory_limit
+        self.score_cache = score_cache
+        self.spill_dir = Path(tempfile.mkdtemp(prefix='similarity-spill-', dir=spill_dir))
+        self.reviews = ReviewSpill(self.spill_dir)
+        # Band number, then the band's hash values, then the review number
+        self.bands = SpillSorter(self.spill_dir, 'bands', (BANDS.bit_length() + 32 * ROWS + INDEX_BITS + 7) // 8,
+                                 memory_limit // 2)
+        self.sign_seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.reviews.close()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def add(self, review):
+        """Queue a {'text', 'page', 'customer'} review; its position is its review number"""
+        index = self.reviews.count
+        start = perf_counter()
+        signature = minhash_signature(review['text'])
+        self.sign_seconds += perf_counter() - start
+        self.reviews.add(review, signature)
+        for band in range(BANDS):
+            key = band
+            for value in signature[band * ROWS:(band + 1) * ROWS]:
+                key = (key << 32) | value
+            self.bands.add((key << INDEX_BITS) | index)
+
+    def _candidate_pairs(self, stats):
+        """Pairs (i < j) colliding in some band, each once, spilled to sorted runs"""
+        pairs = SpillSorter(self.spill_dir, 'pairs', (2 * INDEX_BITS + 7) // 8, self.memory_limit // 2)
+        collisions = 0
+        filtered = 0
+        largest_bucket = 0
+        min_agreement = MIN_SIGNATURE_AGREEMENT * NUM_PERM
+
+        def flush(bucket_key, members):
+            nonlocal collisions, filtered, largest_bucket
+            largest_bucket = max(largest_bucket, len(members))
+            band = bucket_key >> (32 * ROWS)
+            signatures = [self.reviews.signature(member) for member in members]
+            for (i, signature1), (j, signature2) in combinations(zip(members, signatures), 2):
+                collisions += 1
+                # A pair colliding in several bands is only kept from the first one
+                if any(signature1[earlier * ROWS:(earlier + 1) * ROWS] == signature2[earlier * ROWS:(earlier + 1) * ROWS]
+                       for earlier in range(band)):
+                    continue
+                if sum(a == b for a, b in zip(signature1, signature2)) < min_agreement:
+                    filtered += 1
+                    continue
+                pairs.add((i << INDEX_BITS) | j)
+
+        bucket_key = None
+        members = []
+        for entry in self.bands.merged():
+            key = entry >> INDEX_BITS
+            if key != bucket_key:
+                if len(members) > 1:
+                    flush(bucket_key, members)
+                bucket_key = key
+                members = []
+            members.append(entry & INDEX_MASK)
+        if len(members) > 1:
+            flush(bucket_key, members)
+
+        pairs.spill()
+        stats['band_collisions'] = collisions
+        stats['signature_filtered_pairs'] = filtered
+        stats['largest_bucket'] = largest_bucket
+        stats['candidate_pairs'] = pairs.count
+        stats['pair_runs'] = len(pairs.runs)
+        return pairs
+
+    def run(self, output_path=None, stats=None):
+        """Find the similar pairs and stream them to `output_path` (a temporary file if None)"""
+        self.reviews.finish_writing()
+        self.bands.spill()
+        run_stats = {'reviews': self.reviews.count, 'signature_seconds': self.sign_seconds,
+                     'band_entries': self.bands.count, 'band_runs': len(self.bands.runs)}
+        start = perf_counter()
+        pairs = self._candidate_pairs(run_stats)
+        bucketed = perf_counter()
+
+        temporary = output_path is None
+        if temporary:
+            handle, output_path = tempfile.mkstemp(prefix='similar-pairs-', suffix=JSONL_SUFFIX)
+            os.close(handle)
+        output_path = Path(output_path)
+        tmp_path = output_path.with_name(output_path.name + '.tmp')
+
+        scorer = self.score_cache.score if self.score_cache is not None else similarity_score
+        cached = self.score_cache.hits if self.score_cache is not None else 0
+        score = lru_cache(maxsize=SCORE_CACHE_SIZE)(lambda text1, text2: scorer(text1, text2, self.threshold))
+        quick_rejects = 0
+        similar = 0
+        current_index = None
+        current = None
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            # Pairs come out sorted by (i, j), the order find_similar_pairs reports
+            for pair in pairs.merged():
+                i, j = pair >> INDEX_BITS, pair & INDEX_MASK
+                if i != current_index:
+                    current_index, current = i, self.reviews.review(i)
+                other = self.reviews.review(j)
+                similarity = score(current['text'], other['text'])
+                if similarity is None:
+                    quick_rejects += 1
+                elif similarity > self.threshold:
+                    similar += 1
+                    out.write(json.dumps({'similarity': similarity, 'review1': current, 'review2': other},
+                                         ensure_ascii=False) + '\n')
+        os.replace(tmp_path, output_path)
+
+        if stats is not None:
+            # Copies of an already scored pair of texts come from the cache,
+            # and pairs scored on earlier runs from the persistent one
+            run_stats['cached_scores'] = self.score_cache.hits - cached if self.score_cache is not None else 0
+            run_stats['comparisons'] = score.cache_info().misses - run_stats['cached_scores']
+            run_stats['quick_ratio_rejects'] = quick_rejects
+            run_stats['similar_pairs'] = similar
+            run_stats['bucket_seconds'] = bucketed - start
+            run_stats['scoring_seconds'] = perf_counter() - bucketed
+            stats.update(run_stats)
+        return SimilarPairsFile(output_path, similar, temporary)
+
+
+def find_similar_pairs_external(reviews, output_path=None, threshold=SIMILARITY_THRESHOLD,
+                                memory_limit=DEFAULT_MEMORY_LIMIT, spill_dir=None, stats=None, score_cache=None):
+    """Bounded-memory find_similar_pairs over any iterable of review dicts
+
+    Returns a SimilarPairsFile; see ExternalSimilarity.
+    """
+    with ExternalSimilarity(threshold, memory_limit, spill_dir, score_cache) as finder:
+        for review in reviews:
+            finder.add(review)
+        return finder.run(output_path, stats)
+
+
+def iter_review_texts(data_file):
+    """Stream {'text', 'page', 'customer'} reviews from a JSONL dump; other formats are loaded first"""
+    data_file = Path(data_file)
+    if data_file.suffix == JSONL_SUFFIX:
+        page_items = iter_page_records(data_file)
+    elif data_file.suffix == STORE_SUFFIX:
+        page_items = load_reviews(data_file).to_dict().items()
+    else:
+        with open(data_file, 'r') as f:
+            data = json.load(f)
+        if 'reviews_store' in data:
+            # Results written with --format store/jsonl point at the review file
+            yield from iter_review_texts(data_file.parent / data['reviews_store'])
+            return
+        page_items = data.get('all_reviews', data).items()
+
+    for page_path, page_data in page_items:
+        for review in page_data['reviews']:
+            if 'review_text' in review:
+                yield {
+                    'text': review['review_text'],
+                    'page': page_path,
+                    'customer': review.get('customer_name', 'Unknown')
+                }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Find similar reviews in bounded memory, spilling to disk')
+    parser.add_argument('data_file', nargs='?', default='comprehensive_audit_results.json',
+                        help='JSONL dump (streamed), review store or audit JSON to read')
+    parser.add_argument('--output', type=Path, default=Path(SIMILAR_PAIRS_FILENAME),
+                        help='JSON Lines file the similar pairs are streamed to (default: ' + SIMILAR_PAIRS_FILENAME + ')')
+    parser.add_argument('--memory-limit', type=int, default=DEFAULT_MEMORY_LIMIT // (1024 * 1024), metavar='MB',
+                        help=f'Ceiling for the in-memory sort buffers (default: {DEFAULT_MEMORY_LIMIT // (1024 * 1024)} MB)')
+    parser.add_argument('--spill-dir', type=Path, default=None,
+                        help='Directory for the temporary sorted runs (default: the system temp directory)')
+    parser.add_argument('--threshold', type=float, default=SIMILARITY_THRESHOLD,
+                        help=f'Report pairs scoring above this (default: {SIMILARITY_THRESHOLD})')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    stats = {}
+    try:
+        pairs = find_similar_pairs_external(iter_review_texts(args.data_file), args.output, args.threshold,
+                                            args.memory_limit * 1024 * 1024, args.spill_dir, stats)
+    except FileNotFoundError as e:
+        sys.exit(f"❌ Review data not found: {args.data_file}")
+    print(f"🔍 {len(pairs)} similar review pairs among {stats['reviews']} reviews")
+    print(f"   • {stats['candidate_pairs']} candidate pairs from {stats['band_entries']} band entries "
+          f"({stats['band_runs']} band runs, {stats['pair_runs']} pair runs spilled)")
+    print(f"   • {stats['comparisons']} comparisons, {stats['quick_ratio_rejects']} rejected by quick ratios")
+    print(f"✅ Similar pairs saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
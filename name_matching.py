@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+import re
+import sys
+import argparse
+from functools import lru_cache
+from collections import defaultdict
+from review_store import load_reviews, MISSING
+
+# Two full name parts of at least MIN_EDIT_LENGTH letters match within this
+# many edits (more for long names); shorter names differ by one letter too
+# often ("Mark" / "Mary") to say anything...
+MIN_EDIT_LENGTH = 5
+MAX_EDITS_SHORT = 1
+MAX_EDITS_LONG = 2
+LONG_NAME = 7
+# ...or when the shorter one starts the longer one ("Chris" / "Christopher")
+MIN_PREFIX = 3
+
+# Match strengths: an initial is compatible with every name it starts, so
+# WEAK matches only join a cluster when they point at exactly one
+STRONG = 'strong'
+WEAK = 'weak'
+
+_TOKEN = re.compile(r"[^\W\d_]+(?:['-][^\W\d_]+)*")
+
+_SOUNDEX = {}
+for _letters, _digit in [('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'), ('mn', '5'), ('r', '6')]:
+    for _letter in _letters:
+        _SOUNDEX[_letter] = _digit
+
+
+def soundex(token):
+    """American Soundex code of a lower-case token ('robert' -> 'r163')"""
+    code = token[0]
+    last = _SOUNDEX.get(token[0], '')
+    for char in token[1:]:
+        digit = _SOUNDEX.get(char, '')
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if char not in 'hw':
+            last = digit
+    return code.ljust(4, '0')
+
+
+def parse_name(name):
+    """(first, last) lower-case tokens; middle names are dropped, last is None for one-word names"""
+    tokens = _TOKEN.findall(name.lower())
+    if not tokens:
+        return None
+    return tokens[0], (tokens[-1] if len(tokens) > 1 else None)
+
+
+def bounded_edit_distance(a, b, max_distance):
+    """Levenshtein distance, or max_distance + 1 once it must exceed max_distance
+
+    Only the diagonal band |i - j| <= max_distance of the DP table is filled
+    in, so each call costs O(len * max_distance) rather than O(len^2).
+    """
+    if a == b:
+        return 0
+    too_far = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return too_far
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_best = current[0]
+        char_a = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            best = previous[j - 1] + (char_a != b[j - 1])
+            if previous[j] + 1 < best:
+                best = previous[j] + 1
+            if current[j - 1] + 1 < best:
+                best = current[j - 1] + 1
+            current[j] = best
+            if best < row_best:
+                row_best = best
+        if row_best > max_distance:
+            return too_far
+        previous = current
+    return min(previous[-1], too_far)
+
+
+@lru_cache(maxsize=1 << 16)
+def tokens_match(a, b):
+    """Same name part: equal, an initial of the other, a prefix of it, or a few edits away"""
+    if a == b:
+        return True
+    if len(a) == 1 or len(b) == 1:
+        return a[0] == b[0]
+    shorter, longer = sorted((a, b), key=len)
+    if len(shorter) >= MIN_PREFIX and longer.startswith(shorter):
+        return True
+    max_edits = MAX_EDITS_LONG if len(longer) >= LONG_NAME else MAX_EDITS_SHORT
+    return len(shorter) >= MIN_EDIT_LENGTH and bounded_edit_distance(a, b, max_edits) <= max_edits
+
+
+def _initial_only(a, b):
+    return a != b and (len(a) == 1 or len(b) == 1)
+
+
+def names_match(parts1, parts2):
+    """None, STRONG, or WEAK when a part only matched through an initial ("R." / "Robert")"""
+    (first1, last1), (first2, last2) = parts1, parts2
+    if (last1 is None) != (last2 is None):
+        return None
+    if last1 is not None and not tokens_match(last1, last2):
+        return None
+    if not tokens_match(first1, first2):
+        return None
+    if _initial_only(first1, first2) or (last1 is not None and _initial_only(last1, last2)):
+        return WEAK
+    return STRONG
+
+
+def blocking_keys(parts):
+    """Blocks a parsed name is filed under
+
+    Every name is blocked on its surname initial. Full first names add a
+    two-letter prefix block and a phonetic block; first-name initials go to
+    an initial block that is compared against every prefix block sharing
+    that letter.
+    """
+    first, last = parts
+    surname = last[0] if last else ''
+    if len(first) == 1:
+        return [('initial', surname, first)]
+    # Soundex keeps the first letter; use its sound class so Kathy meets Cathy
+    phonetic = _SOUNDEX.get(first[0], '0') + soundex(first)[1:]
+    return [('prefix', surname, first[:2]), ('phonetic', surname, phonetic)]
+
+
+class _Clusters:
+    """Union-find over name ids"""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def find_name_clusters(name_pages, stats=None):
+    """Cluster probable duplicate customers under different spellings
+
+    `name_pages` maps each distinct name to the pages it appears on, in
+    review order. Names are only compared within a block, so the work grows
+    with the block sizes rather than the square of the number of names.
+    Returns clusters of two or more distinct spellings, largest first.
+    """
+    names = list(name_pages)
+    parsed = [parse_name(name) for name in names]
+
+    blocks = defaultdict(list)
+    prefixes_by_initial = defaultdict(set)
+    for name_id, parts in enumerate(parsed):
+        if parts is None:
+            continue
+        for key in blocking_keys(parts):
+            blocks[key].append(name_id)
+            if key[0] == 'prefix':
+                prefixes_by_initial[key[1], key[2][0]].add(key)
+
+    clusters = _Clusters(len(names))
+    weak_partners = defaultdict(list)
+    comparisons = 0
+
+    def compare(a, b):
+        nonlocal comparisons
+        comparisons += 1
+        strength = names_match(parsed[a], parsed[b])
+        if strength == STRONG:
+            clusters.union(a, b)
+        elif strength == WEAK:
+            weak_partners[a].append(b)
+            weak_partners[b].append(a)
+
+    # Each pair is compared once: a phonetic block skips pairs that already
+    # met in their shared prefix block, and an initial block meets each
+    # prefix block with that letter exactly once
+    for key, members in blocks.items():
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if key[0] != 'phonetic' or parsed[a][0][:2] != parsed[b][0][:2]:
+                    compare(a, b)
+        if key[0] == 'initial':
+            # "R. Thompson" has to meet "Robert T." and "Rachel T." in their prefix blocks
+            for prefix_key in prefixes_by_initial.get((key[1], key[2]), ()):
+                for a in members:
+                    for b in blocks[prefix_key]:
+                        compare(a, b)
+
+    # "R. Thompson" and "Robert T." join only when each is the other's sole
+    # candidate: with a "Rachel T." around, "R. Thompson" is ambiguous. Decided
+    # against the strong clusters, so the outcome doesn't depend on order.
+    candidates = {name_id: {clusters.find(partner) for partner in partners} - {clusters.find(name_id)}
+                  for name_id, partners in weak_partners.items()}
+    joins = [(a, b) for a, partners in weak_partners.items() for b in partners
+             if a < b and candidates[a] == {clusters.find(b)} and candidates[b] == {clusters.find(a)}]
+    for a, b in joins:
+        clusters.union(a, b)
+
+    grouped = defaultdict(list)
+    for name_id in range(len(names)):
+        grouped[clusters.find(name_id)].append(name_id)
+
+    result = []
+    for members in grouped.values():
+        if len(members) < 2:
+            continue
+        result.append({
+            'names': [names[name_id] for name_id in members],
+            'pages': sorted({page for name_id in members for page in name_pages[names[name_id]]}),
+            'occurrences': sum(len(name_pages[names[name_id]]) for name_id in members)
+        })
+    result.sort(key=lambda cluster: (-cluster['occurrences'], cluster['names'][0]))
+
+    if stats is not None:
+        stats['names'] = len(names)
+        stats['blocks'] = len(blocks)
+        stats['largest_block'] = max(map(len, blocks.values()), default=0)
+        stats['comparisons'] = comparisons
+        stats['clusters'] = len(result)
+    return result
+
+
+def name_pages_from_store(store):
+    """Every distinct customer name in a ReviewStore -> pages, in review order"""
+    name_pages = defaultdict(list)
+    for name_id, page_id in zip(store.review_name, store.review_page):
+        if name_id != MISSING:
+            name_pages[store.names.values[name_id]].append(store.page_path(page_id))
+    return name_pages
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Find customers listed under slightly different names')
+    parser.add_argument('data_file', nargs='?', default='review_audit_data.reviews',
+                        help='Review store, JSONL dump or legacy JSON to read')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        store = load_reviews(args.data_file)
+    except FileNotFoundError:
+        sys.exit(f"❌ Review data not found: {args.data_file}")
+
+    stats = {}
+    clusters = find_name_clusters(name_pages_from_store(store), stats)
+    print(f"👥 {len(clusters)} probable duplicate customers among {stats['names']} names "
+          f"({stats['comparisons']} comparisons in {stats['blocks']} blocks)")
+    for cluster in clusters:
+        print(f"   • {' / '.join(cluster['names'])}: {cluster['occurrences']} reviews on {len(cluster['pages'])} pages")
+
+
+if __name__ == "__main__":
+    main()
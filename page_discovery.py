@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import json
+from fnmatch import fnmatch
+from pathlib import Path
+from urllib.parse import urlparse
+import xml.etree.ElementTree as ET
+
+# The audit scripts live at the site root, so that is the default page root
+DEFAULT_ROOT = Path(__file__).resolve().parent
+RULES_FILENAME = 'page_rules.json'
+
+_SITEMAP_LOC = '{http://www.sitemaps.org/schemas/sitemap/0.9}loc'
+
+
+def load_page_rules(rules_path=None):
+    """Load the page-type rules (sitemap, globs and category patterns)"""
+    rules_path = Path(rules_path) if rules_path else DEFAULT_ROOT / RULES_FILENAME
+    with open(rules_path, 'r') as f:
+        return json.load(f)
+
+
+def page_category(relative_path, rules):
+    """Return the first category whose patterns match the page, or None"""
+    for category in rules['categories']:
+        if any(fnmatch(relative_path, pattern) for pattern in category['patterns']):
+            return category['name']
+    return None
+
+
+def url_to_relative_path(url):
+    """Map a sitemap URL to the HTML file that serves it (clean URLs → .html)"""
+    path = urlparse(url).path.lstrip('/')
+    if not path or path.endswith('/'):
+        return path + 'index.html'
+    if not path.endswith('.html'):
+        return path + '.html'
+    return path
+
+
+def iter_sitemap_urls(source):
+    """Lazily yield the <loc> URLs of a sitemap (a path or a binary file object)"""
+    for _, element in ET.iterparse(source):
+        if element.tag == _SITEMAP_LOC and element.text:
+            yield element.text.strip()
+        element.clear()
+
+
+def iter_sitemap_pages(root, sitemap_name):
+    """Lazily yield relative page paths listed in sitemap.xml"""
+    sitemap_path = Path(root) / sitemap_name
+    if not sitemap_path.exists():
+        return
+
+    for url in iter_sitemap_urls(sitemap_path):
+        yield url_to_relative_path(url)
+
+
+def iter_glob_pages(root, patterns):
+    """Lazily yield relative page paths matched by the directory globs"""
+    root = Path(root)
+    for pattern in patterns:
+        for page_path in sorted(root.glob(pattern)):
+            yield page_path.relative_to(root).as_posix()
+
+
+def discover_pages(root=DEFAULT_ROOT, rules=None):
+    """Yield (page_path, category) pairs as soon as each page is found
+
+    Pages listed in sitemap.xml come first, in sitemap order, followed by
+    anything else the directory globs turn up. Pages that no category rule
+    matches (blog posts, legal pages, ...) are skipped.
+    """
+    root = Path(root)
+    rules = rules if rules is not None else load_page_rules()
+    seen = set()
+
+    def candidates():
+        yield from iter_sitemap_pages(root, rules.get('sitemap', 'sitemap.xml'))
+        yield from iter_glob_pages(root, rules.get('globs', []))
+
+    for relative_path in candidates():
+        if relative_path in seen:
+            continue
+        seen.add(relative_path)
+
+        category = page_category(relative_path, rules)
+        page_path = root / relative_path
+        if category and page_path.is_file():
+            yield page_path, category
+
+
+def relative_page_path(page_path, root=DEFAULT_ROOT):
+    """Page path relative to the site root, as used for keys in the audit JSON"""
+    return Path(page_path).relative_to(root).as_posix()
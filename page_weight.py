@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import argparse
+from pathlib import Path
+from urllib.parse import urlsplit, unquote
+from page_discovery import discover_pages, load_page_rules, relative_page_path, DEFAULT_ROOT
+
+BUDGETS_FILENAME = 'page_budgets.json'
+
+# Tags that add weight or block rendering, CSS url() references, and the end of <head>
+WEIGHT_PATTERN = re.compile(
+    rb'<(?P<tag>script|style|link|img|source|iframe)\b(?P<attrs>[^>]*)>'
+    rb'|url\(\s*(?P<url>["\']?[^)"\']*)'
+    rb'|(?P<head_end></head\s*>)',
+    re.IGNORECASE)
+ATTR_PATTERN = re.compile(rb'([a-zA-Z_:][-a-zA-Z0-9_:.]*)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+CLOSING_PATTERNS = {
+    b'script': re.compile(rb'</script\s*>', re.IGNORECASE),
+    b'style': re.compile(rb'</style\s*>', re.IGNORECASE)
+}
+CSS_URL_PATTERN = re.compile(rb'url\(\s*["\']?([^)"\']*)')
+
+# Script types the browser runs as JavaScript; anything else (JSON-LD, templates) is data
+JS_TYPES = {'', 'text/javascript', 'application/javascript', 'module'}
+
+# Metrics a budget can limit, in report order
+METRICS = ['html_bytes', 'inline_js_bytes', 'inline_css_bytes', 'scripts', 'blocking_scripts',
+           'blocking_styles', 'image_bytes', 'third_party_origins']
+
+
+def _attributes(raw):
+    attrs = {}
+    for match in ATTR_PATTERN.finditer(raw):
+        value = match.group(2) or match.group(3) or match.group(4) or b''
+        attrs.setdefault(match.group(1).decode('latin-1').lower(), value.decode('utf-8', errors='replace').strip())
+    return attrs
+
+
+def _srcset_urls(srcset):
+    return [candidate.split()[0] for candidate in srcset.split(',') if candidate.strip()]
+
+
+def measure_page_weight(buffer):
+    """What a page makes the browser download and wait for, from its bytes
+
+    `buffer` is the page as bytes or an mmap, the same buffer the review
+    extractor scans; tags are found with a bytes regex and script and style
+    bodies are skipped over rather than decoded. Returns JSON-serialisable
+    counts plus the blocking resources, referenced images and absolute
+    origins; image sizes and first-party hosts are settled later by
+    check_page.
+    """
+    weight = {
+        'html_bytes': len(buffer),
+        'inline_js_bytes': 0,
+        'inline_css_bytes': 0,
+        'json_ld_bytes': 0,
+        'scripts': 0,
+        'blocking_scripts': [],
+        'blocking_styles': [],
+        'images': [],
+        'origins': []
+    }
+    images = {}
+    origins = {}
+
+    def reference(url, is_image=False):
+        url = url.strip()
+        if not url or url.startswith(('#', 'data:', 'javascript:', 'mailto:', 'tel:')):
+            return
+        parts = urlsplit(url)
+        if parts.scheme in ('http', 'https') or url.startswith('//'):
+            origins.setdefault(f"{parts.scheme or 'https'}://{parts.netloc.lower()}", None)
+        if is_image:
+            images.setdefault(url, None)
+
+    in_head = True
+    size = len(buffer)
+    pos = 0
+    while True:
+        match = WEIGHT_PATTERN.search(buffer, pos)
+        if match is None:
+            break
+        pos = match.end()
+        if match.group('head_end'):
+            in_head = False
+            continue
+        if match.group('url') is not None:
+            reference(match.group('url').strip(b'"\'').decode('utf-8', errors='replace'), is_image=True)
+            continue
+
+        tag = match.group('tag').lower()
+        attrs = _attributes(match.group('attrs'))
+        if tag in CLOSING_PATTERNS:
+            end = CLOSING_PATTERNS[tag].search(buffer, pos)
+            body_end = end.start() if end else size
+            body_bytes = body_end - pos
+            body_start, pos = pos, (end.end() if end else size)
+        if tag == b'script':
+            script_type = attrs.get('type', '').lower()
+            if script_type not in JS_TYPES:
+                if script_type == 'application/ld+json':
+                    weight['json_ld_bytes'] += body_bytes
+                continue
+            weight['scripts'] += 1
+            if 'src' in attrs:
+                reference(attrs['src'])
+                # Classic scripts without async/defer stop the parser until they have run
+                if in_head and script_type != 'module' and 'async' not in attrs and 'defer' not in attrs:
+                    weight['blocking_scripts'].append(attrs['src'])
+            else:
+                weight['inline_js_bytes'] += body_bytes
+        elif tag == b'style':
+            weight['inline_css_bytes'] += body_bytes
+            for url in CSS_URL_PATTERN.findall(buffer[body_start:body_start + body_bytes]):
+                reference(url.decode('utf-8', errors='replace'), is_image=True)
+        elif tag == b'link':
+            rel = attrs.get('rel', '').lower().split()
+            if 'href' in attrs and rel and rel != ['canonical'] and 'alternate' not in rel:
+                reference(attrs['href'], is_image='icon' in rel)
+            media = attrs.get('media', 'all').lower()
+            if (in_head and 'stylesheet' in rel and 'disabled' not in attrs
+                    and media in ('all', 'screen', '') and 'href' in attrs):
+                weight['blocking_styles'].append(attrs['href'])
+        elif tag == b'img':
+            for url in ([attrs['src']] if 'src' in attrs else []) + _srcset_urls(attrs.get('srcset', '')):
+                reference(url, is_image=True)
+        elif tag == b'source':
+            # <picture> sources use srcset; <video>/<audio> sources use src and aren't images
+            for url in _srcset_urls(attrs.get('srcset', '')):
+                reference(url, is_image=True)
+            if 'src' in attrs:
+                reference(attrs['src'])
+        elif tag == b'iframe' and 'src' in attrs:
+            reference(attrs['src'])
+
+    weight['images'] = list(images)
+    weight['origins'] = list(origins)
+    return weight
+
+
+def load_budgets(budgets_path=None):
+    budgets_path = Path(budgets_path) if budgets_path else DEFAULT_ROOT / BUDGETS_FILENAME
+    with open(budgets_path, 'r') as f:
+        return json.load(f)
+
+
+def category_budget(budgets, category):
+    """Default budgets with the category's overrides applied"""
+    budget = dict(budgets['budgets'].get('default', {}))
+    budget.update(budgets['budgets'].get(category, {}))
+    return budget
+
+
+class ImageSizes:
+    """Sizes of local images, stat'ed once however many pages reference them"""
+
+    def __init__(self, root, image_dirs):
+        self.root = Path(root).resolve()
+        self.image_dirs = [self.root / image_dir for image_dir in image_dirs]
+        self.sizes = {}
+
+    def size(self, page, url):
+        """Bytes of a page-relative or root-relative image URL, or None when it isn't local"""
+        parts = urlsplit(url)
+        if parts.scheme or parts.netloc:
+            return None
+        path = unquote(parts.path)
+        target = (self.root / path.lstrip('/')) if path.startswith('/') else (self.root / page).parent / path
+        target = Path(os.path.normpath(target))
+        if not any(target.is_relative_to(image_dir) for image_dir in self.image_dirs):
+            return None
+        if target not in self.sizes:
+            try:
+                self.sizes[target] = target.stat().st_size
+            except OSError:
+                self.sizes[target] = None
+        return self.sizes[target]
+
+
+def check_page(page, category, weight, budgets, image_sizes):
+    """Measured values for one page and the budgets they break
+
+    Returns {'page', 'category', 'values', 'over', 'score', ...} where
+    `over` maps each broken metric to [value, budget] and `score` is the
+    worst value/budget ratio, the key pages are ranked by.
+    """
+    first_party = set(budgets.get('first_party', []))
+    third_party = [origin for origin in weight['origins'] if urlsplit(origin).hostname not in first_party]
+    image_bytes = sum(image_sizes.size(page, url) or 0 for url in weight['images'])
+
+    values = {
+        'html_bytes': weight['html_bytes'],
+        'inline_js_bytes': weight['inline_js_bytes'],
+        'inline_css_bytes': weight['inline_css_bytes'],
+        'scripts': weight['scripts'],
+        'blocking_scripts': len(weight['blocking_scripts']),
+        'blocking_styles': len(weight['blocking_styles']),
+        'image_bytes': image_bytes,
+        'third_party_origins': len(third_party)
+    }
+    budget = category_budget(budgets, category)
+    over = {metric: [values[metric], budget[metric]] for metric in METRICS
+            if metric in budget and values[metric] > budget[metric]}
+    # A zero budget ("no blocking scripts") is scored as if it were 1, so
+    # one blocking script rates 2x and none rates 1x
+    ratios = [values[metric] / budget[metric] if budget[metric] else values[metric] + 1
+              for metric in METRICS if metric in budget]
+    return {
+        'page': page,
+        'category': category,
+        'values': values,
+        'over': over,
+        'score': max(ratios, default=0.0),
+        'blocking_scripts': weight['blocking_scripts'],
+        'blocking_styles': weight['blocking_styles'],
+        'third_party_origins': third_party
+    }
+
+
+def check_pages(page_weights, page_categories, budgets, root=DEFAULT_ROOT):
+    """Check every measured page against its category budget, worst first
+
+    `page_weights` maps relative page paths to measure_page_weight results
+    and `page_categories` maps the same paths to page-type categories.
+    """
+    image_sizes = ImageSizes(root, budgets.get('image_dirs', []))
+    report = [check_page(page, page_categories[page], weight, budgets, image_sizes)
+              for page, weight in page_weights.items()]
+    report.sort(key=lambda entry: (-entry['score'], entry['page']))
+    return report
+
+
+def _format_value(metric, value):
+    return f"{value / 1024:.0f} KB" if metric.endswith('_bytes') else str(value)
+
+
+def print_report(report, limit=10):
+    """Print the pages over budget, worst first"""
+    over = [entry for entry in report if entry['over']]
+    if not over:
+        print(f"✅ All {len(report)} pages are within their weight budgets")
+        return
+    print(f"⚠️  {len(over)} of {len(report)} pages are over their weight budgets:")
+    for entry in over[:limit]:
+        print(f"   • {entry['page']} [{entry['category']}]: {entry['score']:.1f}x budget")
+        for metric, (value, budget) in entry['over'].items():
+            print(f"     {metric}: {_format_value(metric, value)} (budget {_format_value(metric, budget)})")
+    if len(over) > limit:
+        print(f"   ... and {len(over) - limit} more")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Check page weight and render-blocking resources against budgets')
+    parser.add_argument('--root', type=Path, default=DEFAULT_ROOT,
+                        help='Site root to check (default: the directory holding this script)')
+    parser.add_argument('--rules', type=Path, default=None,
+                        help='Page-type rules file (default: page_rules.json)')
+    parser.add_argument('--budgets', type=Path, default=None,
+                        help='Budgets file (default: ' + BUDGETS_FILENAME + ')')
+    parser.add_argument('--limit', type=int, default=10, metavar='N',
+                        help='Pages to list (default: 10)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the full ranked report as JSON')
+    return parser.parse_args()
+
+
+def main():
+    # Reuses the review extractor's single read of each page
+    from review_extractor import extract_review_data
+
+    args = parse_args()
+    root = args.root.resolve()
+    try:
+        budgets = load_budgets(args.budgets)
+    except FileNotFoundError:
+        sys.exit(f"❌ Budgets file not found: {args.budgets or BUDGETS_FILENAME}")
+
+    page_weights = {}
+    page_categories = {}
+    for page_path, category in discover_pages(root, load_page_rules(args.rules) if args.rules else None):
+        page = relative_page_path(page_path, root)
+        weight = {}
+        extract_review_data(page_path, weight=weight)
+        page_weights[page] = weight
+        page_categories[page] = category
+
+    report = check_pages(page_weights, page_categories, budgets, root)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"⚖️  Page weight budgets ({len(report)} pages)")
+        print_report(report, args.limit)
+    if any(entry['over'] for entry in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
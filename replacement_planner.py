@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+
+import re
+import sys
+import json
+import argparse
+from glob import glob
+from pathlib import Path
+from functools import lru_cache
+from collections import deque, defaultdict, Counter
+from time import perf_counter
+from page_discovery import DEFAULT_ROOT
+from review_store import load_reviews, MISSING
+from name_matching import find_name_clusters, parse_name
+from service_taxonomy import load_service_taxonomy
+from audit_diff import load_baseline
+
+PLAN_FILENAME = 'replacement_plan.json'
+
+# Generated schema.org Review files (bremen_perfect_reviews.json, ...) are the default pool
+DEFAULT_POOL = ['*_reviews.json']
+
+# Service area pages are named after their city: service-areas/locksmith-new-carlisle-indiana.html
+_CITY_PAGE = re.compile(r'locksmith-(?P<city>[a-z0-9-]+?)-indiana\.html$')
+
+_NO_MATCH = -1
+
+
+def city_slug(location):
+    """'New Carlisle, IN' -> 'new-carlisle'"""
+    city = location.split(',')[0]
+    return '-'.join(re.findall(r'[a-z0-9]+', city.lower()))
+
+
+def page_city(page):
+    match = _CITY_PAGE.search(page)
+    return match.group('city') if match else None
+
+
+def _json_ld_location(node):
+    address = (node.get('itemReviewed') or {}).get('address') or {}
+    if not isinstance(address, dict) or not address.get('addressLocality'):
+        return None
+    region = address.get('addressRegion')
+    return f"{address['addressLocality']}, {region}" if region else address['addressLocality']
+
+
+def _json_ld_author(node):
+    author = node.get('author')
+    if isinstance(author, dict):
+        author = author.get('name')
+    return ' '.join(author.split()) if isinstance(author, str) else None
+
+
+def load_pool(paths):
+    """Candidate reviews from review data files and generated schema.org Review files
+
+    Review stores, JSONL dumps and audit JSON contribute every review they
+    hold; a JSON list of schema.org Reviews contributes its authors, bodies
+    and the reviewed business's locality. Repeated texts are kept once.
+    """
+    pool = []
+    seen_texts = set()
+
+    def add(review):
+        text = review.get('review_text')
+        if review.get('customer_name') and text and text not in seen_texts:
+            seen_texts.add(text)
+            pool.append(review)
+
+    for path in paths:
+        path = Path(path)
+        if path.suffix == '.json':
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if isinstance(data, list):
+                for node in data:
+                    if not isinstance(node, dict):
+                        continue
+                    if node.get('@type') == 'Review':
+                        add({'customer_name': _json_ld_author(node),
+                             'location': _json_ld_location(node),
+                             'review_text': ' '.join(str(node.get('reviewBody', '')).split())})
+                    elif 'customer_name' in node:
+                        add(node)
+                continue
+        store = load_reviews(path)
+        for row in range(store.review_count):
+            add(store.review_dict(row))
+    return pool
+
+
+def duplicate_slots(store):
+    """Rows to rewrite: every appearance of a customer name after its first, in review order"""
+    first_seen = set()
+    slots = []
+    for row, name_id in enumerate(store.review_name):
+        if name_id == MISSING:
+            continue
+        if name_id in first_seen:
+            slots.append(row)
+        else:
+            first_seen.add(name_id)
+    return slots
+
+
+def page_service_tag(store, page_id):
+    """The tag most of a page's reviews carry, or None when no tag has a majority"""
+    tags = Counter(store.review_tag[row] for row in store.page_rows(page_id))
+    if not tags:
+        return None
+    tag_id, count = tags.most_common(1)[0]
+    if tag_id == MISSING or count * 2 <= sum(tags.values()):
+        return None
+    return store.tags.values[tag_id]
+
+
+class PageRequirements:
+    """Whether a candidate review fits a page: its city and its service
+
+    Service area pages take reviews from their own city that don't mention
+    another one. Category and service pages in the taxonomy take tags the
+    taxonomy allows; other service pages take their predominant tag. A
+    candidate without a tag is judged on its text: every service group its
+    keywords hit must be one the page allows, including one that is
+    particular to the page rather than allowed on every category page.
+    """
+
+    def __init__(self, store, page_id, taxonomy, cities, text_labels=None):
+        self.page = store.page_path(page_id)
+        self.city = page_city(self.page)
+        self.taxonomy = taxonomy
+        self.text_labels = text_labels or taxonomy.text_labels
+        self.other_cities = None
+        if self.city is not None:
+            names = [city.replace('-', ' ') for city in cities if city != self.city]
+            if names:
+                self.other_cities = re.compile(r'\b(?:' + '|'.join(map(re.escape, names)) + r')\b', re.IGNORECASE)
+
+        self.groups = self.taxonomy.expected_groups(self.page)
+        service = self.taxonomy.page_service(self.page)
+        if service is not None:
+            self.groups = self.taxonomy.labels(service) & set(self.taxonomy.groups)
+        self.specific_groups = None
+        if self.groups is not None:
+            shared = set(self.taxonomy.groups).intersection(*self.taxonomy.category_pages.values())
+            self.specific_groups = set(self.groups) - shared
+        self.service_tag = None
+        if store.page_category_name(page_id) == 'individual_service_pages' and service is None:
+            self.service_tag = page_service_tag(store, page_id)
+
+        # Pages with the same key accept exactly the same candidates
+        in_taxonomy = self.groups is not None or service is not None
+        self.key = (self.city, self.service_tag, self.page if in_taxonomy else None)
+
+    def fits_city(self, location, text):
+        if self.city is None:
+            return True
+        if location is None or city_slug(location) != self.city:
+            return False
+        return self.other_cities is None or not self.other_cities.search(text)
+
+    def fits_service(self, tag, text=None):
+        """Judged on the tag when there is one, otherwise on the text"""
+        if self.service_tag is not None:
+            if tag is not None:
+                return tag.lower() == self.service_tag.lower()
+            return self.service_tag.lower() in text.lower()
+        if tag is not None:
+            return not self.taxonomy.unexpected_tags(self.page, [tag]) and not self.taxonomy.off_service_tags(self.page, [tag])
+        if self.groups is None:
+            return True
+        labels = self.text_labels(text)
+        groups = labels & set(self.taxonomy.groups)
+        if self.taxonomy.page_service(self.page) is not None and self.page not in labels:
+            return False
+        if not groups <= set(self.groups):
+            return False
+        return bool(groups & self.specific_groups) if self.specific_groups else bool(groups)
+
+
+def max_assignment(adjacency, capacity, right_count):
+    """Fill as many left slots as possible with distinct right vertices
+
+    Left vertex `left` may take up to capacity[left] of the right vertices
+    in adjacency[left]; each right vertex goes to one left vertex at most.
+    This is Hopcroft-Karp generalised to capacities (Dinic's algorithm on
+    source -> left -> right -> sink): identical slots are one left vertex
+    rather than copies with copied edges. Each phase layers the left
+    vertices by BFS and pushes augmenting paths along the layers with an
+    explicit stack. Returns owner[right] = left index or _NO_MATCH.
+    """
+    left_count = len(adjacency)
+    owner = [_NO_MATCH] * right_count
+    used = [0] * left_count
+
+    while True:
+        # Layer 0 is every left vertex with spare capacity; a right vertex
+        # already owned leads on to its owner one layer further
+        level = [-1] * left_count
+        queue = deque(left for left in range(left_count) if used[left] < capacity[left])
+        for left in queue:
+            level[left] = 0
+        found = False
+        while queue:
+            left = queue.popleft()
+            for right in adjacency[left]:
+                other = owner[right]
+                if other == _NO_MATCH:
+                    found = True
+                elif level[other] == -1:
+                    level[other] = level[left] + 1
+                    queue.append(other)
+        if not found:
+            return owner
+
+        next_edge = [0] * left_count
+        for root in range(left_count):
+            while level[root] == 0 and used[root] < capacity[root]:
+                stack = [root]
+                path = []
+                while stack:
+                    left = stack[-1]
+                    edges = adjacency[left]
+                    step = None
+                    while next_edge[left] < len(edges):
+                        right = edges[next_edge[left]]
+                        other = owner[right]
+                        if other == _NO_MATCH or (other != left and level[other] == level[left] + 1):
+                            step = right, other
+                            break
+                        next_edge[left] += 1
+                    if step is None:
+                        # Dead end: drop the vertex from this phase and back up
+                        level[left] = -1
+                        stack.pop()
+                        if path:
+                            path.pop()
+                            next_edge[stack[-1]] += 1
+                        continue
+                    right, other = step
+                    path.append(right)
+                    if other != _NO_MATCH:
+                        stack.append(other)
+                        continue
+                    # Augment: each vertex on the path takes the next right vertex
+                    for path_left, path_right in zip(stack, path):
+                        owner[path_right] = path_left
+                    used[root] += 1
+                    break
+
+
+def plan_replacements(store, pool, taxonomy, stats=None):
+    """Assign a unique pool customer (and one of their reviews) to every duplicate appearance
+
+    Each repeated appearance of a customer name is a slot; each distinct
+    pool customer, with spelling variants of one name counted as one
+    customer, may fill at most one slot, and only with a review that fits
+    the slot's page. Pool customers who match a name staying on the site
+    are left out. The assignment is a maximum bipartite matching, so as
+    many slots as the pool can cover are filled.
+    """
+    start = perf_counter()
+    slots = duplicate_slots(store)
+    replaced = set(slots)
+    kept_names = {store.names.values[name_id] for row, name_id in enumerate(store.review_name)
+                  if name_id != MISSING and row not in replaced}
+
+    # One identity per cluster of spellings; clusters touching a kept name are unusable
+    pool_names = list(dict.fromkeys(review['customer_name'] for review in pool))
+    name_pages = {name: ['site'] for name in kept_names}
+    for name in pool_names:
+        name_pages.setdefault(name, []).append('pool')
+    identity = {}
+    blocked = set(kept_names)
+    for cluster in find_name_clusters(name_pages):
+        if any(name in kept_names for name in cluster['names']):
+            blocked.update(cluster['names'])
+        else:
+            for name in cluster['names']:
+                identity[name] = cluster['names'][0]
+    people = []
+    person_ids = {}
+    person_reviews = defaultdict(list)
+    for review in pool:
+        name = review['customer_name']
+        if name in blocked or parse_name(name) is None:
+            continue
+        person = identity.get(name, name)
+        if person not in person_ids:
+            person_ids[person] = len(people)
+            people.append(person)
+        person_reviews[person_ids[person]].append(review)
+
+    # Candidates are bucketed by (city, tag) so a tag is judged once per bucket.
+    # Slots on pages with the same requirements are interchangeable: they
+    # form one slot class, matched with a capacity instead of one by one
+    buckets = defaultdict(list)
+    for person_id in range(len(people)):
+        for review in person_reviews[person_id]:
+            buckets[city_slug(review['location']) if review.get('location') else None,
+                     review.get('service_tag')].append((person_id, review))
+    text_labels = lru_cache(maxsize=None)(taxonomy.text_labels)
+    cities = {page_city(page) for page in store.pages.values} - {None}
+    slot_pages = [store.review_page[row] for row in slots]
+    class_ids = {}
+    class_candidates = []
+    page_class = {}
+    for page_id in dict.fromkeys(slot_pages):
+        requirements = PageRequirements(store, page_id, taxonomy, cities, text_labels)
+        if requirements.key not in class_ids:
+            fitting = {}
+            for (city, tag), members in buckets.items():
+                if requirements.city is not None and city != requirements.city:
+                    continue
+                if tag is not None and not requirements.fits_service(tag):
+                    continue
+                for person_id, review in members:
+                    text = review['review_text']
+                    if (person_id not in fitting and requirements.fits_city(review.get('location'), text)
+                            and (tag is not None or requirements.fits_service(None, text))):
+                        fitting[person_id] = review
+            class_ids[requirements.key] = len(class_candidates)
+            class_candidates.append(fitting)
+        page_class[page_id] = class_ids[requirements.key]
+    slot_classes = [page_class[page_id] for page_id in slot_pages]
+    adjacency = [sorted(fitting) for fitting in class_candidates]
+    capacity = Counter(slot_classes)
+    built = perf_counter()
+
+    owner = max_assignment(adjacency, [capacity[class_id] for class_id in range(len(adjacency))], len(people))
+
+    # Hand each class's customers to its slots in review order
+    class_people = defaultdict(deque)
+    for person_id, class_id in enumerate(owner):
+        if class_id != _NO_MATCH:
+            class_people[class_id].append(person_id)
+    assignments = []
+    unfilled = []
+    for row, page_id, class_id in zip(slots, slot_pages, slot_classes):
+        page = store.page_path(page_id)
+        entry = {
+            'page': page,
+            'position': row - store.page_review_offsets[page_id],
+            'replace': store.names.values[store.review_name[row]]
+        }
+        if not class_people[class_id]:
+            entry['reason'] = 'pool exhausted' if adjacency[class_id] else 'no pool review fits this page'
+            unfilled.append(entry)
+            continue
+        entry.update(class_candidates[class_id][class_people[class_id].popleft()])
+        assignments.append(entry)
+
+    if stats is not None:
+        stats['slots'] = len(slots)
+        stats['pool_reviews'] = len(pool)
+        stats['pool_customers'] = len(people)
+        stats['blocked_names'] = len(blocked & set(pool_names))
+        stats['slot_classes'] = len(adjacency)
+        stats['edges'] = sum(map(len, adjacency))
+        stats['filled'] = len(assignments)
+        stats['graph_seconds'] = built - start
+        stats['matching_seconds'] = perf_counter() - built
+    return assignments, unfilled
+
+
+def load_site_reviews(path):
+    """Review store behind comprehensive_audit results, or a review data file itself"""
+    baseline = load_baseline(path)
+    if baseline['store'] is None:
+        sys.exit(f"❌ {path} doesn't point at the review data it was run on; rerun the audit")
+    return baseline['store']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Plan unique replacement customers for duplicate review names')
+    parser.add_argument('data_file', nargs='?', default='comprehensive_audit_results.json',
+                        help='comprehensive_audit.py results (or a review store / JSONL dump)')
+    parser.add_argument('--pool', nargs='+', default=DEFAULT_POOL, metavar='PATH',
+                        help='Candidate reviews: generated schema.org Review files or review data '
+                             '(globs allowed; default: *_reviews.json)')
+    parser.add_argument('--taxonomy', type=Path, default=None,
+                        help='Service tag taxonomy (default: service_taxonomy.json)')
+    parser.add_argument('--output', type=Path, default=DEFAULT_ROOT / PLAN_FILENAME,
+                        help='Where to write the plan (default: ' + PLAN_FILENAME + ')')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        store = load_site_reviews(args.data_file)
+    except FileNotFoundError:
+        sys.exit(f"❌ Review data not found: {args.data_file} (run comprehensive_audit.py first)")
+    except ValueError as e:
+        sys.exit(f"❌ Can't read review data: {e}")
+    pool_paths = [path for pattern in args.pool for path in (sorted(glob(pattern)) or [pattern])]
+    try:
+        pool = load_pool(pool_paths)
+    except FileNotFoundError as e:
+        sys.exit(f"❌ Candidate pool not found: {e.filename}")
+    taxonomy = load_service_taxonomy(args.taxonomy)
+
+    stats = {}
+    assignments, unfilled = plan_replacements(store, pool, taxonomy, stats)
+    print(f"🧩 {stats['slots']} duplicate appearances, {stats['pool_customers']} usable pool customers "
+          f"({stats['blocked_names']} already on the site), {stats['slot_classes']} kinds of slot")
+    print(f"✅ Filled {stats['filled']} of {stats['slots']} in "
+          f"{(stats['graph_seconds'] + stats['matching_seconds']) * 1000:.0f} ms")
+    for entry in assignments[:10]:
+        print(f"   • {entry['page']} #{entry['position']}: {entry['replace']} → {entry['customer_name']}"
+              + (f" ({entry['location']})" if entry.get('location') else ''))
+    if len(assignments) > 10:
+        print(f"   ... and {len(assignments) - 10} more")
+    if unfilled:
+        reasons = Counter(entry['reason'] for entry in unfilled)
+        print(f"⚠️  {len(unfilled)} appearances left unfilled: "
+              + ', '.join(f"{count} {reason}" for reason, count in reasons.items()))
+
+    duplicate_counts = Counter(entry['replace'] for entry in assignments + unfilled)
+    plan = {
+        'duplicate_names': {name: count + 1 for name, count in duplicate_counts.items()},
+        'total_replacements_needed': stats['slots'],
+        'assignments': assignments,
+        'unfilled': unfilled,
+        'stats': stats
+    }
+    with open(args.output, 'w') as f:
+        json.dump(plan, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Plan saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
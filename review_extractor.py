@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import html
+import json
+import mmap
+from time import perf_counter
+from collections import deque, namedtuple
+from html.parser import HTMLParser
+from audit_metrics import timed_iter
+from page_weight import measure_page_weight
+
+# Bump whenever the markup rules below change so cached extractions are dropped
+EXTRACTOR_VERSION = '3'
+
+CHUNK_SIZE = 16 * 1024
+REGION_CHUNK_SIZE = 4 * 1024
+
+# Where review cards, stray service tags and JSON-LD blocks start; everything
+# else on the page (head, nav, inline CSS/JS) is skipped without being decoded
+REGION_PATTERN = re.compile(
+    rb'<div\b[^>]*?\bclass\s*=\s*["\'][^"\']*\b(?:review-card|service-tag)\b'
+    rb'|<script\b[^>]*?\btype\s*=\s*["\']?application/ld\+json\b[^>]*>',
+    re.IGNORECASE)
+SCRIPT_END_PATTERN = re.compile(rb'</script\s*>', re.IGNORECASE)
+
+# Star icons on a card and what each one is worth
+STAR_ICONS = {'star': 1.0, 'star_half': 0.5, 'star_border': 0.0, 'star_outline': 0.0}
+
+# kind is one of: card_start, card_end, name, location, text, rating_star,
+# service_tag, json_ld (the raw script body)
+ReviewEvent = namedtuple('ReviewEvent', ['kind', 'offset', 'value'])
+
+
+def _classes(attrs):
+    """Return the class tokens of a tag"""
+    for name, value in attrs:
+        if name == 'class' and value:
+            return set(value.split())
+    return set()
+
+
+def _is_json_ld(attrs):
+    return any(name == 'type' and value and value.strip().lower() == 'application/ld+json'
+               for name, value in attrs)
+
+
+def _decode_span(parts):
+    """Decode captured latin-1 pieces back to clean UTF-8 text"""
+    value = ''.join(parts).encode('latin-1').decode('utf-8', errors='replace')
+    return html.unescape(re.sub(r'\s+', ' ', value)).strip()
+
+
+class ReviewEventParser(HTMLParser):
+    """Incremental tokenizer that turns review-card markup into events
+
+    Pages are fed as raw bytes and decoded as latin-1, so every character is
+    exactly one byte and parser positions are byte offsets into the file.
+    Only the captured spans are re-decoded as UTF-8.
+    """
+
+    def __init__(self, base_offset=0, stats=None):
+        super().__init__(convert_charrefs=False)
+        self.events = []
+        self.stats = stats
+        self._fed = base_offset
+        self._line_starts = deque([base_offset])
+        self._first_line = 1
+        self._divs = []
+        self._card_depth = 0
+        self._capture = None
+        self._location_icon = None
+        self._await_location = None
+        self._text_seen = False
+        self._in_quote = 0
+        # Offset of the end tag that closes the first element fed to the parser
+        self.closed_at = None
+
+    def feed_bytes(self, chunk):
+        """Feed the next chunk of raw page bytes"""
+        text = chunk.decode('latin-1')
+        pos = text.find('\n')
+        while pos != -1:
+            self._line_starts.append(self._fed + pos + 1)
+            pos = text.find('\n', pos + 1)
+        self._fed += len(chunk)
+        self.feed(text)
+
+    def _offset(self):
+        """Byte offset of the construct currently being handled"""
+        lineno, col = self.getpos()
+        while self._first_line < lineno:
+            self._line_starts.popleft()
+            self._first_line += 1
+        return self._line_starts[0] + col
+
+    def _emit(self, kind, offset, value=None):
+        self.events.append(ReviewEvent(kind, offset, value))
+
+    def _start_capture(self, kind, end_tag):
+        self._capture = (kind, self._offset(), end_tag, [])
+
+    def _decode(self, parts):
+        if self.stats is None:
+            return _decode_span(parts)
+        start = perf_counter()
+        value = _decode_span(parts)
+        self.stats['decode_seconds'] = self.stats.get('decode_seconds', 0.0) + perf_counter() - start
+        return value
+
+    def _finish_capture(self):
+        kind, offset, _, parts = self._capture
+        self._capture = None
+        if kind == 'json_ld':
+            # Script bodies are kept verbatim for the JSON parser
+            self._emit(kind, offset, ''.join(parts).encode('latin-1').decode('utf-8', errors='replace'))
+            return
+        value = self._decode(parts)
+        if value:
+            self._emit(kind, offset, value)
+
+    def _finish_location(self):
+        offset, parts = self._await_location
+        self._await_location = None
+        value = self._decode(parts)
+        if value:
+            self._emit('location', offset, value)
+
+    def handle_starttag(self, tag, attrs):
+        if self._await_location is not None:
+            self._finish_location()
+
+        if tag == 'div':
+            classes = _classes(attrs)
+            role = None
+            if 'review-card' in classes:
+                role = 'card'
+                self._card_depth += 1
+                self._text_seen = False
+                self._emit('card_start', self._offset())
+            elif 'service-tag' in classes:
+                role = 'service_tag'
+            elif self._card_depth and 'bg-white' in classes and 'rounded-2xl' in classes:
+                role = 'quote'
+                self._in_quote += 1
+            self._divs.append(role)
+            return
+
+        if self._capture is not None:
+            return
+
+        if tag == 'script' and _is_json_ld(attrs):
+            self._start_capture('json_ld', 'script')
+        elif tag == 'p' and self._card_depth:
+            classes = _classes(attrs)
+            if 'font-bold' in classes:
+                self._start_capture('name', 'p')
+            elif self._in_quote and not self._text_seen:
+                self._text_seen = True
+                self._start_capture('text', 'p')
+        elif tag == 'span':
+            if self._divs and self._divs[-1] == 'service_tag':
+                self._start_capture('service_tag', 'span')
+            elif self._card_depth and 'material-icons' in _classes(attrs):
+                self._location_icon = []
+
+    def handle_endtag(self, tag):
+        if self._await_location is not None:
+            self._finish_location()
+
+        if self._capture is not None and tag == self._capture[2]:
+            self._finish_capture()
+        elif tag == 'span' and self._location_icon is not None:
+            icon = ''.join(self._location_icon).strip()
+            if icon == 'location_on':
+                # Location text follows the location_on icon up to the next tag
+                self._await_location = [None, []]
+            elif icon in STAR_ICONS:
+                self._emit('rating_star', self._offset(), icon)
+            self._location_icon = None
+
+        if tag == 'div' and self._divs:
+            role = self._divs.pop()
+            if role == 'card':
+                self._card_depth -= 1
+                self._emit('card_end', self._offset())
+            elif role == 'quote':
+                self._in_quote -= 1
+            if not self._divs and self.closed_at is None:
+                self.closed_at = self._offset()
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._capture[3].append(data)
+        elif self._await_location is not None:
+            if self._await_location[0] is None and data.strip():
+                self._await_location[0] = self._offset()
+            self._await_location[1].append(data)
+        elif self._location_icon is not None:
+            self._location_icon.append(data)
+
+    def handle_entityref(self, name):
+        self.handle_data(f'&{name};')
+
+    def handle_charref(self, name):
+        self.handle_data(f'&#{name};')
+
+    def handle_comment(self, data):
+        if self._await_location is not None:
+            self._finish_location()
+
+
+def iter_review_events(source, chunk_size=CHUNK_SIZE):
+    """Yield review events from a page, reading it from disk one chunk at a time
+
+    `source` is a file path or an open binary file object.
+    """
+    if hasattr(source, 'read'):
+        yield from _iter_chunks_events(source, chunk_size)
+        return
+
+    with open(source, 'rb') as f:
+        yield from _iter_chunks_events(f, chunk_size)
+
+
+def _iter_chunks_events(f, chunk_size):
+    parser = ReviewEventParser()
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        parser.feed_bytes(chunk)
+        yield from parser.events
+        parser.events.clear()
+
+    parser.close()
+    yield from parser.events
+
+
+def iter_region_events(buffer, chunk_size=REGION_CHUNK_SIZE, stats=None):
+    """Yield review events from the card and service-tag regions of a page buffer
+
+    `buffer` is any bytes-like object, normally an mmap of the page. Region
+    starts are located with a bytes regex and only those regions are sliced
+    out and fed to the tokenizer. If `stats` is a dict, regex time, region
+    matches and decode time are added to it.
+    """
+    covered = 0
+    size = len(buffer)
+    matches = REGION_PATTERN.finditer(buffer)
+    if stats is not None:
+        matches = timed_iter(matches, stats, 'regex_seconds')
+
+    for match in matches:
+        if stats is not None:
+            stats['regex_matches'] = stats.get('regex_matches', 0) + 1
+        start = match.start()
+        if start < covered:
+            # Service tags inside a card were already handled with the card
+            continue
+
+        if match.group().lower().startswith(b'<script'):
+            end = SCRIPT_END_PATTERN.search(buffer, match.end())
+            body_end = end.start() if end else size
+            covered = end.end() if end else size
+            yield ReviewEvent('json_ld', start, bytes(buffer[match.end():body_end]).decode('utf-8', errors='replace'))
+            continue
+
+        parser = ReviewEventParser(base_offset=start, stats=stats)
+        pos = start
+        while parser.closed_at is None and pos < size:
+            parser.feed_bytes(buffer[pos:pos + chunk_size])
+            pos += chunk_size
+
+        if parser.closed_at is None:
+            parser.close()
+            covered = size
+            yield from parser.events
+        else:
+            # Anything parsed past the region's end tag belongs to the next region
+            covered = parser.closed_at + 1
+            yield from (event for event in parser.events if event.offset <= parser.closed_at)
+
+
+def _map_file(f):
+    """Memory-map an open page, or return None when it can't be mapped"""
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        # Empty files, pipes and some network filesystems can't be mapped
+        return None
+
+
+def _number(value):
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _walk_json_ld(node):
+    """Every JSON object in a JSON-LD document, nested ones and @graph included"""
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk_json_ld(item)
+    elif isinstance(node, dict):
+        yield node
+        for value in node.values():
+            if isinstance(value, (list, dict)):
+                yield from _walk_json_ld(value)
+
+
+def _json_ld_types(node):
+    types = node.get('@type', [])
+    return set(types) if isinstance(types, list) else {types}
+
+
+def _author_name(author):
+    if isinstance(author, list):
+        author = author[0] if author else None
+    if isinstance(author, dict):
+        author = author.get('name')
+    return ' '.join(author.split()) if isinstance(author, str) else None
+
+
+def parse_json_ld(blocks):
+    """Pull schema.org Review and AggregateRating data out of raw JSON-LD blocks"""
+    structured = {'reviews': [], 'aggregate_ratings': [], 'invalid_blocks': 0}
+    for block in blocks:
+        try:
+            document = json.loads(block)
+        except ValueError:
+            structured['invalid_blocks'] += 1
+            continue
+
+        for node in _walk_json_ld(document):
+            types = _json_ld_types(node)
+            if 'Review' in types:
+                rating = node.get('reviewRating')
+                structured['reviews'].append({
+                    'author': _author_name(node.get('author')),
+                    'rating': _number(rating.get('ratingValue')) if isinstance(rating, dict) else None,
+                    'text': ' '.join(str(node.get('reviewBody', '')).split())
+                })
+            elif 'AggregateRating' in types:
+                count = node.get('reviewCount', node.get('ratingCount'))
+                structured['aggregate_ratings'].append({
+                    'rating': _number(node.get('ratingValue')),
+                    'count': _number(count),
+                    'best': _number(node.get('bestRating', 5))
+                })
+    return structured
+
+
+def reviews_from_events(events, schema=None):
+    """Assemble review dicts and the page's service tags from an event stream
+
+    If `schema` is a dict it receives the page's JSON-LD reviews and
+    aggregate ratings (see parse_json_ld) plus 'card_ratings': the star
+    rating shown on each visible review, aligned with the returned reviews.
+    """
+    reviews = []
+    service_tags = []
+    card_ratings = []
+    json_ld = []
+    current = None
+    stars = None
+
+    for event in events:
+        if event.kind == 'card_start':
+            current = {}
+            stars = None
+        elif event.kind == 'card_end':
+            if current:
+                reviews.append(current)
+                card_ratings.append(stars)
+            current = None
+        elif event.kind == 'rating_star':
+            if current is not None:
+                stars = (stars or 0.0) + STAR_ICONS[event.value]
+        elif event.kind == 'json_ld':
+            json_ld.append(event.value)
+        elif event.kind == 'service_tag':
+            service_tags.append(event.value)
+            if current is not None:
+                current.setdefault('service_tag', event.value)
+        elif current is not None:
+            key = {'name': 'customer_name', 'location': 'location', 'text': 'review_text'}[event.kind]
+            current.setdefault(key, event.value)
+
+    if schema is not None:
+        schema.update(parse_json_ld(json_ld), card_ratings=card_ratings)
+    return reviews, service_tags
+
+
+def extract_review_data(source, chunk_size=CHUNK_SIZE, stats=None, schema=None, weight=None, digest=None):
+    """Extract reviews and service tags from a page in a single pass
+
+    Paths are memory-mapped and only the review regions are decoded; open
+    file objects, and files that can't be mapped, are streamed in chunks.
+    A page already in memory (bytes, e.g. an HTTP response body) is scanned
+    like a mapped file. Pass a dict as `stats` to collect per-page timings
+    and counts, one as `schema` to collect the JSON-LD review data read
+    in the same pass, and one as `weight` to collect the page weight
+    measured from the same buffer (see page_weight.measure_page_weight).
+    A hashlib object passed as `digest` is updated with the page's bytes,
+    so a cache can fingerprint the page without reading it again.
+    """
+    if hasattr(source, 'read'):
+        if weight is None and digest is None:
+            return reviews_from_events(iter_review_events(source, chunk_size), schema)
+        source = source.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        if stats is not None:
+            stats['bytes'] = len(source)
+        if digest is not None:
+            digest.update(source)
+        if weight is not None:
+            weight.update(measure_page_weight(source))
+        return reviews_from_events(iter_region_events(source, stats=stats), schema)
+
+    start = perf_counter()
+    with open(source, 'rb') as f:
+        mapped = _map_file(f)
+        if mapped is None and (weight is not None or digest is not None):
+            # Unmappable (e.g. empty) files are read once and scanned in memory
+            mapped = f.read()
+        if stats is not None:
+            stats['read_seconds'] = perf_counter() - start
+            stats['bytes'] = len(mapped) if mapped is not None else os.fstat(f.fileno()).st_size
+        if mapped is None:
+            return reviews_from_events(iter_review_events(f, chunk_size), schema)
+        if digest is not None:
+            digest.update(mapped)
+        if weight is not None:
+            weight.update(measure_page_weight(mapped))
+        if isinstance(mapped, bytes):
+            return reviews_from_events(iter_region_events(mapped, stats=stats), schema)
+        with mapped:
+            return reviews_from_events(iter_region_events(mapped, stats=stats), schema)
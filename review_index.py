@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+import sys
+import sqlite3
+import argparse
+from pathlib import Path
+from page_discovery import DEFAULT_ROOT
+from review_store import ReviewStore, REVIEW_FIELDS, load_reviews, STORE_SUFFIX
+
+INDEX_FILENAME = 'review_index.sqlite'
+
+# Bump when the schema below changes; older databases are rebuilt
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    category TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY,
+    page_id INTEGER NOT NULL REFERENCES pages(id),
+    customer_name TEXT,
+    location TEXT,
+    review_text TEXT,
+    service_tag TEXT
+);
+CREATE TABLE IF NOT EXISTS page_service_tags (
+    page_id INTEGER NOT NULL REFERENCES pages(id),
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (page_id, position)
+);
+CREATE INDEX IF NOT EXISTS pages_category ON pages(category);
+CREATE INDEX IF NOT EXISTS reviews_page ON reviews(page_id);
+CREATE INDEX IF NOT EXISTS reviews_customer_name ON reviews(customer_name);
+CREATE INDEX IF NOT EXISTS reviews_service_tag ON reviews(service_tag);
+CREATE INDEX IF NOT EXISTS reviews_location ON reviews(location);
+"""
+
+
+class ReviewIndex:
+    """SQLite copy of the review data with indexes for cross-page questions
+
+    Rows keep the extraction order (page and review ids follow the store),
+    so query results come back in the same order the in-memory analyses
+    report them.
+    """
+
+    def __init__(self, db_path, read_only=False):
+        self.db_path = Path(db_path)
+        if read_only:
+            # Reading someone else's index must never create or rebuild it
+            if not self.db_path.exists():
+                raise FileNotFoundError(2, 'No such file or directory', str(self.db_path))
+            self.conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True)
+            version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self.conn.close()
+                raise ValueError(f"{self.db_path} is not a review index (schema version {version}, "
+                                 f"expected {SCHEMA_VERSION})")
+            return
+        self.conn = sqlite3.connect(self.db_path)
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.conn.executescript("""
+                DROP TABLE IF EXISTS page_service_tags;
+                DROP TABLE IF EXISTS reviews;
+                DROP TABLE IF EXISTS pages;
+            """)
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_store(self, store):
+        """Replace the indexed data with the contents of a ReviewStore"""
+        with self.conn:
+            self.conn.execute('DELETE FROM page_service_tags')
+            self.conn.execute('DELETE FROM reviews')
+            self.conn.execute('DELETE FROM pages')
+            self.conn.executemany(
+                'INSERT INTO pages (id, path, category) VALUES (?, ?, ?)',
+                ((page_id, page, store.page_category_name(page_id))
+                 for page_id, page in enumerate(store.pages.values)))
+            self.conn.executemany(
+                'INSERT INTO reviews (id, page_id, customer_name, location, review_text, service_tag)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                ((row, store.review_page[row],
+                  store.names.get(store.review_name[row]),
+                  store.locations.get(store.review_location[row]),
+                  store.texts.get(store.review_text[row]),
+                  store.tags.get(store.review_tag[row]))
+                 for row in range(store.review_count)))
+            self.conn.executemany(
+                'INSERT INTO page_service_tags (page_id, position, tag) VALUES (?, ?, ?)',
+                ((page_id, position, tag)
+                 for page_id in range(store.page_count)
+                 for position, tag in enumerate(store.page_service_tags(page_id))))
+
+    def to_store(self):
+        """Load the indexed data back into a ReviewStore"""
+        store = ReviewStore()
+        reviews = self.conn.execute(
+            'SELECT page_id, customer_name, location, review_text, service_tag FROM reviews ORDER BY id')
+        service_tags = self.conn.execute('SELECT page_id, tag FROM page_service_tags ORDER BY page_id, position')
+        next_review = next(reviews, None)
+        next_tag = next(service_tags, None)
+
+        for page_id, path, category in self.conn.execute('SELECT id, path, category FROM pages ORDER BY id'):
+            page_reviews = []
+            while next_review is not None and next_review[0] == page_id:
+                page_reviews.append({field: value for field, value in zip(REVIEW_FIELDS, next_review[1:])
+                                     if value is not None})
+                next_review = next(reviews, None)
+            page_tags = []
+            while next_tag is not None and next_tag[0] == page_id:
+                page_tags.append(next_tag[1])
+                next_tag = next(service_tags, None)
+            store.add_page(path, category, page_reviews, page_tags)
+        return store
+
+    def duplicate_names(self):
+        """Customer names on more than one review, mapped to their pages"""
+        rows = self.conn.execute("""
+            SELECT r.customer_name, p.path FROM reviews r JOIN pages p ON p.id = r.page_id
+            WHERE r.customer_name IN (
+                SELECT customer_name FROM reviews WHERE customer_name IS NOT NULL
+                GROUP BY customer_name HAVING COUNT(*) > 1)
+            ORDER BY r.id
+        """)
+        duplicates = {}
+        for name, page in rows:
+            duplicates.setdefault(name, []).append(page)
+        return duplicates
+
+    def pages_for_name(self, name):
+        rows = self.conn.execute("""
+            SELECT DISTINCT p.path FROM reviews r JOIN pages p ON p.id = r.page_id
+            WHERE r.customer_name = ? ORDER BY p.id
+        """, (name,))
+        return [page for (page,) in rows]
+
+    def pages_for_tag(self, tag):
+        rows = self.conn.execute("""
+            SELECT DISTINCT p.path FROM reviews r JOIN pages p ON p.id = r.page_id
+            WHERE r.service_tag = ? ORDER BY p.id
+        """, (tag,))
+        return [page for (page,) in rows]
+
+    def pages_for_location(self, location):
+        rows = self.conn.execute("""
+            SELECT DISTINCT p.path FROM reviews r JOIN pages p ON p.id = r.page_id
+            WHERE r.location = ? ORDER BY p.id
+        """, (location,))
+        return [page for (page,) in rows]
+
+    def tag_counts(self, category):
+        """(tag, count) for a page category, most common first like Counter.most_common"""
+        return self.conn.execute("""
+            SELECT r.service_tag, COUNT(*) FROM reviews r JOIN pages p ON p.id = r.page_id
+            WHERE p.category = ? AND r.service_tag IS NOT NULL
+            GROUP BY r.service_tag ORDER BY COUNT(*) DESC, MIN(r.id)
+        """, (category,)).fetchall()
+
+    def page_count(self, category=None):
+        if category is None:
+            return self.conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+        return self.conn.execute('SELECT COUNT(*) FROM pages WHERE category = ?', (category,)).fetchone()[0]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Query the SQLite review index')
+    parser.add_argument('--db', type=Path, default=DEFAULT_ROOT / INDEX_FILENAME,
+                        help='Index database (default: ' + INDEX_FILENAME + ' at the site root)')
+    parser.add_argument('--build-from', type=Path, default=None, metavar='PATH',
+                        help='(Re)build the index from a review store (' + STORE_SUFFIX + ') or JSON dump first')
+    parser.add_argument('--name', help='Pages showing this customer name')
+    parser.add_argument('--tag', help='Pages showing this service tag')
+    parser.add_argument('--location', help='Pages with reviews from this location')
+    parser.add_argument('--category-tags', metavar='CATEGORY', help='Service tag counts for a page category')
+    parser.add_argument('--duplicates', action='store_true', help='Customer names that appear on several reviews')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.build_from is None and not args.db.exists():
+        sys.exit(f"❌ Review index not found: {args.db} (build it with --build-from or an extractor's --index)")
+
+    with ReviewIndex(args.db) as index:
+        if args.build_from is not None:
+            index.write_store(load_reviews(args.build_from))
+            print(f"✅ Indexed {index.page_count()} pages from {args.build_from} into {args.db}")
+
+        for label, value, lookup in [('customer', args.name, index.pages_for_name),
+                                     ('service tag', args.tag, index.pages_for_tag),
+                                     ('location', args.location, index.pages_for_location)]:
+            if value is not None:
+                pages = lookup(value)
+                print(f"\n📄 Pages with {label} {value!r}: {len(pages)}")
+                for page in pages:
+                    print(f"   • {page}")
+
+        if args.category_tags:
+            print(f"\n🏷️  Service tags on {args.category_tags} ({index.page_count(args.category_tags)} pages):")
+            for tag, count in index.tag_counts(args.category_tags):
+                print(f"   • {tag}: {count} occurrences")
+
+        if args.duplicates:
+            duplicates = index.duplicate_names()
+            print(f"\n👥 {len(duplicates)} customer names appear on multiple reviews:")
+            for name, pages in duplicates.items():
+                print(f"   • {name}: {len(pages)} reviews")
+
+
+if __name__ == "__main__":
+    main()
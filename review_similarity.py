@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import struct
+import hashlib
+import difflib
+from collections import defaultdict
+from itertools import combinations
+from time import perf_counter
+from pathlib import Path
+from review_store import load_reviews, iter_page_records, STORE_SUFFIX, JSONL_SUFFIX
+
+# Same thresholds the audit scripts have always reported against
+SIMILARITY_THRESHOLD = 0.8
+NEAR_IDENTICAL_THRESHOLD = 0.95
+
+# MinHash / LSH tuning: 5-char shingles, 288 hashes split into 96 bands of 3 rows.
+# A pair is sent to the exact scorer if any band matches, which happens with
+# probability 1 - (1 - J^3)^96 for shingle Jaccard J. Pairs scoring above 0.8
+# on the site all have J >= 0.47 (reworded synthetic ones go down to ~0.38),
+# where that is ~0.99997 (~0.996); at J=0.1, where most unrelated reviews sit,
+# it is ~0.09. Two-row bands also collided on ~27% of those unrelated pairs,
+# and 64 three-row bands left ~3% of pairs at J=0.38 unscored.
+SHINGLE_SIZE = 5
+NUM_PERM = 288
+BANDS = 96
+
+# Band collisions are then dropped unless at least this share of the full
+# signature agrees. Reviews written from the same vocabulary collide in some
+# band often; this keeps those pairs away from difflib at ~no cost in recall
+# (288 hashes estimate J to within ~0.03, and flagged pairs start at ~0.38).
+MIN_SIGNATURE_AGREEMENT = 0.25
+
+# Each shingle is hashed once with SHAKE-128; the digest is read as NUM_PERM
+# independent 32-bit hash values, one per MinHash "permutation"
+_UNPACK_HASHES = struct.Struct(f'<{NUM_PERM}I').unpack
+_DIGEST_SIZE = 4 * NUM_PERM
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Return the set of character shingles for a normalised review text"""
+    text = ' '.join(text.lower().split())
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash_signature(text):
+    """Compute the MinHash signature of a review text"""
+    hashes = [_UNPACK_HASHES(hashlib.shake_128(shingle.encode('utf-8')).digest(_DIGEST_SIZE))
+              for shingle in shingles(text)]
+    return list(map(min, zip(*hashes)))
+
+
+def lsh_candidate_pairs(signatures, bands=BANDS):
+    """Yield index pairs (i < j) whose signatures collide in at least one band
+
+    Each pair is yielded once, from the first band it collides in, so no
+    set of every colliding pair is built up.
+    """
+    if not signatures:
+        return
+    rows = len(signatures[0]) // bands
+
+    for band in range(bands):
+        buckets = defaultdict(list)
+        start = band * rows
+        for idx, signature in enumerate(signatures):
+            buckets[tuple(signature[start:start + rows])].append(idx)
+        for members in buckets.values():
+            for i, j in combinations(members, 2):
+                first, second = signatures[i], signatures[j]
+                if any(first[earlier:earlier + rows] == second[earlier:earlier + rows]
+                       for earlier in range(0, start, rows)):
+                    continue
+                yield i, j
+
+
+def signature_agreement(signature1, signature2):
+    """Estimate shingle Jaccard similarity from two MinHash signatures"""
+    return sum(a == b for a, b in zip(signature1, signature2)) / len(signature1)
+
+
+def similarity_bound(text1, text2, threshold=SIMILARITY_THRESHOLD):
+    """(ratio, None) for a scored pair, or (None, bound) when an upper bound <= threshold rules it out"""
+    matcher = difflib.SequenceMatcher(None, text1, text2)
+    bound = matcher.real_quick_ratio()
+    if bound > threshold:
+        bound = matcher.quick_ratio()
+    if bound <= threshold:
+        return None, bound
+    return matcher.ratio(), None
+
+
+def similarity_score(text1, text2, threshold=SIMILARITY_THRESHOLD):
+    """Exact difflib ratio, or None when the cheap upper bounds rule the pair out"""
+    return similarity_bound(text1, text2, threshold)[0]
+
+
+def _as_pairs(reviews, scored):
+    """Turn (i, j, similarity) tuples into the pair dicts the audits report"""
+    return [{
+        'similarity': similarity,
+        'review1': reviews[i],
+        'review2': reviews[j]
+    } for i, j, similarity in sorted(scored)]
+
+
+def find_similar_pairs(reviews, threshold=SIMILARITY_THRESHOLD, stats=None, signatures=None, score_cache=None):
+    """Find review pairs above the threshold using a MinHash/LSH candidate index
+
+    `reviews` is a list of dicts with a 'text' key. The result matches
+    brute_force_similar_pairs: pairs are ordered by position in `reviews` and
+    scored with the same difflib ratio, only far fewer pairs get scored.
+    If `stats` is a dict, comparison counts and timings are added to it.
+    `signatures` may map texts to MinHash signatures computed elsewhere
+    (e.g. by the audit shards); texts missing from it are signed here.
+    With a ScoreCache (score_cache.py) only text pairs it hasn't seen
+    before are run through difflib.
+    """
+    # Identical texts are grouped so each distinct text is hashed once
+    text_ids = {}
+    members = []
+    review_text_ids = []
+    for idx, review in enumerate(reviews):
+        text_id = text_ids.setdefault(review['text'], len(text_ids))
+        if text_id == len(members):
+            members.append([])
+        members[text_id].append(idx)
+        review_text_ids.append(text_id)
+
+    texts = list(text_ids)
+    scored = []
+
+    # Copies of the same text are always a 1.0 match
+    if 1.0 > threshold:
+        for group in members:
+            scored.extend((i, j, 1.0) for i, j in combinations(group, 2))
+
+    start = perf_counter()
+    known = signatures or {}
+    signatures = [known.get(text) or minhash_signature(text) for text in texts]
+    signed = perf_counter()
+    scores = {}
+    candidates = 0
+    filtered = 0
+    score = score_cache.score if score_cache is not None else similarity_score
+    cached = score_cache.hits if score_cache is not None else 0
+
+    for u, v in lsh_candidate_pairs(signatures):
+        candidates += 1
+        if signature_agreement(signatures[u], signatures[v]) < MIN_SIGNATURE_AGREEMENT:
+            filtered += 1
+            continue
+        for i in members[u]:
+            for j in members[v]:
+                # difflib is not symmetric, so score in review order like the brute-force loop
+                first, second = (i, j) if i < j else (j, i)
+                key = (review_text_ids[first], review_text_ids[second])
+                if key not in scores:
+                    scores[key] = score(texts[key[0]], texts[key[1]], threshold)
+                similarity = scores[key]
+                if similarity is not None and similarity > threshold:
+                    scored.append((first, second, similarity))
+
+    if stats is not None:
+        stats['reviews'] = len(reviews)
+        stats['unique_texts'] = len(texts)
+        stats['candidate_pairs'] = candidates
+        stats['signature_filtered_pairs'] = filtered
+        stats['cached_scores'] = score_cache.hits - cached if score_cache is not None else 0
+        stats['comparisons'] = len(scores) - stats['cached_scores']
+        stats['quick_ratio_rejects'] = sum(1 for score in scores.values() if score is None)
+        stats['similar_pairs'] = len(scored)
+        stats['signature_seconds'] = signed - start
+        stats['scoring_seconds'] = perf_counter() - signed
+
+    return _as_pairs(reviews, scored)
+
+
+def brute_force_similar_pairs(reviews, threshold=SIMILARITY_THRESHOLD):
+    """Reference O(n^2) comparison of every review pair"""
+    scored = []
+    for i, review1 in enumerate(reviews):
+        for j, review2 in enumerate(reviews[i+1:], i+1):
+            similarity = difflib.SequenceMatcher(None, review1['text'], review2['text']).ratio()
+            if similarity > threshold:
+                scored.append((i, j, similarity))
+
+    return _as_pairs(reviews, scored)
+
+
+def check_recall(reviews, threshold=SIMILARITY_THRESHOLD):
+    """Compare LSH results against the brute-force path"""
+    def pair_keys(pairs):
+        return {(id(pair['review1']), id(pair['review2'])) for pair in pairs}
+
+    expected = pair_keys(brute_force_similar_pairs(reviews, threshold))
+    found = pair_keys(find_similar_pairs(reviews, threshold))
+    missed = expected - found
+
+    return {
+        'expected_pairs': len(expected),
+        'found_pairs': len(found & expected),
+        'missed_pairs': len(missed),
+        'recall': 1.0 if not expected else len(found & expected) / len(expected)
+    }
+
+
+def collect_review_texts(page_items):
+    """Flatten (page, page_data) pairs into the review list the similarity checks consume"""
+    review_texts = []
+    for page_path, page_data in page_items:
+        for review in page_data['reviews']:
+            if 'review_text' in review:
+                review_texts.append({
+                    'text': review['review_text'],
+                    'page': page_path,
+                    'customer': review.get('customer_name', 'Unknown')
+                })
+    return review_texts
+
+
+def load_review_texts(data_file):
+    """Load the review list from an audit JSON file or a review store"""
+    data_file = Path(data_file)
+    if data_file.suffix == STORE_SUFFIX:
+        return collect_review_texts(load_reviews(data_file).to_dict().items())
+    if data_file.suffix == JSONL_SUFFIX:
+        return collect_review_texts(iter_page_records(data_file))
+
+    with open(data_file, 'r') as f:
+        data = json.load(f)
+    if 'reviews_store' in data:
+        # Results written with --format store/jsonl point at the review file
+        return load_review_texts(data_file.parent / data['reviews_store'])
+    return collect_review_texts(data.get('all_reviews', data).items())
+
+
+def main():
+    # Recall check against an existing audit data file
+    data_file = sys.argv[1] if len(sys.argv) > 1 else 'comprehensive_audit_results.json'
+
+    print("🔍 Checking MinHash/LSH recall against brute-force comparison...")
+    print("=" * 60)
+    result = check_recall(load_review_texts(data_file))
+    print(f"Expected pairs: {result['expected_pairs']}")
+    print(f"Found pairs: {result['found_pairs']}")
+    print(f"Missed pairs: {result['missed_pairs']}")
+    print(f"Recall: {result['recall']:.2%}")
+
+    if result['missed_pairs']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
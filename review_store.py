@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import struct
+from array import array
+from pathlib import Path
+
+# Binary store written by the audit scripts next to (or instead of) the JSON dumps
+STORE_SUFFIX = '.reviews'
+STORE_MAGIC = b'RVSTORE1'
+
+# JSON Lines dump: one page record per line, written and read a page at a time
+JSONL_SUFFIX = '.jsonl'
+
+# --format choice of the audit scripts -> review file suffix
+FORMAT_SUFFIXES = {'store': STORE_SUFFIX, 'json': '.json', 'jsonl': JSONL_SUFFIX}
+
+# Review dict keys, in the order the extractor emits them
+REVIEW_FIELDS = ['customer_name', 'location', 'review_text', 'service_tag']
+
+# Column id for "this review has no such field"
+MISSING = -1
+
+
+class StringTable:
+    """Interned strings: each distinct value is stored once and referenced by id"""
+
+    def __init__(self, values=()):
+        self.values = []
+        self.ids = {}
+        for value in values:
+            self.intern(value)
+
+    def intern(self, value):
+        if value is None:
+            return MISSING
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return string_id
+
+    def get(self, string_id):
+        return None if string_id == MISSING else self.values[string_id]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class ReviewStore:
+    """Column-oriented review data for a whole site
+
+    Pages, categories, customer names, locations, review texts and service
+    tags are interned into string tables, and every review is one row of
+    integer ids across the review_* columns. A page's reviews are the
+    contiguous rows page_review_offsets[p]:page_review_offsets[p + 1];
+    its full service-tag list (tags outside cards included) is stored the
+    same way in page_tag_ids.
+    """
+
+    def __init__(self):
+        self.pages = StringTable()
+        self.categories = StringTable()
+        self.names = StringTable()
+        self.locations = StringTable()
+        self.texts = StringTable()
+        self.tags = StringTable()
+
+        self.page_category = array('i')
+        self.page_review_offsets = array('I', [0])
+        self.page_tag_offsets = array('I', [0])
+        self.page_tag_ids = array('i')
+
+        self.review_page = array('i')
+        self.review_name = array('i')
+        self.review_location = array('i')
+        self.review_text = array('i')
+        self.review_tag = array('i')
+
+    # Building
+
+    def add_page(self, page, category, reviews, service_tags=()):
+        """Append one page's extraction result, returning its page id"""
+        page_id = self.pages.intern(page)
+        if page_id != len(self.page_category):
+            raise ValueError(f"page already in store: {page}")
+
+        self.page_category.append(self.categories.intern(category))
+        for review in reviews:
+            self.review_page.append(page_id)
+            self.review_name.append(self.names.intern(review.get('customer_name')))
+            self.review_location.append(self.locations.intern(review.get('location')))
+            self.review_text.append(self.texts.intern(review.get('review_text')))
+            self.review_tag.append(self.tags.intern(review.get('service_tag')))
+        self.page_review_offsets.append(len(self.review_page))
+
+        self.page_tag_ids.extend(self.tags.intern(tag) for tag in service_tags)
+        self.page_tag_offsets.append(len(self.page_tag_ids))
+        return page_id
+
+    @classmethod
+    def from_dict(cls, all_reviews):
+        """Build a store from the legacy {page: {'category', 'reviews', ...}} dict"""
+        return cls.from_items(all_reviews.items())
+
+    @classmethod
+    def from_items(cls, page_items):
+        """Build a store from (page, page_data) pairs, consuming them one at a time"""
+        store = cls()
+        for page, page_data in page_items:
+            store.add_page(page, page_data['category'], page_data['reviews'],
+                           page_data.get('all_service_tags', ()))
+        return store
+
+    # Reading
+
+    @property
+    def page_count(self):
+        return len(self.page_category)
+
+    @property
+    def review_count(self):
+        return len(self.review_page)
+
+    def page_path(self, page_id):
+        return self.pages.values[page_id]
+
+    def page_category_name(self, page_id):
+        return self.categories.values[self.page_category[page_id]]
+
+    def page_rows(self, page_id):
+        """Row range of a page's reviews"""
+        return range(self.page_review_offsets[page_id], self.page_review_offsets[page_id + 1])
+
+    def page_service_tags(self, page_id):
+        """Every service tag on the page, in page order"""
+        start, end = self.page_tag_offsets[page_id], self.page_tag_offsets[page_id + 1]
+        return [self.tags.values[tag_id] for tag_id in self.page_tag_ids[start:end]]
+
+    def review_dict(self, row):
+        """Rebuild the extractor's review dict for one row"""
+        values = (self.names.get(self.review_name[row]),
+                  self.locations.get(self.review_location[row]),
+                  self.texts.get(self.review_text[row]),
+                  self.tags.get(self.review_tag[row]))
+        return {field: value for field, value in zip(REVIEW_FIELDS, values) if value is not None}
+
+    def page_reviews(self, page_id):
+        return [self.review_dict(row) for row in self.page_rows(page_id)]
+
+    def to_dict(self, include_service_tags=False):
+        """Expand back to the legacy nested dict (for JSON output)"""
+        all_reviews = {}
+        for page_id, page in enumerate(self.pages.values):
+            page_data = {
+                'category': self.page_category_name(page_id),
+                'reviews': self.page_reviews(page_id)
+            }
+            if include_service_tags:
+                page_data['all_service_tags'] = self.page_service_tags(page_id)
+            all_reviews[page] = page_data
+        return all_reviews
+
+    # Serialization
+
+    def _tables(self):
+        return [self.pages, self.categories, self.names, self.locations, self.texts, self.tags]
+
+    def _columns(self):
+        return [self.page_category, self.page_review_offsets, self.page_tag_offsets, self.page_tag_ids,
+                self.review_page, self.review_name, self.review_location, self.review_text, self.review_tag]
+
+    def save(self, path):
+        """Write the store as string tables plus little-endian integer columns"""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(STORE_MAGIC)
+            for table in self._tables():
+                _write_strings(f, table.values)
+            for column in self._columns():
+                _write_column(f, column)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        store = cls()
+        with open(path, 'rb') as f:
+            if f.read(len(STORE_MAGIC)) != STORE_MAGIC:
+                raise ValueError(f"not a review store: {path}")
+            for table in store._tables():
+                for value in _read_strings(f):
+                    table.intern(value)
+            for column in store._columns():
+                del column[:]
+                column.extend(_read_column(f, column.typecode))
+        return store
+
+
+def _little_endian(column):
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+def _write_column(f, column):
+    f.write(struct.pack('<I', len(column)))
+    f.write(_little_endian(column).tobytes())
+
+
+def _read_column(f, typecode):
+    (count,) = struct.unpack('<I', f.read(4))
+    column = array(typecode)
+    column.frombytes(f.read(count * column.itemsize))
+    if len(column) != count:
+        raise ValueError("truncated review store")
+    return _little_endian(column)
+
+
+def _write_strings(f, values):
+    encoded = [value.encode('utf-8') for value in values]
+    _write_column(f, array('I', map(len, encoded)))
+    f.write(b''.join(encoded))
+
+
+def _read_strings(f):
+    lengths = _read_column(f, 'I')
+    blob = f.read(sum(lengths))
+    if len(blob) != sum(lengths):
+        raise ValueError("truncated review store")
+    values = []
+    pos = 0
+    for length in lengths:
+        values.append(blob[pos:pos + length].decode('utf-8'))
+        pos += length
+    return values
+
+
+class PageRecordWriter:
+    """Write page records to a JSON Lines file as they are extracted
+
+    Each add_page() call writes and flushes one line, so the file never
+    needs the whole site in memory and a reader can follow it while the
+    audit is still running. The file only takes its final name on close().
+    """
+
+    def __init__(self, path, include_service_tags=False):
+        self.path = Path(path)
+        self.include_service_tags = include_service_tags
+        self.tmp_path = self.path.with_name(self.path.name + '.tmp')
+        self.f = open(self.tmp_path, 'w', encoding='utf-8')
+        self.pages = 0
+
+    def add_page(self, page, category, reviews, service_tags=()):
+        record = {'page': page, 'category': category, 'reviews': reviews}
+        if self.include_service_tags:
+            record['all_service_tags'] = list(service_tags)
+        self.f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.f.flush()
+        self.pages += 1
+
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+            self.tmp_path.replace(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.f.close()
+            self.tmp_path.unlink()
+
+
+def iter_page_records(path):
+    """Lazily yield (page, page_data) from a JSON Lines dump, one line at a time
+
+    page_data has the legacy {'category', 'reviews'[, 'all_service_tags']}
+    shape, so code written against the nested JSON dict works unchanged.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record.pop('page'), record
+
+
+def load_reviews(path):
+    """Load review data from a binary store, a JSON Lines dump or a legacy JSON dump"""
+    path = Path(path)
+    if path.suffix == STORE_SUFFIX:
+        return ReviewStore.load(path)
+    if path.suffix == JSONL_SUFFIX:
+        return ReviewStore.from_items(iter_page_records(path))
+    with open(path, 'r') as f:
+        return ReviewStore.from_dict(json.load(f))
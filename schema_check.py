@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+from collections import defaultdict, Counter
+
+
+def _name_key(name):
+    return ' '.join(name.lower().split()) if name else None
+
+
+def _text_key(text):
+    return ' '.join(text.split()) if text else ''
+
+
+def _number(value):
+    return 'missing' if value is None else f'{value:g}'
+
+
+def check_page_schema(page_path, reviews, schema):
+    """Cross-check a page's visible review cards against its JSON-LD Reviews
+
+    Cards and schema reviews are joined on the author's name through a
+    dict lookup (first unused schema review per name). Pages without any
+    Review markup are left alone: most service pages simply don't have it.
+    """
+    structured = schema.get('reviews', [])
+    if not structured:
+        return []
+
+    issues = []
+    card_ratings = schema.get('card_ratings', [])
+
+    if len(structured) != len(reviews):
+        issues.append({
+            'page': page_path,
+            'issue': f'Review count mismatch: {len(reviews)} visible cards, {len(structured)} JSON-LD reviews',
+            'visible_count': len(reviews),
+            'schema_count': len(structured)
+        })
+
+    by_author = defaultdict(list)
+    for schema_review in structured:
+        by_author[_name_key(schema_review['author'])].append(schema_review)
+
+    for idx, review in enumerate(reviews):
+        name = review.get('customer_name')
+        matches = by_author.get(_name_key(name))
+        if not matches:
+            issues.append({
+                'page': page_path,
+                'issue': 'Visible review has no JSON-LD Review',
+                'customer': name or 'Unknown'
+            })
+            continue
+
+        schema_review = matches.pop(0)
+        visible_rating = card_ratings[idx] if idx < len(card_ratings) else None
+        if (visible_rating is not None and schema_review['rating'] is not None
+                and visible_rating != schema_review['rating']):
+            issues.append({
+                'page': page_path,
+                'issue': 'Rating mismatch',
+                'customer': name,
+                'visible_rating': visible_rating,
+                'schema_rating': schema_review['rating']
+            })
+        if _text_key(review.get('review_text')) != _text_key(schema_review['text']):
+            issues.append({
+                'page': page_path,
+                'issue': 'Review text mismatch',
+                'customer': name,
+                'visible_text': review.get('review_text', ''),
+                'schema_text': schema_review['text']
+            })
+
+    for leftovers in by_author.values():
+        for schema_review in leftovers:
+            issues.append({
+                'page': page_path,
+                'issue': 'JSON-LD Review has no visible card',
+                'customer': schema_review['author'] or 'Unknown'
+            })
+
+    return issues
+
+
+def check_aggregate_ratings(schemas):
+    """Check AggregateRating blocks on each page and against the rest of the site
+
+    `schemas` maps page -> schema data. Every page describes the same
+    business, so its AggregateRating should match the site-wide majority;
+    reviewCount can't be below the number of reviews marked up on the page.
+    """
+    issues = []
+    totals = Counter()
+    for schema in schemas.values():
+        for aggregate in schema.get('aggregate_ratings', []):
+            totals[aggregate['rating'], aggregate['count']] += 1
+    expected = totals.most_common(1)[0][0] if totals else None
+
+    for page_path, schema in schemas.items():
+        marked_up = len(schema.get('reviews', []))
+        for aggregate in schema.get('aggregate_ratings', []):
+            rating, count, best = aggregate['rating'], aggregate['count'], aggregate['best'] or 5
+            if rating is None or not 0 < rating <= best:
+                issues.append({
+                    'page': page_path,
+                    'issue': f'AggregateRating ratingValue {_number(rating)} outside 1-{best:g}',
+                })
+            if count is None or count < marked_up:
+                issues.append({
+                    'page': page_path,
+                    'issue': f'AggregateRating reviewCount {_number(count)} below the {marked_up} reviews marked up',
+                })
+            if (rating, count) != expected:
+                issues.append({
+                    'page': page_path,
+                    'issue': f'AggregateRating {_number(rating)}/{_number(count)} differs from the '
+                             f'site-wide {_number(expected[0])}/{_number(expected[1])}',
+                })
+    return issues
+
+
+def cross_check_schema(store, schemas):
+    """Run the per-page and aggregate checks for every page in a ReviewStore
+
+    `schemas` maps the store's page paths to the data collected by
+    extract_review_data(..., schema=...).
+    """
+    issues = []
+    for page_id, page_path in enumerate(store.pages.values):
+        issues.extend(check_page_schema(page_path, store.page_reviews(page_id), schemas.get(page_path, {})))
+    issues.extend(check_aggregate_ratings(schemas))
+    return issues
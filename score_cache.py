@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import os
+import struct
+import hashlib
+from pathlib import Path
+from functools import lru_cache
+from collections import OrderedDict
+from review_similarity import similarity_bound, SIMILARITY_THRESHOLD
+
+SCORE_CACHE_FILENAME = '.score_cache.bin'
+
+# Bump when the file layout or the meaning of a stored score changes
+SCORE_CACHE_VERSION = 1
+
+# Most text pairs kept; the least recently used go first (~24 bytes each on disk)
+DEFAULT_MAX_ENTRIES = 200_000
+
+_HEADER = struct.Struct('<4sI')
+_MAGIC = b'RSSC'
+# Hash of the first text, hash of the second, stored value
+_ENTRY = struct.Struct('<8s8sd')
+
+
+@lru_cache(maxsize=65536)
+def text_key(text):
+    """64-bit content hash of a review text"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+
+
+class ScoreCache:
+    """Persistent difflib scores for ordered pairs of review texts
+
+    Entries are keyed by the content hashes of both texts in scoring order
+    (difflib isn't symmetric), so a pair keeps its score while its reviews
+    move between pages or runs, and an edited review simply misses. A
+    pair the quick ratios ruled out is stored as its upper bound, encoded
+    as -1 - bound, which answers for every threshold at or above it.
+    The file is a header and fixed-width records, oldest first.
+    """
+
+    def __init__(self, cache_path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_path = Path(cache_path)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self):
+        """Read the cache file, starting empty if it is missing, damaged or another version"""
+        try:
+            data = self.cache_path.read_bytes()
+        except OSError:
+            return
+        if len(data) < _HEADER.size or (len(data) - _HEADER.size) % _ENTRY.size:
+            return
+        if _HEADER.unpack_from(data) != (_MAGIC, SCORE_CACHE_VERSION):
+            return
+
+        for first, second, value in _ENTRY.iter_unpack(memoryview(data)[_HEADER.size:]):
+            self.entries[first + second] = value
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def score(self, text1, text2, threshold=SIMILARITY_THRESHOLD):
+        """similarity_score, from the cache when this pair of texts was scored before"""
+        key = text_key(text1) + text_key(text2)
+        value = self.entries.get(key)
+        if value is not None and (value >= 0 or -1 - value <= threshold):
+            self.hits += 1
+            self.entries.move_to_end(key)
+            self._dirty = True
+            return value if value >= 0 else None
+
+        # Unseen, or ruled out by a bound above this run's threshold
+        self.misses += 1
+        ratio, bound = similarity_bound(text1, text2, threshold)
+        self.entries[key] = ratio if ratio is not None else -1 - bound
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._dirty = True
+        return ratio
+
+    def save(self):
+        """Write the cache back, least recently used first"""
+        if not self._dirty:
+            return
+
+        tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, SCORE_CACHE_VERSION))
+            f.write(b''.join(_ENTRY.pack(key[:8], key[8:], value) for key, value in self.entries.items()))
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import re
+import json
+from collections import deque
+from pathlib import Path
+from page_discovery import DEFAULT_ROOT
+
+TAXONOMY_FILENAME = 'service_taxonomy.json'
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton: every keyword contained in a text, in one pass
+
+    Each keyword carries a set of labels; match() returns the union of the
+    labels of all keywords found, in time linear in the text length.
+    """
+
+    def __init__(self, labelled_keywords):
+        self.goto = [{}]
+        self.fail = [0]
+
+        outputs = [set()]
+        for keyword, labels in labelled_keywords.items():
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = self.goto[state][char] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    outputs.append(set())
+                state = next_state
+            outputs[state].update(labels)
+
+        # Breadth-first, so a state's failure target is finished before it is used
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                outputs[next_state] |= outputs[self.fail[next_state]]
+                queue.append(next_state)
+        self.output = [frozenset(labels) for labels in outputs]
+
+    def match(self, text):
+        labels = set()
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            labels |= self.output[state]
+        return labels
+
+
+class ServiceTaxonomy:
+    """service_taxonomy.json compiled for lookups
+
+    A tag belongs to a service group when it is one of the group's canonical
+    tags or aliases (a dict lookup) or contains one of its keywords (the
+    automaton). Service pages are matched the same way against their own tag
+    and keywords. Labels are computed once per distinct tag.
+    """
+
+    def __init__(self, data):
+        self.groups = list(data['groups'])
+        self.category_pages = {page: list(groups) for page, groups in data.get('category_pages', {}).items()}
+        self.service_pages = data.get('service_pages', {})
+        self.min_unique_tags = data.get('min_unique_tags', {})
+
+        self.canonical = {}
+        self.exact_labels = {}
+        labelled_keywords = {}
+
+        def label_exact(tag, label, canonical):
+            key = tag.lower()
+            self.canonical.setdefault(key, canonical)
+            self.exact_labels.setdefault(key, set()).add(label)
+
+        for group, spec in data['groups'].items():
+            for tag, aliases in spec.get('tags', {}).items():
+                for name in [tag] + aliases:
+                    label_exact(name, group, tag)
+            for keyword in spec.get('keywords', []):
+                labelled_keywords.setdefault(keyword.lower(), set()).add(group)
+
+        for page, spec in self.service_pages.items():
+            label_exact(spec['tag'], page, spec['tag'])
+            for keyword in spec.get('keywords', []):
+                labelled_keywords.setdefault(keyword.lower(), set()).add(page)
+
+        self.automaton = KeywordAutomaton(labelled_keywords)
+        self._labels = {}
+        self.keyword_labels = labelled_keywords
+        self._keyword_words = max((len(keyword.split()) for keyword in labelled_keywords), default=0)
+
+    def labels(self, tag):
+        """Groups and service pages a tag matches"""
+        labels = self._labels.get(tag)
+        if labels is None:
+            key = tag.lower()
+            labels = self._labels[tag] = frozenset(self.exact_labels.get(key, set()) | self.automaton.match(key))
+        return labels
+
+    def text_labels(self, text):
+        """Groups and service pages whose keywords occur in free text as whole words
+
+        Tags are short enough for substring matches; in review prose "car"
+        would also match "careful".
+        """
+        words = _WORD.findall(text.lower())
+        labels = set()
+        for size in range(1, self._keyword_words + 1):
+            for start in range(len(words) - size + 1):
+                labels.update(self.keyword_labels.get(' '.join(words[start:start + size]), ()))
+        return labels
+
+    def canonical_tag(self, tag):
+        """The canonical spelling of a tag or alias, or None for unknown tags"""
+        return self.canonical.get(tag.lower())
+
+    def expected_groups(self, page_path):
+        return self.category_pages.get(page_path)
+
+    def page_service(self, page_path):
+        spec = self.service_pages.get(page_path)
+        return spec['tag'] if spec else None
+
+    def page_keywords(self, page_path):
+        spec = self.service_pages.get(page_path)
+        return spec.get('keywords', []) if spec else []
+
+    def unexpected_tags(self, page_path, tags):
+        """Tags outside a category page's service groups (None: page has no expectation)"""
+        groups = self.expected_groups(page_path)
+        if groups is None:
+            return None
+        return [tag for tag in tags if self.labels(tag).isdisjoint(groups)]
+
+    def off_service_tags(self, page_path, tags):
+        """Tags that don't match a service page's own service (None: not a service page)"""
+        if page_path not in self.service_pages:
+            return None
+        return [tag for tag in tags if page_path not in self.labels(tag)]
+
+
+_compiled = {}
+
+
+def load_service_taxonomy(taxonomy_path=None):
+    """Load and compile the service taxonomy, once per file"""
+    taxonomy_path = Path(taxonomy_path) if taxonomy_path else DEFAULT_ROOT / TAXONOMY_FILENAME
+    key = taxonomy_path.resolve()
+    if key not in _compiled:
+        with open(taxonomy_path, 'r') as f:
+            _compiled[key] = ServiceTaxonomy(json.load(f))
+    return _compiled[key]
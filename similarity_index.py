@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import heapq
+import struct
+import sqlite3
+import difflib
+import argparse
+from pathlib import Path
+from time import perf_counter
+from page_discovery import DEFAULT_ROOT
+from review_extractor import parse_json_ld
+from name_matching import parse_name, names_match, blocking_keys
+from review_similarity import (
+    minhash_signature, signature_agreement, load_review_texts,
+    SHINGLE_SIZE, NUM_PERM, BANDS, SIMILARITY_THRESHOLD, MIN_SIGNATURE_AGREEMENT
+)
+
+SIMILARITY_INDEX_FILENAME = 'review_similarity.sqlite'
+
+# Bump when the schema below changes; older databases are rebuilt
+SCHEMA_VERSION = 1
+
+# Signatures are only comparable when made with the same MinHash settings;
+# an index built with other settings is re-signed from its stored texts
+MINHASH_PARAMS = f"{SHINGLE_SIZE}:{NUM_PERM}:{BANDS}"
+
+# Below the audit's threshold at most this many band collisions, best
+# signature agreement first, are scored with difflib per query, so a popular
+# phrase can't make queries slow
+MAX_SCORED_CANDIDATES = 200
+
+TOP_K = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    page TEXT NOT NULL,
+    customer TEXT NOT NULL,
+    review_text TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    UNIQUE (page, customer, review_text)
+);
+CREATE TABLE IF NOT EXISTS bands (
+    bucket BLOB NOT NULL,
+    entry_id INTEGER NOT NULL REFERENCES entries(id),
+    PRIMARY KEY (bucket, entry_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS name_blocks (
+    block TEXT NOT NULL,
+    entry_id INTEGER NOT NULL REFERENCES entries(id),
+    PRIMARY KEY (block, entry_id)
+) WITHOUT ROWID;
+"""
+
+_SIGNATURE = struct.Struct(f'<{NUM_PERM}I')
+_ROWS = NUM_PERM // BANDS
+
+
+def band_buckets(signature):
+    """One key per LSH band: the band number followed by that band's hash values"""
+    return [struct.pack(f'<H{_ROWS}I', band, *signature[band * _ROWS:(band + 1) * _ROWS])
+            for band in range(BANDS)]
+
+
+def _block_key(key):
+    return '|'.join(key)
+
+
+def name_blocks(name):
+    """Blocks a customer name is filed under (see name_matching.blocking_keys)"""
+    parts = parse_name(name)
+    return [_block_key(key) for key in blocking_keys(parts)] if parts else []
+
+
+def _name_query_blocks(parts):
+    """Blocks whose names can match: the name's own, plus the other side of initials
+
+    "R. Thompson" has to meet every "R*" name with a T surname, and
+    "Robert T." has to meet "R. T*".
+    """
+    first, last = parts
+    surname = last[0] if last else ''
+    exact = [_block_key(key) for key in blocking_keys(parts)]
+    if len(first) == 1:
+        return exact, _block_key(('prefix', surname, first)) + '%'
+    return exact + [_block_key(('initial', surname, first[0]))], None
+
+
+class SimilarityIndex:
+    """Persisted MinHash/LSH index of published reviews for nearest-neighbour lookups
+
+    Each review is stored with its MinHash signature, one row per LSH band
+    and its customer-name blocks. A query reads only the candidate's
+    BANDS buckets instead of rescanning the site, then ranks the
+    collisions with the same difflib ratio the audits use. Reviews are
+    added one at a time; nothing is rebuilt.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.conn.executescript("""
+                DROP TABLE IF EXISTS name_blocks;
+                DROP TABLE IF EXISTS bands;
+                DROP TABLE IF EXISTS entries;
+                DROP TABLE IF EXISTS meta;
+            """)
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        params = self.conn.execute("SELECT value FROM meta WHERE key = 'minhash'").fetchone()
+        if params is None or params[0] != MINHASH_PARAMS:
+            self._resign()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def _resign(self):
+        """Recompute every signature and band row with the current MinHash settings"""
+        with self.conn:
+            self.conn.execute('DELETE FROM bands')
+            for entry_id, text in self.conn.execute('SELECT id, review_text FROM entries').fetchall():
+                signature = minhash_signature(text)
+                self.conn.execute('UPDATE entries SET signature = ? WHERE id = ?',
+                                  (_SIGNATURE.pack(*signature), entry_id))
+                self.conn.executemany('INSERT INTO bands (bucket, entry_id) VALUES (?, ?)',
+                                      ((bucket, entry_id) for bucket in band_buckets(signature)))
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('minhash', ?)", (MINHASH_PARAMS,))
+
+    def _insert(self, page, customer, text):
+        signature = minhash_signature(text)
+        cursor = self.conn.execute(
+            'INSERT OR IGNORE INTO entries (page, customer, review_text, signature) VALUES (?, ?, ?, ?)',
+            (page, customer, text, _SIGNATURE.pack(*signature)))
+        if not cursor.rowcount:
+            return False
+        entry_id = cursor.lastrowid
+        self.conn.executemany('INSERT INTO bands (bucket, entry_id) VALUES (?, ?)',
+                              ((bucket, entry_id) for bucket in band_buckets(signature)))
+        self.conn.executemany('INSERT OR IGNORE INTO name_blocks (block, entry_id) VALUES (?, ?)',
+                              ((block, entry_id) for block in name_blocks(customer)))
+        return True
+
+    def add(self, page, customer, text):
+        """Index one published review; False if it was already indexed"""
+        with self.conn:
+            return self._insert(page, customer or 'Unknown', text)
+
+    def add_reviews(self, reviews):
+        """Index {'page', 'customer', 'text'} dicts (load_review_texts output); returns how many were new"""
+        with self.conn:
+            return sum(self._insert(review['page'], review.get('customer') or 'Unknown', review['text'])
+                       for review in reviews)
+
+    def rebuild(self, reviews):
+        """Replace the whole index with a fresh set of reviews"""
+        with self.conn:
+            self.conn.execute('DELETE FROM name_blocks')
+            self.conn.execute('DELETE FROM bands')
+            self.conn.execute('DELETE FROM entries')
+        return self.add_reviews(reviews)
+
+    def nearest(self, text, k=TOP_K, min_similarity=0.0, stats=None):
+        """The k indexed reviews most similar to `text` (every match if k is None), best first
+
+        Only reviews sharing an LSH band with the text, and agreeing on at
+        least MIN_SIGNATURE_AGREEMENT of the signature, are candidates: the
+        same ones find_similar_pairs scores. With `min_similarity` at or
+        above SIMILARITY_THRESHOLD every candidate is considered, so anything
+        the audit would flag is found. Below it only the
+        MAX_SCORED_CANDIDATES with the best signature agreement are scored,
+        so in a crowded bucket a close review can be missed.
+        """
+        start = perf_counter()
+        signature = minhash_signature(text)
+        buckets = band_buckets(signature)
+        rows = self.conn.execute(
+            f"SELECT DISTINCT e.id, e.page, e.customer, e.review_text, e.signature "
+            f"FROM bands b JOIN entries e ON e.id = b.entry_id "
+            f"WHERE b.bucket IN ({','.join('?' * len(buckets))})", buckets).fetchall()
+
+        agreements = [(signature_agreement(signature, _SIGNATURE.unpack(row[4])), row) for row in rows]
+        ranked = sorted((item for item in agreements if item[0] >= MIN_SIGNATURE_AGREEMENT),
+                        key=lambda item: -item[0])
+        best = []
+        scored = 0
+        # Published reviews come first, as in the audit's review order; the
+        # matcher keeps its index of the new text across candidates
+        matcher = difflib.SequenceMatcher(None)
+        matcher.set_seq2(text)
+        # The quick ratios reject most candidates under the audit's threshold,
+        # so there every candidate can be considered
+        limit = None if min_similarity >= SIMILARITY_THRESHOLD else MAX_SCORED_CANDIDATES
+        for _, (entry_id, page, customer, review_text, _) in ranked[:limit]:
+            # Once k results are in hand, the cheap upper bounds skip most of the rest
+            floor = max(min_similarity, best[0][0] if len(best) == k else 0.0)
+            matcher.set_seq1(review_text)
+            if floor and (matcher.real_quick_ratio() <= floor or matcher.quick_ratio() <= floor):
+                continue
+            scored += 1
+            similarity = matcher.ratio()
+            if similarity < min_similarity:
+                continue
+            item = (similarity, -entry_id, {'similarity': similarity, 'page': page,
+                                            'customer': customer, 'text': review_text})
+            if k is None or len(best) < k:
+                heapq.heappush(best, item)
+            elif item[:2] > best[0][:2]:
+                heapq.heapreplace(best, item)
+
+        if stats is not None:
+            stats['candidates'] = len(rows)
+            stats['comparisons'] = scored
+            stats['seconds'] = perf_counter() - start
+        return [match for _, _, match in sorted(best, reverse=True)]
+
+    def same_customer(self, name):
+        """Indexed reviews whose customer name matches `name`, allowing for spelling differences"""
+        parts = parse_name(name)
+        if parts is None:
+            return []
+        exact, pattern = _name_query_blocks(parts)
+        query = f"SELECT DISTINCT entry_id FROM name_blocks WHERE block IN ({','.join('?' * len(exact))})"
+        params = list(exact)
+        if pattern:
+            query += ' OR block LIKE ?'
+            params.append(pattern)
+
+        matches = []
+        for entry_id, page, customer in self.conn.execute(
+                f"SELECT id, page, customer FROM entries WHERE id IN ({query}) ORDER BY id", params):
+            other = parse_name(customer)
+            strength = names_match(parts, other) if other else None
+            if strength:
+                matches.append({'page': page, 'customer': customer, 'match': strength})
+        return matches
+
+    def check(self, text, name=None, k=TOP_K, threshold=SIMILARITY_THRESHOLD):
+        """Everything a new review collides with: similar texts and (with a name) the same customer"""
+        stats = {}
+        nearest = self.nearest(text, k, stats=stats)
+        # A separate query at the threshold, so more than k flagged reviews,
+        # or ones past the candidate cap, are all reported
+        flagged = self.nearest(text, None, threshold)
+        result = {
+            'nearest': nearest,
+            'similar': [match for match in flagged if match['similarity'] > threshold],
+            'stats': stats
+        }
+        if name:
+            result['same_customer'] = self.same_customer(name)
+        return result
+
+
+def candidate_reviews(path):
+    """(customer, text) for each review in a generated schema.org Review JSON file"""
+    with open(path, 'r') as f:
+        structured = parse_json_ld([f.read()])
+    return [(review['author'], review['text']) for review in structured['reviews'] if review['text']]
+
+
+def print_check(result, name=None):
+    label = f" by {name}" if name else ''
+    stats = result['stats']
+    if result['similar']:
+        print(f"⚠️  Review{label} is too close to {len(result['similar'])} published reviews:")
+    else:
+        print(f"✅ Review{label} is unique ({stats['candidates']} candidates, {stats['seconds'] * 1000:.1f} ms)")
+    for match in result['nearest']:
+        flag = '⚠️ ' if match in result['similar'] else '  '
+        print(f"   {flag} {match['similarity']:.0%} {match['page']} ({match['customer']}): {match['text'][:70]}")
+    for match in result.get('same_customer', []):
+        print(f"   👥 {match['customer']} already reviewed {match['page']} ({match['match']} name match)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Check new reviews against an index of the published ones')
+    parser.add_argument('text', nargs='?', help='Review text to check')
+    parser.add_argument('--name', help='Customer name of the review being checked')
+    parser.add_argument('--db', type=Path, default=DEFAULT_ROOT / SIMILARITY_INDEX_FILENAME,
+                        help='Index database (default: ' + SIMILARITY_INDEX_FILENAME + ' at the site root)')
+    parser.add_argument('--build-from', type=Path, default=None, metavar='PATH',
+                        help='(Re)build the index from extractor output: review store, JSONL dump or results JSON')
+    parser.add_argument('--check-file', type=Path, default=None, metavar='PATH',
+                        help='Check every review in a generated schema.org Review JSON file')
+    parser.add_argument('--add', metavar='PAGE',
+                        help='After checking, add the review to the index as published on PAGE')
+    parser.add_argument('-k', type=int, default=TOP_K, help=f'Nearest reviews to report (default: {TOP_K})')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON (for the review generators)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.build_from is None and not args.db.exists():
+        sys.exit(f"❌ Similarity index not found: {args.db} (build it with --build-from)")
+
+    with SimilarityIndex(args.db) as index:
+        if args.build_from is not None:
+            start = perf_counter()
+            try:
+                reviews = load_review_texts(args.build_from)
+            except FileNotFoundError:
+                sys.exit(f"❌ Review data not found: {args.build_from}")
+            index.rebuild(reviews)
+            if not args.json:
+                print(f"✅ Indexed {len(index)} reviews from {args.build_from} in {perf_counter() - start:.2f}s")
+
+        candidates = []
+        if args.text:
+            candidates.append((args.name, args.text))
+        if args.check_file:
+            candidates.extend(candidate_reviews(args.check_file))
+
+        results = []
+        for name, text in candidates:
+            result = index.check(text, name, args.k)
+            results.append(dict(result, customer=name, text=text))
+            if not args.json:
+                print_check(result, name)
+        if args.add and args.text:
+            added = index.add(args.add, args.name, args.text)
+            if not args.json:
+                print(f"{'➕ Added' if added else '↩️  Already indexed:'} review on {args.add}")
+
+        if args.json:
+            print(json.dumps(results, indent=2, ensure_ascii=False))
+        if any(result['similar'] for result in results):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
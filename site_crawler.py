@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import ssl
+import sys
+import json
+import asyncio
+import argparse
+from collections import defaultdict, namedtuple
+from functools import partial
+from pathlib import Path
+from time import perf_counter
+from urllib.parse import urljoin, urlsplit
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from audit_cache import extractor_fingerprint
+from review_extractor import extract_review_data
+from page_discovery import (
+    load_page_rules, page_category, url_to_relative_path, iter_sitemap_urls, DEFAULT_ROOT
+)
+
+CRAWL_CACHE_FILENAME = '.crawl_cache.json'
+
+# Requests in flight across the whole crawl, and keep-alive connections per host
+CONCURRENCY = 8
+CONNECTIONS_PER_HOST = 4
+
+MAX_REDIRECTS = 5
+TIMEOUT = 30
+USER_AGENT = 'ilocksmith-review-audit/1.0'
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+Response = namedtuple('Response', ['url', 'status', 'headers', 'body'])
+
+
+class FetchError(Exception):
+    pass
+
+
+class _Connection:
+    """One HTTP/1.1 connection; requests on it run one after another"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reusable = True
+
+    async def request(self, method, target, host, headers):
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host}", f"User-Agent: {USER_AGENT}",
+                 "Accept-Encoding: identity", "Connection: keep-alive"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            # The server dropped an idle keep-alive connection
+            raise ConnectionResetError("connection closed before the response")
+        version, status = status_line.decode('latin-1').split(None, 2)[:2]
+        status = int(status)
+
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif 'chunked' in response_headers.get('transfer-encoding', '').lower():
+            body = await self._read_chunked()
+        elif 'content-length' in response_headers:
+            body = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            body = await self.reader.read()
+            self.reusable = False
+
+        connection = response_headers.get('connection', '').lower()
+        if connection == 'close' or (version == 'HTTP/1.0' and connection != 'keep-alive'):
+            self.reusable = False
+        return status, response_headers, body
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                # Skip trailers up to the blank line
+                while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections pooled per host
+
+    At most `per_host` connections are open to a host at a time; a request
+    reuses an idle connection when there is one. A reused connection the
+    server has since closed is retried once on a fresh one.
+    """
+
+    def __init__(self, per_host=CONNECTIONS_PER_HOST, timeout=TIMEOUT):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.idle = defaultdict(list)
+        self.slots = {}
+        self.opened = 0
+        self.requests = 0
+
+    async def _acquire(self, scheme, host, port):
+        idle = self.idle[scheme, host, port]
+        while idle:
+            connection = idle.pop()
+            if not connection.writer.is_closing():
+                return connection, True
+        context = ssl.create_default_context() if scheme == 'https' else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context), self.timeout)
+        self.opened += 1
+        return _Connection(reader, writer), False
+
+    async def request(self, url, headers=None, method='GET'):
+        parts = urlsplit(url)
+        scheme, host = parts.scheme, parts.hostname
+        port = parts.port or (443 if scheme == 'https' else 80)
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        host_header = parts.netloc.rpartition('@')[2]
+
+        key = (scheme, host, port)
+        if key not in self.slots:
+            self.slots[key] = asyncio.Semaphore(self.per_host)
+        async with self.slots[key]:
+            for attempt in range(2):
+                connection, reused = await self._acquire(scheme, host, port)
+                try:
+                    status, response_headers, body = await asyncio.wait_for(
+                        connection.request(method, target, host_header, headers or {}), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    connection.close()
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                except BaseException:
+                    connection.close()
+                    raise
+                self.requests += 1
+                if connection.reusable:
+                    self.idle[key].append(connection)
+                else:
+                    connection.close()
+                return Response(url, status, response_headers, body)
+
+    async def fetch(self, url, headers=None, max_redirects=MAX_REDIRECTS):
+        """GET a URL, following redirects"""
+        for _ in range(max_redirects + 1):
+            response = await self.request(url, headers)
+            if response.status not in REDIRECT_STATUSES or 'location' not in response.headers:
+                return response
+            url = urljoin(url, response.headers['location'])
+        raise FetchError(f"too many redirects for {url}")
+
+    async def close(self):
+        for connections in self.idle.values():
+            for connection in connections:
+                connection.close()
+        self.idle.clear()
+
+
+class CrawlCache:
+    """Validators (ETag / Last-Modified) and extraction results per URL
+
+    Unchanged pages answer a conditional request with 304 Not Modified and
+    are served from here without downloading or parsing the body.
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = Path(cache_path)
+        self.fingerprint = extractor_fingerprint()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('fingerprint') == self.fingerprint:
+            self.entries = data.get('pages', {})
+
+    def validators(self, url):
+        entry = self.entries.get(url)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def lookup(self, url, schema=None, weight=None):
+        entry = self.entries[url]
+        if schema is not None:
+            schema.update(entry['schema'])
+        if weight is not None:
+            weight.update(entry['weight'])
+        return entry['reviews'], entry['service_tags']
+
+    def store(self, url, response_headers, reviews, service_tags, schema, weight):
+        etag, last_modified = response_headers.get('etag'), response_headers.get('last-modified')
+        if not etag and not last_modified:
+            # Nothing to revalidate against next time
+            self.entries.pop(url, None)
+            return
+        self.entries[url] = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'reviews': reviews,
+            'service_tags': service_tags,
+            'schema': schema,
+            'weight': weight
+        }
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'pages': self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
+
+
+async def _crawl_page(pool, limit, cache, url, relative_path, schema, weight, stats):
+    """Fetch one page and run it through the extractor; never raises"""
+    async with limit:
+        try:
+            headers = cache.validators(url) if cache is not None else {}
+            response = await pool.fetch(url, headers)
+            if response.status == 404 and not urlsplit(url).path.endswith('.html'):
+                # Plain static servers don't do clean URLs; ask for the file itself
+                url = urljoin(url, '/' + relative_path)
+                headers = cache.validators(url) if cache is not None else {}
+                response = await pool.fetch(url, headers)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, FetchError, ValueError) as e:
+            return [], [], f"{type(e).__name__}: {e}"
+
+    if response.status == 304 and cache is not None and url in cache.entries:
+        cache.hits += 1
+        stats['not_modified'] += 1
+        reviews, service_tags = cache.lookup(url, schema, weight)
+        return reviews, service_tags, None
+    if response.status != 200:
+        return [], [], f"HTTP {response.status} for {url}"
+
+    stats['fetched'] += 1
+    stats['bytes'] += len(response.body)
+    page_schema = {}
+    page_weight = {}
+    try:
+        reviews, service_tags = extract_review_data(response.body, schema=page_schema, weight=page_weight)
+    except Exception as e:
+        return [], [], f"{type(e).__name__}: {e}"
+    if cache is not None:
+        cache.misses += 1
+        cache.store(url, response.headers, reviews, service_tags, page_schema, page_weight)
+    schema.update(page_schema)
+    weight.update(page_weight)
+    return reviews, service_tags, None
+
+
+async def _crawl(base_url, rules, concurrency, per_host, cache, schemas, weights, stats):
+    pool = ConnectionPool(per_host)
+    limit = asyncio.Semaphore(concurrency)
+    try:
+        sitemap_url = urljoin(base_url, rules.get('sitemap', 'sitemap.xml'))
+        sitemap = await pool.fetch(sitemap_url)
+        if sitemap.status != 200:
+            raise FetchError(f"HTTP {sitemap.status} for {sitemap_url}")
+
+        # The sitemap lists production URLs; fetch the same paths from base_url
+        pages = []
+        seen = set()
+        for location in iter_sitemap_urls(io.BytesIO(sitemap.body)):
+            relative_path = url_to_relative_path(location)
+            category = page_category(relative_path, rules)
+            if category and relative_path not in seen:
+                seen.add(relative_path)
+                pages.append((urljoin(base_url, urlsplit(location).path.lstrip('/')), relative_path, category))
+
+        page_schemas = [{} for _ in pages]
+        page_weights = [{} for _ in pages]
+        results = await asyncio.gather(*(
+            _crawl_page(pool, limit, cache, url, relative_path, schema, weight, stats)
+            for (url, relative_path, _), schema, weight in zip(pages, page_schemas, page_weights)))
+    finally:
+        await pool.close()
+
+    stats['pages'] = len(pages)
+    stats['requests'] = pool.requests
+    stats['connections'] = pool.opened
+    crawled = []
+    for (_, relative_path, category), schema, weight, (reviews, service_tags, error) in zip(
+            pages, page_schemas, page_weights, results):
+        if schemas is not None:
+            schemas[relative_path] = schema
+        if weights is not None and error is None:
+            weights[relative_path] = weight
+        crawled.append((relative_path, category, reviews, service_tags, error))
+    return crawled
+
+
+def crawl_site(base_url, rules=None, concurrency=CONCURRENCY, per_host=CONNECTIONS_PER_HOST,
+               cache=None, schemas=None, weights=None, stats=None):
+    """Audit the deployed site: fetch every sitemap page and extract its reviews
+
+    Returns (relative_path, category, reviews, service_tags, error) per page
+    in sitemap order, the same shape extract_pages yields for local files
+    (with the relative path in place of the file path). `schemas`, if
+    given, is filled with each page's JSON-LD data keyed by relative path,
+    and `weights` likewise with each page's weight.
+    """
+    rules = rules if rules is not None else load_page_rules()
+    if not base_url.endswith('/'):
+        base_url += '/'
+    crawl_stats = {'fetched': 0, 'not_modified': 0, 'bytes': 0}
+    start = perf_counter()
+    crawled = asyncio.run(_crawl(base_url, rules, concurrency, per_host, cache, schemas, weights, crawl_stats))
+    crawl_stats['seconds'] = perf_counter() - start
+    if stats is not None:
+        stats.update(crawl_stats)
+    return crawled
+
+
+class StandInHandler(SimpleHTTPRequestHandler):
+    """Serve the site directory roughly the way the deployment does
+
+    HTTP/1.1 keep-alive, Vercel-style clean URLs (/services -> services.html)
+    and ETag / If-None-Match on top of the standard Last-Modified handling,
+    so the crawler can be exercised locally.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def translate_path(self, path):
+        translated = super().translate_path(path)
+        if not translated.endswith('.html') and os.path.isfile(translated.rstrip('/') + '.html'):
+            return translated.rstrip('/') + '.html'
+        return translated
+
+    def send_head(self):
+        self._etag = None
+        path = self.translate_path(self.path)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            self._etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+            if self.headers.get('If-None-Match') == self._etag:
+                self.send_response(304)
+                self.end_headers()
+                return None
+        return super().send_head()
+
+    def end_headers(self):
+        if getattr(self, '_etag', None):
+            self.send_header('ETag', self._etag)
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(root, port):
+    server = ThreadingHTTPServer(('127.0.0.1', port), partial(StandInHandler, directory=str(root)))
+    print(f"🌐 Serving {root} on http://127.0.0.1:{server.server_address[1]}/ (Ctrl-C to stop)")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped serving")
+    finally:
+        server.server_close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Crawl the deployed site (or a local stand-in) and extract reviews')
+    parser.add_argument('url', nargs='?', help='Base URL of the site to crawl')
+    parser.add_argument('--rules', type=Path, default=None,
+                        help='Page-type rules file (default: page_rules.json)')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, metavar='N',
+                        help=f'Requests in flight at once (default: {CONCURRENCY})')
+    parser.add_argument('--connections', type=int, default=CONNECTIONS_PER_HOST, metavar='N',
+                        help=f'Keep-alive connections per host (default: {CONNECTIONS_PER_HOST})')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Fetch every page in full instead of revalidating against ' + CRAWL_CACHE_FILENAME)
+    parser.add_argument('--serve', action='store_true',
+                        help='Instead of crawling, serve the site root locally as a stand-in for the deployment')
+    parser.add_argument('--root', type=Path, default=DEFAULT_ROOT, help='Directory for --serve')
+    parser.add_argument('--port', type=int, default=8000, help='Port for --serve')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.serve:
+        serve(args.root.resolve(), args.port)
+        return
+    if not args.url:
+        sys.exit("❌ Give the base URL to crawl, or --serve to start a local stand-in")
+
+    rules = load_page_rules(args.rules) if args.rules else None
+    cache = None if args.no_cache else CrawlCache(DEFAULT_ROOT / CRAWL_CACHE_FILENAME)
+    stats = {}
+    try:
+        crawled = crawl_site(args.url, rules, args.concurrency, args.connections, cache, stats=stats)
+    except (OSError, asyncio.TimeoutError, FetchError) as e:
+        sys.exit(f"❌ Could not crawl {args.url}: {e}")
+    if cache is not None:
+        cache.save()
+
+    for relative_path, category, reviews, service_tags, error in crawled:
+        if error:
+            print(f"  ❌ {relative_path}: {error}")
+        else:
+            print(f"  📄 {relative_path} [{category}]: {len(reviews)} reviews, {len(service_tags)} service tags")
+    print(f"\n🌐 {stats['pages']} pages in {stats['seconds']:.2f}s: {stats['fetched']} fetched "
+          f"({stats['bytes'] / 1024:.0f} KB), {stats['not_modified']} not modified, "
+          f"{stats['requests']} requests over {stats['connections']} connections")
+
+
+if __name__ == "__main__":
+    main()
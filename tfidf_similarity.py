@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+import re
+import sys
+import math
+import difflib
+import argparse
+from collections import Counter, namedtuple
+from time import perf_counter
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: only the tfidf backend needs NumPy, the default MinHash path doesn't
+    np = None
+
+from review_similarity import (
+    SIMILARITY_THRESHOLD, NEAR_IDENTICAL_THRESHOLD, _as_pairs, find_similar_pairs, load_review_texts
+)
+
+# Reviews per tile, and an upper bound on one dense tile (two are live at a time)
+TILE_ROWS = 512
+TILE_BYTES = 32 * 1024 * 1024
+
+# Cosine scores below this are not worth comparing against difflib in calibration
+CALIBRATION_FLOOR = 0.5
+
+_TOKEN = re.compile(r'\w+')
+
+# CSR layout: row i's features are indices[indptr[i]:indptr[i + 1]], weights in data
+TfidfMatrix = namedtuple('TfidfMatrix', ['indptr', 'indices', 'data', 'n_features'])
+
+
+def tfidf_available():
+    return np is not None
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("the tfidf similarity backend needs NumPy (pip install numpy)")
+
+
+def tokenize(text):
+    """Word unigrams and bigrams of a lower-cased review text"""
+    words = _TOKEN.findall(text.lower())
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+def build_tfidf_matrix(texts):
+    """Tokenize every text once and return L2-normalised TF-IDF rows in CSR form
+
+    Rows are normalised over all of their features, then features that occur
+    in a single text are dropped: they can never contribute to a dot product
+    between two rows, and without them the dense tiles stay narrow.
+    """
+    _require_numpy()
+    vocabulary = {}
+    doc_freq = Counter()
+    rows = []
+    for text in texts:
+        counts = Counter(vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(text))
+        doc_freq.update(counts.keys())
+        rows.append(counts)
+
+    n = len(texts)
+    idf = np.ones(len(vocabulary), dtype=np.float64)
+    for feature, df in doc_freq.items():
+        idf[feature] = math.log((1 + n) / (1 + df)) + 1
+
+    # Shared features get compact column ids; singletons only count towards the norm
+    shared = {}
+    for feature, df in doc_freq.items():
+        if df > 1:
+            shared[feature] = len(shared)
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    indices = []
+    data = []
+    for row, counts in enumerate(rows):
+        features = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * idf[features]
+        norm = np.sqrt(np.dot(weights, weights)) or 1.0
+        for feature, weight in zip(features.tolist(), (weights / norm).tolist()):
+            column = shared.get(feature)
+            if column is not None:
+                indices.append(column)
+                data.append(weight)
+        indptr[row + 1] = len(indices)
+
+    return TfidfMatrix(indptr, np.array(indices, dtype=np.int64), np.array(data, dtype=np.float32), len(shared))
+
+
+def _dense_rows(matrix, start, stop, position, width):
+    """Expand rows start:stop into a dense float32 tile over a subset of features
+
+    `position` maps a feature to its tile column, or -1 for features outside
+    the subset; those can't contribute to the tile's dot products.
+    """
+    tile = np.zeros((stop - start, width), dtype=np.float32)
+    lo, hi = matrix.indptr[start], matrix.indptr[stop]
+    row_ids = np.repeat(np.arange(stop - start), np.diff(matrix.indptr[start:stop + 1]))
+    columns = position[matrix.indices[lo:hi]]
+    keep = columns >= 0
+    tile[row_ids[keep], columns[keep]] = matrix.data[lo:hi][keep]
+    return tile
+
+
+def tile_rows_for(n_features, tile_bytes=TILE_BYTES):
+    """Rows per tile: TILE_ROWS, fewer if a dense tile would exceed tile_bytes"""
+    return max(1, min(TILE_ROWS, tile_bytes // (4 * max(n_features, 1))))
+
+
+def iter_cosine_pairs(matrix, threshold, tile_rows=None):
+    """Yield (i, j, cosine) for i < j with cosine > threshold, tile by tile
+
+    Each row tile is expanded over just the features it uses, and every
+    later column tile is expanded over the same features, so the matrix
+    product only spans columns that can contribute to a score.
+    """
+    n = len(matrix.indptr) - 1
+    tile_rows = tile_rows or tile_rows_for(matrix.n_features)
+    position = np.full(max(matrix.n_features, 1), -1, dtype=np.int64)
+
+    for row_start in range(0, n, tile_rows):
+        row_stop = min(n, row_start + tile_rows)
+        features = np.unique(matrix.indices[matrix.indptr[row_start]:matrix.indptr[row_stop]])
+        position[:] = -1
+        position[features] = np.arange(len(features))
+        row_tile = _dense_rows(matrix, row_start, row_stop, position, len(features))
+
+        for col_start in range(row_start, n, tile_rows):
+            col_stop = min(n, col_start + tile_rows)
+            if col_start == row_start:
+                # Same tile: keep the strict upper triangle only
+                block = np.triu(row_tile @ row_tile.T, k=1)
+            else:
+                block = row_tile @ _dense_rows(matrix, col_start, col_stop, position, len(features)).T
+            for i, j in zip(*np.nonzero(block > threshold)):
+                yield row_start + int(i), col_start + int(j), min(1.0, float(block[i, j]))
+
+
+def find_similar_pairs_tfidf(reviews, threshold=SIMILARITY_THRESHOLD, stats=None, tile_rows=None):
+    """TF-IDF cosine counterpart of review_similarity.find_similar_pairs
+
+    Same input and output shape, and the same "> threshold" semantics, but
+    the score is the cosine of the reviews' TF-IDF vectors rather than the
+    difflib ratio. Use --calibrate to see how the two compare on real data.
+    """
+    _require_numpy()
+    start = perf_counter()
+    matrix = build_tfidf_matrix([review['text'] for review in reviews])
+    vectorized = perf_counter()
+    scored = list(iter_cosine_pairs(matrix, threshold, tile_rows))
+
+    if stats is not None:
+        stats['reviews'] = len(reviews)
+        stats['features'] = matrix.n_features
+        stats['tile_rows'] = tile_rows or tile_rows_for(matrix.n_features)
+        stats['similar_pairs'] = len(scored)
+        stats['vectorize_seconds'] = vectorized - start
+        stats['scoring_seconds'] = perf_counter() - vectorized
+
+    return _as_pairs(reviews, scored)
+
+
+def calibrate(reviews, threshold=SIMILARITY_THRESHOLD, floor=CALIBRATION_FLOOR):
+    """Compare TF-IDF cosine scores with difflib ratios on the same reviews
+
+    Pairs either backend flags, plus any pair with cosine above `floor`, are
+    scored both ways. Reports how often the two agree at `threshold` and the
+    cosine cut-off that would best reproduce the difflib verdicts.
+    """
+    _require_numpy()
+    matrix = build_tfidf_matrix([review['text'] for review in reviews])
+    cosine = {(i, j): score for i, j, score in iter_cosine_pairs(matrix, floor)}
+
+    positions = {id(review): idx for idx, review in enumerate(reviews)}
+    difflib_flagged = {(positions[id(pair['review1'])], positions[id(pair['review2'])])
+                       for pair in find_similar_pairs(reviews, threshold)}
+
+    samples = []
+    for i, j in sorted(set(cosine) | difflib_flagged):
+        ratio = difflib.SequenceMatcher(None, reviews[i]['text'], reviews[j]['text']).ratio()
+        samples.append((cosine.get((i, j), 0.0), ratio))
+
+    cosines = np.array([c for c, _ in samples])
+    ratios = np.array([r for _, r in samples])
+    similar = ratios > threshold
+
+    def agreement(cut):
+        flagged = cosines > cut
+        both = int(np.sum(flagged & similar))
+        precision = both / max(1, int(np.sum(flagged)))
+        recall = both / max(1, int(np.sum(similar)))
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return {'threshold': round(float(cut), 3), 'precision': precision, 'recall': recall, 'f1': f1}
+
+    best = max((agreement(cut) for cut in np.arange(floor, 1.0, 0.01)), key=lambda result: result['f1'],
+               default=agreement(threshold))
+
+    return {
+        'pairs_compared': len(samples),
+        'difflib_similar': int(np.sum(similar)),
+        'difflib_near_identical': int(np.sum(ratios > NEAR_IDENTICAL_THRESHOLD)),
+        'tfidf_similar': int(np.sum(cosines > threshold)),
+        'tfidf_near_identical': int(np.sum(cosines > NEAR_IDENTICAL_THRESHOLD)),
+        'at_threshold': agreement(threshold),
+        'best_cosine_threshold': best,
+        'mean_abs_difference': float(np.mean(np.abs(cosines - ratios))) if samples else 0.0,
+        'correlation': float(np.corrcoef(cosines, ratios)[0, 1]) if len(samples) > 1 else 0.0
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='TF-IDF cosine similarity over extracted reviews')
+    parser.add_argument('data_file', nargs='?', default='comprehensive_audit_results.json',
+                        help='Audit JSON file or review store to read')
+    parser.add_argument('--threshold', type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument('--calibrate', action='store_true',
+                        help='Compare cosine scores with difflib ratios instead of listing pairs')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not tfidf_available():
+        sys.exit("❌ NumPy is not installed; the tfidf similarity backend needs it")
+
+    reviews = load_review_texts(args.data_file)
+
+    if args.calibrate:
+        print("🔍 Calibrating TF-IDF cosine against difflib ratios...")
+        print("=" * 60)
+        result = calibrate(reviews, args.threshold)
+        at_threshold = result['at_threshold']
+        best = result['best_cosine_threshold']
+        print(f"Pairs compared: {result['pairs_compared']}")
+        print(f"Similar (> {args.threshold:.0%}): difflib {result['difflib_similar']}, tfidf {result['tfidf_similar']}")
+        print(f"Near-identical (> {NEAR_IDENTICAL_THRESHOLD:.0%}): difflib {result['difflib_near_identical']}, "
+              f"tfidf {result['tfidf_near_identical']}")
+        print(f"At {args.threshold:.2f}: precision {at_threshold['precision']:.2%}, recall {at_threshold['recall']:.2%}")
+        print(f"Best cosine cut-off: {best['threshold']:.2f} (F1 {best['f1']:.2%})")
+        print(f"Mean |cosine - ratio|: {result['mean_abs_difference']:.3f}, correlation {result['correlation']:.3f}")
+        return
+
+    stats = {}
+    pairs = find_similar_pairs_tfidf(reviews, args.threshold, stats)
+    near_identical = [pair for pair in pairs if pair['similarity'] > NEAR_IDENTICAL_THRESHOLD]
+    print(f"🔍 {len(pairs)} similar pairs ({len(near_identical)} near-identical) among {stats['reviews']} reviews")
+    print(f"⏱️  vectorize {stats['vectorize_seconds']:.3f}s, scoring {stats['scoring_seconds']:.3f}s, "
+          f"{stats['features']} shared features, {stats['tile_rows']} rows per tile")
+
+
+if __name__ == "__main__":
+    main()